@@ -0,0 +1,223 @@
+# Annual plant simulation from hourly ambient and brine data
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.rankine annual weather.csv --case case.json
+#     $ python -m rankine.annual weather.csv -o hourly.csv
+#
+# The hourly file, CSV or JSON lines as batch.read_cases reads them, has a
+# row per hour with the props keys that change from the base case, usually
+# t_0 (ambient temperature, deg C) and t_brine. A row's t_0 is also the
+# cycle's dead state, so it moves every exergy figure. If the base case has
+# a cond_approach (K), the condensing temperature follows the ambient,
+# t_lo = t_0 + cond_approach, and with it the condenser pressure.
+#
+# Temperatures are rounded to the given resolution, and hours that round to
+# the same cycle inputs share one compute_cycle: only compute_plant, which
+# makes no property calls, is run for each hour.
+
+from __future__ import print_function
+import argparse
+import itertools
+import json
+import os
+import sys
+from . import batch
+from .cache import normalize
+from .rankine import compute_cycle, compute_plant
+
+DESCRIPTION = 'simulate a year of plant operation from hourly ambient and brine data'
+
+DEFAULT_CASE = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8,
+                'pump_eff': 0.75, 'cool_eff': 0.25, 'cycle_mdot': 3.14}
+
+# props rounded to the resolution
+TEMPERATURES = ['t_0','t_brine','t_hi','t_lo']
+
+# props only compute_plant reads, left out of the key of a cycle
+PLANT_INPUTS = ['t_brine','cool_eff']
+
+# results written for every hour
+RESULTS = ['power','heat_in','brine_heat','brine_ex','en_eff','ex_eff','cycle_en_eff']
+
+class Simulation(object):
+    ''' Evaluates the plant hour by hour and accumulates the annual totals.
+        props = base case props dictionary, updated by each hour's row
+        resolution = step temperatures are rounded to (K), or None
+        hours = hours represented by each row
+    '''
+    def __init__(self, props, resolution=0.1, hours=1.0):
+        self.props = props
+        self.resolution = resolution
+        self.hours = hours
+        self._cycles = {}  # cycle key -> computed cycle, or the error it raised
+        self.rows = 0
+        self.failed = 0
+        self.computed = 0
+        self.energy = 0.0      # net work, MWh
+        self.heat_in = 0.0     # heat into the cycle, MWh
+        self.brine_heat = 0.0  # heat available from the brine, MWh
+        self.brine_ex = 0.0    # exergy of the brine, MWh
+        self.p_min = None
+        self.p_max = None
+
+    def hour_props(self, row):
+        ''' Return the props of one hour: the base case updated by row, with
+        the temperatures rounded and t_lo following the ambient if the case
+        has a cond_approach '''
+        props = dict(self.props)
+        props.update(row)
+        if props.get('cond_approach') is not None and props.get('t_0') is not None:
+            props['t_lo'] = props['t_0'] + props['cond_approach']
+        if self.resolution:
+            for key in TEMPERATURES:
+                if props.get(key) is not None:
+                    props[key] = round(round(props[key] / self.resolution) * self.resolution, 9)
+        return props
+
+    def cycle(self, props):
+        ''' Return the computed cycle of props, reusing that of an earlier
+        hour with the same cycle inputs. Raises the error compute_cycle
+        raised for them. '''
+        key = tuple(sorted((k, v) for k, v in normalize(props).items() if k not in PLANT_INPUTS))
+        cyc = self._cycles.get(key)
+        if cyc is None:
+            self.computed += 1
+            try:
+                cyc = compute_cycle(props)
+            except (ValueError, ZeroDivisionError) as e:
+                cyc = e
+            self._cycles[key] = cyc
+        if isinstance(cyc, Exception):
+            raise cyc
+        return cyc
+
+    def step(self, row):
+        ''' Evaluate one hour and return its record: the row, the RESULTS in
+        kW and an error message if the plant could not be computed '''
+        record = {'hour': self.rows}
+        if isinstance(row, dict):
+            record.update(row)
+        record.update(dict.fromkeys(RESULTS))
+        record['error'] = None
+        self.rows += 1
+        try:
+            batch.check_case(row, [])
+            batch.check_case(dict(self.props, **row), batch.NUMERIC + ['cond_approach'])
+            props = self.hour_props(row)
+            cyc = self.cycle(props)
+            plant = compute_plant(cyc, props)
+        except (ValueError, ZeroDivisionError) as e:
+            self.failed += 1
+            record['error'] = str(e).splitlines()[0] if str(e) else type(e).__name__
+            return record
+        geo = plant.geo
+        record.update({
+            'power': cyc.mdot * cyc.wnet / 1e3,
+            'heat_in': cyc.mdot * sum(p.heat for p in cyc.get_procs() if p.heat > 0) / 1e3,
+            'brine_heat': geo.mdot * (geo.inflow.h - geo.dead.h) / 1e3,
+            'brine_ex': geo.mdot * geo.inflow.ef / 1e3,
+            'en_eff': plant.en_eff,
+            'ex_eff': plant.ex_eff,
+            'cycle_en_eff': cyc.en_eff})
+        # kW for self.hours hours -> MWh
+        self.energy += record['power'] * self.hours / 1e3
+        self.heat_in += record['heat_in'] * self.hours / 1e3
+        self.brine_heat += record['brine_heat'] * self.hours / 1e3
+        self.brine_ex += record['brine_ex'] * self.hours / 1e3
+        self.p_min = record['power'] if self.p_min is None else min(self.p_min, record['power'])
+        self.p_max = record['power'] if self.p_max is None else max(self.p_max, record['power'])
+        return record
+
+    def run(self, rows):
+        ''' Generate the record of each row of an iterable, consumed lazily '''
+        for row in rows:
+            yield self.step(row)
+
+    def totals(self):
+        ''' Return the annual totals: energies in MWh, the mean, least and
+        greatest power in kW and the plant and cycle efficiencies averaged
+        over the year (total work over total heat or exergy) '''
+        ok = self.rows - self.failed
+        return {'rows': self.rows,
+                'failed': self.failed,
+                'cycles_computed': self.computed,
+                'energy': self.energy,
+                'heat_in': self.heat_in,
+                'brine_heat': self.brine_heat,
+                'brine_ex': self.brine_ex,
+                'power_mean': self.energy * 1e3 / (ok * self.hours) if ok else None,
+                'power_min': self.p_min,
+                'power_max': self.p_max,
+                'en_eff': self.energy / self.brine_heat if self.brine_heat else None,
+                'ex_eff': self.energy / self.brine_ex if self.brine_ex else None,
+                'cycle_en_eff': self.energy / self.heat_in if self.heat_in else None}
+
+def print_totals(totals):
+    print('Hours simulated               = {:>10d}  ({} failed, {} cycles computed)'.format(
+        totals['rows'], totals['failed'], totals['cycles_computed']))
+    print('Net energy                    = {:>10.1f} MWh'.format(totals['energy']))
+    print('Brine heat available          = {:>10.1f} MWh'.format(totals['brine_heat']))
+    if totals['power_mean'] is None:
+        return
+    print('Mean (min, max) net power     = {:>10.1f} kW ({:.1f}, {:.1f})'.format(
+        totals['power_mean'], totals['power_min'], totals['power_max']))
+    print('Plant thermal (energetic) eff = {:>10.1f}%'.format(totals['en_eff']*100))
+    print('Plant exergetic efficiency    = {:>10.1f}%'.format(totals['ex_eff']*100))
+    print('Rankine cycle thermal eff     = {:>10.1f}%'.format(totals['cycle_en_eff']*100))
+
+def add_arguments(parser):
+    parser.add_argument('input', nargs='?', default='-',
+                        help='CSV or JSON lines file with a row per hour, default stdin')
+    parser.add_argument('-c', '--case',
+                        help='base case props as JSON, or a JSON file of them')
+    parser.add_argument('-o', '--output', help='file to write the hourly results to')
+    parser.add_argument('--input-format', choices=['csv','jsonl'],
+                        help='default from the file extension, or sniffed')
+    parser.add_argument('--resolution', type=float, default=0.1,
+                        help='K to round temperatures to, 0 for none')
+    parser.add_argument('--hours', type=float, default=1.0, help='hours per row')
+    return parser
+
+def run(args):
+    ''' Run the simulation described by the parsed arguments of
+    add_arguments, print and return the annual totals '''
+    props = dict(DEFAULT_CASE)
+    if args.case:
+        if os.path.exists(args.case):
+            with open(args.case) as f:
+                props = json.load(f)
+        else:
+            props = json.loads(args.case)
+    sim = Simulation(props, resolution=args.resolution or None, hours=args.hours)
+    in_fmt = args.input_format or batch.FORMATS.get(os.path.splitext(args.input)[1].lower())
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = None
+    try:
+        records = sim.run(batch.read_cases(fin, in_fmt))
+        if args.output:
+            out_fmt = batch.FORMATS.get(os.path.splitext(args.output)[1].lower(), 'jsonl')
+            fout = open(args.output, 'w', newline='')
+            # the columns of the first hour: its row, the RESULTS and the error
+            first = next(records, None)
+            if first is not None:
+                batch.write_records(itertools.chain([first], records), fout, out_fmt,
+                                    fieldnames=list(first))
+        else:
+            for record in records:
+                pass
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not None:
+            fout.close()
+    totals = sim.totals()
+    print_totals(totals)
+    return totals
+
+def main(argv=None):
+    parser = add_arguments(argparse.ArgumentParser(description=DESCRIPTION))
+    return run(parser.parse_args(argv))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
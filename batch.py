@@ -0,0 +1,235 @@
+# Evaluate batches of Rankine cycle cases streamed from CSV or JSON lines
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.rankine batch cases.csv -o results.jsonl
+#     $ cat cases.jsonl | python -m rankine.batch --workers 4 --output-format csv > results.csv
+#
+# Each input row is a props dictionary with the keys compute_cycle and
+# compute_plant take (fluid, p_hi, p_lo, t_hi, t_lo, turb_eff, pump_eff,
+# superheat, cycle_mdot, cool_eff, t_brine, t_0, p_0, backend). One record is written
+# per case as soon as its chunk completes, holding the case number, the
+# inputs, the RESULTS and an error message for cases that failed.
+
+from __future__ import print_function
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from numbers import Number
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .rankine import compute_cycle, compute_plant
+
+DESCRIPTION = 'evaluate cycle cases read from CSV or JSON lines'
+
+# props keys written as CSV columns, whether or not a case sets them
+INPUTS = ['fluid','p_hi','p_lo','t_hi','t_lo','turb_eff','pump_eff','superheat',
+          'cycle_mdot','cool_eff','t_brine','t_0','p_0','backend']
+
+# props keys that must be numbers when a case sets them
+NUMERIC = ['p_hi','p_lo','t_hi','t_lo','turb_eff','pump_eff','cycle_mdot','cool_eff',
+           't_brine','t_0','p_0']
+
+# results written for every case
+RESULTS = ['wnet','qnet','en_eff','bwr','ex_eff','plant_en_eff','plant_ex_eff','brine_mdot']
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.ndjson': 'jsonl'}
+
+def parse_value(text):
+    ''' Convert a CSV field to a number, boolean or string. Empty fields
+    give None. '''
+    text = text.strip()
+    if not text:
+        return None
+    if text.lower() in ('true', 'false'):
+        return text.lower() == 'true'
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+class BadLine(ValueError):
+    ''' A JSON line that could not be decoded, generated by read_cases in
+    place of its case so that the case fails on its own '''
+
+def read_cases(lines, fmt=None):
+    ''' Generate props dictionaries from an iterable of lines in CSV (with a
+    header row) or JSON lines format. The format is sniffed from the first
+    line if not given. Blank fields and lines are skipped, and a JSON line
+    that cannot be decoded gives a BadLine. '''
+    lines = iter(lines)
+    if fmt is None:
+        for first in lines:
+            if first.strip():
+                break
+        else:
+            return
+        fmt = 'jsonl' if first.lstrip().startswith('{') else 'csv'
+        lines = itertools.chain([first], lines)
+    if fmt == 'jsonl':
+        for n, line in enumerate(lines, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield BadLine('line {}: {}'.format(n, e))
+    else:
+        for row in csv.DictReader(lines):
+            props = {}
+            for key, text in row.items():
+                val = parse_value(text or '')
+                if key and val is not None:
+                    props[key.strip()] = val
+            yield props
+
+def check_case(props, numeric=NUMERIC):
+    ''' Raise ValueError if props is a BadLine or not a dictionary, its
+    fluid or backend is not a string, or one of the numeric keys is set to
+    anything but a number '''
+    if isinstance(props, BadLine):
+        raise props
+    if not isinstance(props, dict):
+        raise ValueError('case is not a dictionary of props')
+    for key in ['fluid', 'backend', 'units']:
+        val = props.get(key)
+        if val is not None and not isinstance(val, str):
+            raise ValueError('{} must be a string, not {!r}'.format(key, val))
+    for key in numeric:
+        val = props.get(key)
+        if val is not None and (isinstance(val, bool) or not isinstance(val, Number)):
+            raise ValueError('{} must be a number, not {!r}'.format(key, val))
+
+def evaluate(props):
+    ''' Evaluate one case and return its results dictionary (see RESULTS),
+    with 'error' set to the reason if the case could not be computed '''
+    result = dict.fromkeys(RESULTS)
+    result['error'] = None
+    try:
+        check_case(props)
+        cyc = compute_cycle(props)
+        plant = compute_plant(cyc, props)
+    except (ValueError, ZeroDivisionError) as e:
+        result['error'] = str(e).splitlines()[0] if str(e) else type(e).__name__
+        return result
+    result.update({'wnet': cyc.wnet, 'qnet': cyc.qnet, 'en_eff': cyc.en_eff,
+                   'bwr': cyc.bwr, 'ex_eff': cyc.ex_eff,
+                   'plant_en_eff': plant.en_eff, 'plant_ex_eff': plant.ex_eff,
+                   'brine_mdot': plant.geo.mdot})
+    return result
+
+def _evaluate_chunk(chunk):
+    records = []
+    for case, props in chunk:
+        record = {'case': case}
+        if isinstance(props, dict):
+            record.update(props)
+        record.update(evaluate(props))
+        records.append(record)
+    return records
+
+def run_batch(cases, workers=None, chunksize=16, ordered=False):
+    ''' Evaluate an iterable of props dictionaries and generate one record
+    per case: the case number (counting from 0), the inputs and the results
+    of evaluate().
+
+    arguments:
+        cases = iterable of props dictionaries, consumed lazily
+        workers = number of worker processes, default os.cpu_count(). Use
+                  1 to run every case in this process.
+        chunksize = number of cases sent to a worker per task
+        ordered = generate records in input order instead of as they complete
+
+    At most 2 * workers chunks are read ahead of the records generated, so
+    memory use does not grow with the number of cases. '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    numbered = enumerate(cases)
+    chunks = iter(lambda: list(itertools.islice(numbered, chunksize)), [])
+    if workers == 1:
+        for chunk in chunks:
+            for record in _evaluate_chunk(chunk):
+                yield record
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_evaluate_chunk, chunk))
+            while len(pending) >= 2 * workers:
+                for record in _collect(pending, ordered):
+                    yield record
+        while pending:
+            for record in _collect(pending, ordered):
+                yield record
+
+def _collect(pending, ordered):
+    # wait for the oldest chunk, or any chunk, and return its records
+    if ordered:
+        return pending.pop(0).result()
+    done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+    pending[:] = [future for future in pending if future in not_done]
+    return [record for future in done for record in future.result()]
+
+def write_records(records, out, fmt='jsonl', fieldnames=None):
+    ''' Write records to the file object out as JSON lines or CSV, one at a
+    time. CSV columns are fieldnames if given, or else the case number,
+    INPUTS, any other inputs of the first record, RESULTS and the error.
+    Returns the number of records written. '''
+    n = 0
+    writer = None
+    for record in records:
+        if fmt == 'csv':
+            if writer is None:
+                if fieldnames is None:
+                    extra = [key for key in record if key not in INPUTS + RESULTS + ['case','error']]
+                    fieldnames = ['case'] + INPUTS + extra + RESULTS + ['error']
+                writer = csv.DictWriter(out, fieldnames=fieldnames,
+                                        restval='', extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record) + '\n')
+        n += 1
+    out.flush()
+    return n
+
+def add_arguments(parser):
+    parser.add_argument('input', nargs='?', default='-',
+                        help='CSV or JSON lines file of cases, default stdin')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file to write the results to, default stdout')
+    parser.add_argument('--input-format', choices=['csv','jsonl'],
+                        help='default from the file extension, or sniffed')
+    parser.add_argument('--output-format', choices=['csv','jsonl'],
+                        help='default from the file extension, or jsonl')
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='cases sent to a worker per task')
+    parser.add_argument('--ordered', action='store_true',
+                        help='write the results in input order')
+    return parser
+
+def run(args):
+    ''' Run the batch described by the parsed arguments of add_arguments '''
+    in_fmt = args.input_format or FORMATS.get(os.path.splitext(args.input)[1].lower())
+    out_fmt = args.output_format or FORMATS.get(os.path.splitext(args.output)[1].lower(), 'jsonl')
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        records = run_batch(read_cases(fin, in_fmt), workers=args.workers,
+                            chunksize=args.chunksize, ordered=args.ordered)
+        return write_records(records, fout, out_fmt)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+def main(argv=None):
+    parser = add_arguments(argparse.ArgumentParser(description=DESCRIPTION))
+    return run(parser.parse_args(argv))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
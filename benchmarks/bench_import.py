@@ -0,0 +1,60 @@
+# Guard the time it takes a fresh interpreter to import the compute modules
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.benchmarks.bench_import [--budget 0.25]
+#
+# Exits with status 1 if the import takes longer than the budget (seconds),
+# or if it loads any of the heavy libraries that should only be imported
+# when they are used.
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PACKAGE = (__package__ or 'rankine').split('.')[0]
+MODULES = ['thermodynamics', 'components', 'cycles', 'rankine']
+# libraries the compute modules must not import until they are needed
+DEFERRED = ['matplotlib', 'prettytable', 'CoolProp', 'numpy']
+
+SCRIPT = '''
+import json, sys, time
+t = time.perf_counter()
+{imports}
+t = time.perf_counter() - t
+print(json.dumps({{'time': t, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+'''
+
+def time_import(modules=MODULES, package=PACKAGE):
+    ''' Import the modules in a new interpreter and return a dictionary of
+    the import time (s) and the deferred libraries that were loaded '''
+    imports = '\n'.join('import {}.{}'.format(package, m) for m in modules)
+    parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.check_output([sys.executable, '-c', SCRIPT.format(imports=imports, deferred=DEFERRED)],
+                                  cwd=parent)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the import time of the compute modules')
+    parser.add_argument('--budget', type=float, default=0.25, help='allowed import time (s)')
+    parser.add_argument('--repeat', type=int, default=5, help='take the best of this many imports')
+    args = parser.parse_args(argv)
+    results = [time_import() for i in range(args.repeat)]
+    best = min(res['time'] for res in results)
+    loaded = results[0]['loaded']
+    print('import {}: {:.1f} ms (budget {:.1f} ms)'.format(
+        ', '.join(MODULES), best*1000, args.budget*1000))
+    status = 0
+    if loaded:
+        print('FAIL: imported {}'.format(', '.join(loaded)))
+        status = 1
+    if best > args.budget:
+        print('FAIL: over the import time budget')
+        status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
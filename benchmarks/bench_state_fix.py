@@ -0,0 +1,37 @@
+# Time State.fix with per-property PropsSI calls against a single AbstractState flash
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.benchmarks.bench_state_fix
+
+from __future__ import print_function
+import timeit
+from ..thermodynamics import State
+
+CASES = [('Water', 'p', 2e6, 'x', 1.0),
+         ('Water', 'p', 4e6, 'T', 673.15),
+         ('Water', 'p', 1e4, 'h', 2007.5e3),
+         ('Water', 's', 6.7e3, 'p', 1e4),
+         ('n-Butane', 'p', 0.3e6, 'x', 0.0)]
+
+def fix_call(fluid, prop1, val1, prop2, val2, abstract_state):
+    ''' Return a callable fixing a new State, since fixing a State again from
+    the inputs it already holds makes no property call '''
+    return lambda: State(fluid=fluid, abstract_state=abstract_state).fix(prop1, val1, prop2, val2)
+
+def time_fix(fluid, prop1, val1, prop2, val2, abstract_state, number=200):
+    func = fix_call(fluid, prop1, val1, prop2, val2, abstract_state)
+    func()  # warm up fluid and AbstractState caches
+    t = timeit.timeit(func, number=number)
+    return t / number
+
+def main():
+    print('{:<10} {:<6} {:>14} {:>14} {:>8}'.format('Fluid','Pair','PropsSI (us)','Abstract (us)','Speedup'))
+    for fluid, prop1, val1, prop2, val2 in CASES:
+        t_props = time_fix(fluid, prop1, val1, prop2, val2, False)
+        t_abs = time_fix(fluid, prop1, val1, prop2, val2, True)
+        print('{:<10} {:<6} {:>14.1f} {:>14.1f} {:>7.1f}x'.format(
+            fluid, prop1+'-'+prop2, t_props*1e6, t_abs*1e6, t_props/t_abs))
+
+if __name__ == '__main__':
+    main()
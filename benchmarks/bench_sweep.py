@@ -0,0 +1,38 @@
+# Measure how sweep() scales with the number of worker processes
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.benchmarks.bench_sweep [max_workers]
+
+from __future__ import print_function
+import os
+import sys
+import time
+import numpy as np
+from ..sweep import sweep
+
+def time_sweep(workers, n_p_hi=40, n_eff=10):
+    t = time.perf_counter()
+    sweep('rankine_superheated', workers=workers, fluid='Water',
+          p_hi=np.linspace(2.0, 12.0, n_p_hi), p_lo=[0.01, 0.02],
+          T_hi=450, turb_eff=np.linspace(0.7, 1.0, n_eff), pump_eff=0.8)
+    return time.perf_counter() - t
+
+def main(max_workers=None):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    workers = 1
+    t_1 = None
+    print('{:>8} {:>10} {:>9} {:>11}'.format('Workers','Time (s)','Speedup','Efficiency'))
+    while workers <= max_workers:
+        t = time_sweep(workers)
+        if t_1 is None:
+            t_1 = t
+        speedup = t_1 / t
+        print('{:>8} {:>10.2f} {:>8.2f}x {:>10.0%}'.format(workers, t, speedup, speedup/workers))
+        if workers == max_workers:
+            break
+        workers = min(2*workers, max_workers)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,203 @@
+# Micro and macro benchmarks of the thermodynamic hot paths
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.benchmarks.suite -o results.json
+#     $ python -m rankine.benchmarks.suite --baseline baseline.json --threshold 0.15
+#
+# Results are written as JSON with ops/sec and timing percentiles for each
+# benchmark. Given a baseline file, benchmarks whose ops/sec dropped by more
+# than the threshold fraction are reported and the exit status is 1.
+
+from __future__ import print_function
+import argparse
+import json
+import platform
+import sys
+import time
+from ..thermodynamics import State
+from ..components import Turbine, Pump, Boiler, Condenser
+from ..cycles import ideal_rankine, rankine_superheated, rankine_reheated
+from .. import rankine
+from .. import print_rankine
+
+##############################################################################
+# ------------------- Benchmarks ---------------------------------------------
+##############################################################################
+
+# Each benchmark is a function returning the callable to time, so that any
+# setup is left out of the timings.
+
+def bench_fix(prop1, val1, prop2, val2, fluid='Water'):
+    # a new State each call, as fixing a State again from the inputs it
+    # already holds makes no property call
+    def setup():
+        return lambda: State(fluid=fluid).fix(prop1, val1, prop2, val2)
+    return setup
+
+def bench_turbine():
+    return lambda: Turbine(eff=0.8, p_hi=3.5e6, p_lo=0.3e6, fluid='n-Butane').compute()
+
+def bench_pump():
+    return lambda: Pump(eff=0.75, p_hi=3.5e6, p_lo=0.3e6, fluid='n-Butane').compute()
+
+def bench_boiler():
+    inflow = State(fluid='Water')
+    inflow.fix('p', 4e6, 'h', 195.8e3)
+    return lambda: Boiler(p=4e6, T_hi=673.15, inflow=inflow, fluid='Water').compute()
+
+def bench_condenser():
+    inflow = State(fluid='Water')
+    inflow.fix('p', 1e4, 'h', 2007.5e3)
+    return lambda: Condenser(p=1e4, inflow=inflow, fluid='Water').compute()
+
+def bench_ideal_rankine():
+    return lambda: ideal_rankine(fluid='n-Butane', p_hi=3.5, p_lo=0.3, turb_eff=0.8, pump_eff=0.75)
+
+def bench_rankine_superheated():
+    return lambda: rankine_superheated(fluid='Water', p_hi=4.0, p_lo=0.01, T_hi=400)
+
+def bench_rankine_reheated():
+    return lambda: rankine_reheated(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.02, T_hi=440, T_mid=440)
+
+PROPS = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8,
+         'pump_eff': 0.75, 'cool_eff': 0.25, 'cycle_mdot': 3.14}
+
+def bench_compute_plant():
+    def run():
+        cyc = rankine.compute_cycle(PROPS)
+        return rankine.compute_plant(cyc, PROPS)
+    return run
+
+def bench_get_sat_dome():
+    cyc = rankine.compute_cycle(PROPS)
+    print_rankine.get_sat_dome(cyc)  # memoize the dome
+    return lambda: print_rankine.get_sat_dome(cyc)
+
+BENCHMARKS = [
+    ('State.fix[p-x]', bench_fix('p', 2e6, 'x', 1.0)),
+    ('State.fix[p-T]', bench_fix('p', 4e6, 'T', 673.15)),
+    ('State.fix[p-h]', bench_fix('p', 1e4, 'h', 2007.5e3)),
+    ('State.fix[s-p]', bench_fix('s', 6.7e3, 'p', 1e4)),
+    ('Turbine.compute', bench_turbine),
+    ('Pump.compute', bench_pump),
+    ('Boiler.compute', bench_boiler),
+    ('Condenser.compute', bench_condenser),
+    ('ideal_rankine', bench_ideal_rankine),
+    ('rankine_superheated', bench_rankine_superheated),
+    ('rankine_reheated', bench_rankine_reheated),
+    ('compute_cycle+compute_plant', bench_compute_plant),
+    ('get_sat_dome', bench_get_sat_dome),
+]
+
+##############################################################################
+# ------------------- Timing and comparison ----------------------------------
+##############################################################################
+
+def percentile(sorted_times, q):
+    ''' q-th percentile (0-100) of an ascending list, linearly interpolated '''
+    k = (len(sorted_times) - 1) * q / 100.0
+    i = int(k)
+    j = min(i + 1, len(sorted_times) - 1)
+    return sorted_times[i] + (sorted_times[j] - sorted_times[i]) * (k - i)
+
+def time_call(func, min_time=0.2, min_repeat=5, max_repeat=10000, warmup=1):
+    ''' Call func repeatedly, at least min_repeat times and for at least
+    min_time seconds, and return the timing statistics of single calls. '''
+    for i in range(warmup):
+        func()
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_repeat and (len(times) < min_repeat or
+                                       time.perf_counter() - start < min_time):
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    mean = sum(times) / len(times)
+    return {'repeat': len(times),
+            'ops_sec': 1.0 / mean,
+            'mean': mean,
+            'min': times[0],
+            'p50': percentile(times, 50),
+            'p90': percentile(times, 90),
+            'p99': percentile(times, 99),
+            'max': times[-1]}
+
+def run(names=None, min_time=0.2, min_repeat=5):
+    ''' Run the benchmarks (all, or those whose name contains one of names)
+    and return the results document '''
+    import CoolProp
+    import numpy
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(n in name for n in names):
+            continue
+        results[name] = time_call(setup(), min_time=min_time, min_repeat=min_repeat)
+    return {'meta': {'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'coolprop': CoolProp.__version__,
+                     'numpy': numpy.__version__,
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+def compare(results, baseline, threshold=0.10):
+    ''' Compare results documents and return a list of
+    (name, baseline ops/sec, ops/sec, relative change) for each benchmark
+    whose ops/sec fell by more than threshold (a fraction) '''
+    regressions = []
+    for name, res in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        change = res['ops_sec'] / base['ops_sec'] - 1
+        if change < -threshold:
+            regressions.append((name, base['ops_sec'], res['ops_sec'], change))
+    return regressions
+
+def print_results(results, baseline=None):
+    print('{:<30} {:>12} {:>11} {:>11} {:>11}{}'.format(
+        'Benchmark','ops/sec','p50 (us)','p90 (us)','p99 (us)',
+        '  vs baseline' if baseline else ''))
+    for name, res in results['results'].items():
+        line = '{:<30} {:>12.1f} {:>11.1f} {:>11.1f} {:>11.1f}'.format(
+            name, res['ops_sec'], res['p50']*1e6, res['p90']*1e6, res['p99']*1e6)
+        if baseline and name in baseline['results']:
+            line += '  {:>+11.1%}'.format(res['ops_sec'] / baseline['results'][name]['ops_sec'] - 1)
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Rankine cycle hot paths')
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    parser.add_argument('-b', '--baseline', help='JSON results to compare against')
+    parser.add_argument('-t', '--threshold', type=float, default=0.10,
+                        help='allowed fractional drop in ops/sec before a regression is reported')
+    parser.add_argument('-k', '--select', action='append',
+                        help='only run benchmarks whose name contains this (repeatable)')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds spent timing each benchmark')
+    parser.add_argument('--json', action='store_true', help='print the JSON results instead of a table')
+    args = parser.parse_args(argv)
+
+    results = run(args.select, min_time=args.min_time)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, base, ops, change in regressions:
+            print('REGRESSION {}: {:.1f} -> {:.1f} ops/sec ({:+.1%})'.format(name, base, ops, change))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
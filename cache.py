@@ -0,0 +1,281 @@
+# On-disk cache of cycle and plant results, keyed by a hash of their inputs
+#
+# Show or clear the cache from the directory containing the package with
+#
+#     $ python -m rankine.cache
+#     $ python -m rankine.cache --clear
+#
+# A result is found by the SHA-256 of the normalized props dictionary (the
+# keys compute_cycle and compute_plant read, with their defaults filled in),
+# the CoolProp and numpy versions, a digest of the package's own source files
+# and the file format version, so any change of these gives a new entry
+# instead of a stale one. Each entry is one file under
+# CACHE_DIR/results holding a JSON header (the props, cycle totals and plant
+# results) followed by the per-state and per-process arrays as raw bytes.
+# Files are written to a temporary name and renamed into place, so processes
+# sharing the directory only ever read whole entries. When the files grow
+# past max_bytes the least recently used are deleted.
+
+from __future__ import print_function
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+from collections import OrderedDict
+from numbers import Number
+import numpy as np
+from . import thermodynamics
+
+MAGIC = b'RNKCACHE'
+FORMAT_VERSION = 1
+SUFFIX = '.rkc'
+
+# props keys compute_cycle and compute_plant read, and their defaults
+DEFAULTS = {'fluid': None, 'p_hi': None, 'p_lo': None, 't_hi': None, 't_lo': None,
+            'turb_eff': 1.0, 'pump_eff': 1.0, 'superheat': False, 'cycle_mdot': 1.0,
+            'units': 'si', 'backend': 'CoolProp', 'cool_eff': 1.0, 't_brine': 120,
+            't_0': None, 'p_0': 0.101325}
+
+CYCLE = ['mdot','wnet','qnet','en_eff','bwr','ex_in','ex_out','delta_ef','ex_d','ex_eff']
+PLANT = ['en_eff','ex_eff','cool_eff','brine_mdot']
+
+STATE_DTYPE = np.dtype([('name','U32'),('p','f8'),('T','f8'),('d','f8'),('h','f8'),
+                        ('s','f8'),('x','f8'),('ef','f8')])
+PROCESS_DTYPE = np.dtype([('name','U32'),('heat','f8'),('work','f8'),('delta_ef','f8'),
+                          ('ex_in','f8'),('ex_out','f8'),('ex_d','f8'),('ex_eff','f8')])
+
+def normalize(props):
+    ''' Return the props compute_cycle and compute_plant read, with defaults
+    filled in and numbers as floats, so that equal inputs compare equal '''
+    norm = {}
+    for key, default in DEFAULTS.items():
+        val = props.get(key, default)
+        if isinstance(val, bool) or val is None:
+            pass
+        elif isinstance(val, Number):
+            val = float(val)
+        norm[key] = val
+    return norm
+
+_code_version = None
+
+def code_version():
+    ''' Hex digest of the package's .py files, so that results computed by
+    other code are not read back '''
+    global _code_version
+    if _code_version is None:
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(package_dir)):
+            if name.endswith('.py'):
+                with open(os.path.join(package_dir, name), 'rb') as f:
+                    digest.update(name.encode() + b'\0' + f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+def cache_key(props):
+    ''' Hex digest identifying the results of props '''
+    import CoolProp
+    doc = {'props': normalize(props), 'coolprop': CoolProp.__version__, 'numpy': np.__version__,
+           'code': code_version(), 'format': FORMAT_VERSION}
+    return hashlib.sha256(json.dumps(doc, sort_keys=True).encode()).hexdigest()
+
+def _value(obj, prop):
+    val = getattr(obj, prop, None)
+    return np.nan if val is None else val
+
+def summarize(cycle, plant=None):
+    ''' Return the results dictionary of a computed cycle and plant: the
+    'cycle' totals (CYCLE), the 'plant' results (PLANT) and the 'states'
+    and 'processes' structured arrays (STATE_DTYPE and PROCESS_DTYPE) '''
+    result = {'cycle': dict((prop, _value(cycle, prop)) for prop in CYCLE), 'plant': None}
+    if plant is not None:
+        result['plant'] = {'en_eff': plant.en_eff, 'ex_eff': plant.ex_eff,
+                           'cool_eff': plant.cool_eff, 'brine_mdot': plant.geo.mdot}
+    result['states'] = np.array([tuple([str(st.name)] + [_value(st, f) for f in STATE_DTYPE.names[1:]])
+                                 for st in cycle.get_states()], dtype=STATE_DTYPE)
+    result['processes'] = np.array([tuple([str(proc.name)] + [_value(proc, f) for f in PROCESS_DTYPE.names[1:]])
+                                    for proc in cycle.get_procs()], dtype=PROCESS_DTYPE)
+    result['states'].flags.writeable = False
+    result['processes'].flags.writeable = False
+    return result
+
+def dumps(props, result):
+    ''' Encode a results dictionary as the bytes of a cache file '''
+    header = json.dumps({'props': normalize(props), 'cycle': result['cycle'],
+                         'plant': result['plant'], 'n_states': len(result['states']),
+                         'n_processes': len(result['processes'])}).encode()
+    return b''.join([struct.pack('<8sII', MAGIC, FORMAT_VERSION, len(header)), header,
+                     result['states'].tobytes(), result['processes'].tobytes()])
+
+def loads(data):
+    ''' Decode the bytes of a cache file to its results dictionary. Raises
+    ValueError if they are not a whole cache file of this format. '''
+    try:
+        magic, version, size = struct.unpack_from('<8sII', data)
+    except struct.error:
+        raise ValueError('not a cache file')
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError('not a version {} cache file'.format(FORMAT_VERSION))
+    start = struct.calcsize('<8sII')
+    header = json.loads(data[start:start+size].decode())
+    start += size
+    n, m = header['n_states'], header['n_processes']
+    if len(data) != start + n * STATE_DTYPE.itemsize + m * PROCESS_DTYPE.itemsize:
+        raise ValueError('truncated cache file')
+    states = np.frombuffer(data, STATE_DTYPE, n, start)
+    processes = np.frombuffer(data, PROCESS_DTYPE, m, start + n * STATE_DTYPE.itemsize)
+    return {'cycle': header['cycle'], 'plant': header['plant'],
+            'states': states, 'processes': processes}
+
+class ResultCache(object):
+    ''' Results of compute_cycle and compute_plant saved in a directory, with
+    the most recently used also kept in memory.
+        directory = default CACHE_DIR/results
+        max_bytes = size of the files above which the least recently used
+                    are deleted
+        memory = number of results kept in memory (0 for none)
+    '''
+    def __init__(self, directory=None, max_bytes=256 * 2**20, memory=1024):
+        if directory is None:
+            directory = os.path.join(thermodynamics.CACHE_DIR, 'results')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory = memory
+        self._data = OrderedDict()
+        self._size = None  # bytes on disk as last counted, plus those written since
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + SUFFIX)
+
+    def get(self, props, key=None):
+        ''' Return the cached results dictionary of props, or None '''
+        if key is None:
+            key = cache_key(props)
+        result = self._data.get(key)
+        if result is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = loads(f.read())
+            os.utime(path)  # the file's mtime orders the eviction
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, result)
+        return result
+
+    def put(self, props, result, key=None):
+        ''' Save the results dictionary of props '''
+        if key is None:
+            key = cache_key(props)
+        self._remember(key, result)
+        data = dumps(props, result)
+        path = self.path(key)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except (IOError, OSError):
+            return  # the in-memory copy is still used
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def compute(self, props):
+        ''' Return the results dictionary of props, from the cache or else by
+        running compute_cycle and compute_plant and saving their results '''
+        from .rankine import compute_cycle, compute_plant
+        key = cache_key(props)
+        result = self.get(props, key)
+        if result is None:
+            cycle = compute_cycle(props)
+            result = summarize(cycle, compute_plant(cycle, props))
+            self.put(props, result, key)
+        return result
+
+    def _remember(self, key, result):
+        if self.memory:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            while len(self._data) > self.memory:
+                self._data.popitem(last=False)
+
+    def _files(self):
+        # (mtime, size, path) of every entry
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue  # deleted by another process
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def size(self):
+        ''' Bytes of the cache files '''
+        return sum(size for mtime, size, path in self._files())
+
+    def evict(self, max_bytes=None):
+        ''' Delete the least recently used files until they take up less than
+        0.8 * max_bytes (default self.max_bytes) '''
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        files = sorted(self._files())
+        size = sum(f[1] for f in files)
+        for mtime, nbytes, path in files:
+            if size <= 0.8 * max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass  # already deleted by another process
+            size -= nbytes
+        self._size = size
+
+    def clear(self):
+        ''' Delete every entry, in memory and on disk '''
+        self._data.clear()
+        self.evict(0)
+
+    def stats(self):
+        return {'directory': self.directory, 'bytes': self.size(), 'max_bytes': self.max_bytes,
+                'memory': len(self._data), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show or clear the cycle result cache')
+    parser.add_argument('--directory', help='default CACHE_DIR/results')
+    parser.add_argument('--clear', action='store_true', help='delete every cached result')
+    args = parser.parse_args(argv)
+    cache = ResultCache(args.directory)
+    if args.clear:
+        cache.clear()
+    files = cache._files()
+    print('{}: {} results, {:.1f} kB'.format(cache.directory, len(files),
+                                              sum(f[1] for f in files) / 1e3))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -3,15 +3,53 @@
 # Model the Rankine Cycle with Geothermal Brine Heat Source
 
 from __future__ import print_function
-from .thermodynamics import State  # custom thermo state class in thermodynamics.py
-import CoolProp.CoolProp as CP
+from .thermodynamics import State, timed  # custom thermo state class in thermodynamics.py
+from .maps import stodola_inlet_pressure
 
 ######################################
 
 class Component():
-    inflow = State()  # input state
-    outflow = State()  # output state
+    inflow = None  # input state
+    outflow = None  # output state
     constant = []         # constant values
+    fixes = ()     # states fixed on every compute, whoever created them
+    # parameters and the quantity ('p', 'T' or None) they set on the states
+    # they drive, e.g. 'T_hi': ('T', 'inflow'), for Cycle.update
+    drives = {}
+    isobaric = False  # inflow and outflow share one pressure
+
+    def owns(self, flow):
+        ''' Create the 'inflow' or 'outflow' state if it was not given to the
+        component. Returns True if the component created the state, and so
+        must (re)fix it on each compute. '''
+        made = self.__dict__.setdefault('made', set())
+        if not getattr(self, flow):
+            setattr(self, flow, State(name=flow, fluid=self.fluid, backend=self.backend))
+            made.add(flow)
+        return flow in made
+
+    def adopt(self, flow, state):
+        ''' Make state the component's 'inflow' or 'outflow', to be fixed by
+        compute() as if the component had created it '''
+        setattr(self, flow, state)
+        self.__dict__.setdefault('made', set()).add(flow)
+
+    def release(self, flow):
+        ''' Stop fixing the 'inflow' or 'outflow' state on compute(), and take
+        it as given instead '''
+        self.__dict__.setdefault('made', set()).discard(flow)
+
+    def writes(self):
+        ''' States whose properties compute() sets '''
+        made = self.__dict__.get('made', set())
+        return [getattr(self, flow) for flow in ('inflow','outflow')
+                if flow in made or flow in self.fixes]
+
+    def reads(self):
+        ''' Upstream states compute() takes as given '''
+        writes = self.writes()
+        return [st for st in (self.inflow, self.outflow)
+                if st is not None and not any(st is w for w in writes)]
 
 def connect_flow(comp1, comp2):
     # Set inflow states to outflow states
@@ -22,6 +60,10 @@ def connect_flow(comp1, comp2):
 #     constant.append('h')  # constant enthalpy
 
 class Pump(Component):
+    fixes = ('outflow',)
+    drives = {'p_lo': ('p', 'inflow'), 'p_hi': ('p', 'outflow'),
+              'eff': (None, 'outflow'), 'flow': (None, 'outflow')}
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name','Pump')
         self.eff = kwargs.get('eff',1.0)
@@ -29,9 +71,13 @@ class Pump(Component):
         self.p_hi = kwargs.get('p_hi',None)
         self.p_lo = kwargs.get('p_lo',None)
         self.T_hi = kwargs.get('T_hi',None)
+        # off-design: a maps.PerformanceMap, and the flow over design flow
+        self.map = kwargs.get('map',None)
+        self.flow = kwargs.get('flow',1.0)
         self.work = kwargs.get('work',None)
         self.heat = 0.0
         self.cycle = kwargs.get('cycle',None)
+        self.backend = kwargs.get('backend', getattr(self.cycle, 'backend', 'CoolProp'))
         self.inflow = kwargs.get('inflow',None)
         self.outflow = kwargs.get('outflow',None)
         self.delta_ef = 0
@@ -49,27 +95,46 @@ class Pump(Component):
         self.ex_bal = 0    # exergy balance = ex_in - ex_out - delta_ef - ex_d = 0
         return
 
+    def eff_off(self):
+        ''' Isentropic efficiency at the flow fraction, from the map '''
+        if self.map is None:
+            return self.eff
+        return self.eff * self.map.eff(self.flow)
+
+    def outlet_pressure(self):
+        ''' p_hi, or with a pressure ratio map, the inlet pressure times the
+        design ratio p_hi / p_lo scaled by the map at the flow fraction '''
+        if self.map is None or not self.map.has_pr():
+            return self.p_hi
+        p_in = self.inflow.p if self.inflow is not None and self.inflow.p else self.p_lo
+        return p_in * self.p_hi / (self.p_lo or p_in) * self.map.pr(self.flow)
+
+    @timed
     def compute(self):
-        if not self.inflow:
+        if self.owns('inflow'):
             # then assume inflow is sat liquid
-            self.inflow = State(name='inflow', fluid=self.fluid)
             self.inflow.fix('p',self.p_lo,'x',0.0)
             
-        if not self.outflow:
-            self.outflow = State(name='outflow', fluid=self.fluid)
-            self.outflow.p = self.p_hi
+        p_out = self.outlet_pressure()
+        if self.owns('outflow'):
+            self.outflow.p = p_out
             
         # Get intrev work 
         work_intrev = -self.inflow.v * (self.outflow.p - self.inflow.p)
-        self.work = 1/self.eff * work_intrev
+        self.work = 1/self.eff_off() * work_intrev
         
-        self.outflow.fix('p',self.p_hi,'h',self.inflow.h-self.work)
+        self.outflow.fix('p',p_out,'h',self.inflow.h-self.work)
 
         # change in flow exergy
         if self.cycle:
             self.delta_ef = (self.outflow.h - self.inflow.h) - self.cycle.dead.T * (self.outflow.s - self.inflow.s)
     
 class Turbine(Component):
+    fixes = ('outflow',)
+    drives = {'p_hi': ('p', 'inflow'), 'T_hi': ('T', 'inflow'), 'p_lo': ('p', 'outflow'),
+              'eff': (None, 'outflow'), 'flow': (None, 'inflow', 'outflow'),
+              'stodola': (None, 'inflow')}
+
     def __init__(self, eff=1.0, name='Turbine', **kwargs):
         self.name = name
         self.eff = eff
@@ -77,9 +142,15 @@ class Turbine(Component):
         self.p_hi = kwargs.get('p_hi',None)
         self.p_lo = kwargs.get('p_lo',None)
         self.T_hi = kwargs.get('T_hi',None)
+        # off-design: a maps.PerformanceMap, the flow over design flow, and
+        # whether the inlet pressure follows Stodola's ellipse law
+        self.map = kwargs.get('map',None)
+        self.flow = kwargs.get('flow',1.0)
+        self.stodola = kwargs.get('stodola',False)
         self.work = kwargs.get('work',None)
         self.heat = 0.0
         self.cycle = kwargs.get('cycle',None)
+        self.backend = kwargs.get('backend', getattr(self.cycle, 'backend', 'CoolProp'))
         self.inflow = kwargs.get('inflow',None)
         self.outflow = kwargs.get('outflow',None)
         self.delta_ef = 0
@@ -97,20 +168,46 @@ class Turbine(Component):
         self.ex_bal = 0    # exergy balance = ex_in - ex_out - delta_ef - ex_d = 0
         return
 
+    def eff_off(self):
+        ''' Isentropic efficiency at the flow fraction, from the map '''
+        if self.map is None:
+            return self.eff
+        return self.eff * self.map.eff(self.flow)
+
+    def inlet_pressure(self, iterations=3):
+        ''' p_hi, the design inlet pressure, moved to the flow fraction by
+        Stodola's ellipse law if stodola is set, or else by the map's
+        pressure ratio if it has one. The ellipse law is solved with the
+        inlet p*v of the previous iterate, starting from the design's. '''
+        if self.stodola:
+            st = State(name='inlet', fluid=self.fluid, backend=self.backend)
+            fix = lambda p: st.fix('p',p,'T',self.T_hi) if self.T_hi else st.fix('p',p,'x',1.0)
+            fix(self.p_hi)
+            pv = st.p * st.v
+            p = self.p_hi
+            for i in range(iterations):
+                p = stodola_inlet_pressure(self.flow, self.p_hi, self.p_lo, pv_ratio=p * st.v / pv)
+                fix(p)
+            return p
+        if self.map is not None and self.map.has_pr():
+            return self.p_hi * self.map.pr(self.flow)
+        return self.p_hi
+
+    @timed
     def compute(self):
-        if not self.inflow:
-            self.inflow = State(name='inflow', fluid=self.fluid)
+        if self.owns('inflow'):
+            p_hi = self.inlet_pressure()
             if not self.T_hi:
                 # then assume inflow is sat vapor
-                self.inflow.fix('p',self.p_hi,'x',1.0)
+                self.inflow.fix('p',p_hi,'x',1.0)
             else:
-                self.inflow.fix('p',self.p_hi,'T',self.T_hi)
+                self.inflow.fix('p',p_hi,'T',self.T_hi)
         
-        if not self.outflow:
-            self.outflow = State(name='outflow', fluid=self.fluid)
+        if self.owns('outflow'):
             self.outflow.p = self.p_lo
 
-        isen = State(name='isen_2s', fluid=self.fluid, s=self.inflow.s)
+        # only the enthalpy of the isentropic state is needed
+        isen = State(name='isen_2s', fluid=self.fluid, backend=self.backend, lazy=True, s=self.inflow.s)
         h_in = self.inflow.h
         s_in = self.inflow.s
         if self.outflow.p:
@@ -119,7 +216,7 @@ class Turbine(Component):
             p_out = self.p_lo
         isen.fix('s',s_in,'p',p_out)
         # compute exit enthalpy and state
-        h_out = self.eff * (isen.h - h_in) + h_in  #with an irreversible turbine
+        h_out = self.eff_off() * (isen.h - h_in) + h_in  #with an irreversible turbine
         self.outflow.fix('h',h_out,'p',p_out)
         # compute work per unit mass
         self.work = h_in - h_out
@@ -129,9 +226,12 @@ class Turbine(Component):
         
 class HeatExchanger(Component):
     name = 'Heat Exchanger'
+    isobaric = True
 #     constant.append('p')  # constant pressure
 
 class Boiler(HeatExchanger):
+    drives = {'p': ('p', 'inflow', 'outflow'), 'T_lo': ('T', 'inflow'), 'T_hi': ('T', 'outflow')}
+
     def __init__(self, **kwargs):
         self.name =  kwargs.get('name','Boiler')
         self.fluid = kwargs.get('fluid','Water')
@@ -141,6 +241,7 @@ class Boiler(HeatExchanger):
         self.work = 0.0
         self.heat = kwargs.get('heat',None)
         self.cycle = kwargs.get('cycle',None)
+        self.backend = kwargs.get('backend', getattr(self.cycle, 'backend', 'CoolProp'))
         self.inflow = kwargs.get('inflow',None)
         self.outflow = kwargs.get('outflow',None)
         self.delta_ef = 0
@@ -158,26 +259,25 @@ class Boiler(HeatExchanger):
         self.ex_bal = 0    # exergy balance = ex_in - ex_out - delta_ef - ex_d = 0
         return
 
+    @timed
     def compute(self):
-        if not self.inflow:
-            self.inflow = State(name='inflow', fluid=self.fluid)
+        if self.owns('inflow'):
             if not self.T_lo:
                 # then assume inflow is sat liquid
                 self.inflow.fix('p',self.p,'x',0.0)
             else:
                 self.inflow.fix('p',self.p,'T',self.T_lo)
         
-        if not self.outflow:
-            self.outflow = State(name='outflow', fluid=self.fluid)
+        if self.owns('outflow'):
+            # constant pressure, so default to the inflow pressure
+            p = self.p if self.p else self.inflow.p
             if not self.T_hi:
                 # assume outflow is sat vapor
-                self.outflow.fix('x',1.0,'p',self.p)
+                self.outflow.fix('x',1.0,'p',p)
             else:
-                self.outflow.fix('T',self.T_hi,'p',self.p)
+                self.outflow.fix('T',self.T_hi,'p',p)
 
         # compute exit enthalpy and state
-        print(self.outflow.h)
-        print(self.inflow.h)
         self.heat = self.outflow.h - self.inflow.h
     
         # change in flow exergy
@@ -185,6 +285,8 @@ class Boiler(HeatExchanger):
             self.delta_ef = (self.outflow.h - self.inflow.h) - self.cycle.dead.T * (self.outflow.s - self.inflow.s)
 
 class Condenser(HeatExchanger):
+    drives = {'p': ('p', 'inflow', 'outflow'), 'T_hi': ('T', 'inflow')}
+
     def __init__(self, **kwargs):
         self.name =  kwargs.get('name','Condenser')
         self.fluid = kwargs.get('fluid','Water')
@@ -194,6 +296,7 @@ class Condenser(HeatExchanger):
         self.work = 0.0
         self.heat = kwargs.get('heat',None)
         self.cycle = kwargs.get('cycle',None)
+        self.backend = kwargs.get('backend', getattr(self.cycle, 'backend', 'CoolProp'))
         self.inflow = kwargs.get('inflow',None)
         self.outflow = kwargs.get('outflow',None)
         self.delta_ef = 0
@@ -211,21 +314,21 @@ class Condenser(HeatExchanger):
         self.ex_bal = 0    # exergy balance = ex_in - ex_out - delta_ef - ex_d = 0
         return
 
+    @timed
     def compute(self):
         # get isentropic state
         
-        if not self.inflow:
-            self.inflow = State(name='inflow', fluid=self.fluid)
+        if self.owns('inflow'):
             if not self.T_hi:
                 # then assume inflow is sat vapor
                 self.inflow.fix('p',self.p,'x',1.0)
             else:
                 self.inflow.fix('p',self.p,'T',self.T_hi)
         
-        if not self.outflow:
-            self.outflow = State(name='outflow', fluid=self.fluid)
-            # assume outflow is sat liquid
-            self.outflow.fix('x',0.0,'p',self.p)
+        if self.owns('outflow'):
+            # assume outflow is sat liquid at constant pressure
+            p = self.p if self.p else self.inflow.p
+            self.outflow.fix('x',0.0,'p',p)
 
         # # compute exit enthalpy and state
         # self.outflow.fix('x',0.0,'p',self.p)
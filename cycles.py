@@ -1,7 +1,12 @@
 
 from .components import Boiler, Turbine, Condenser, Pump, connect_flow
-from .thermodynamics import Cycle, State
+from .thermodynamics import Cycle, State, StateArray, instrumented, LazyModule, exergy_ledger
+from .graph import CycleGraph
+from .maps import stodola_inlet_pressure
 
+np = LazyModule('numpy')
+
+@instrumented
 def ideal_rankine(**kwargs):
     fluid = kwargs.get('fluid','Water')
     p_hi = kwargs.get('p_hi',None) * 1e6  # MPa
@@ -10,29 +15,71 @@ def ideal_rankine(**kwargs):
     pump_eff = kwargs.get('pump_eff',1.0)
     T_0 = kwargs.get('T_0', 25) + 273.15 # deg C
     p_0 = kwargs.get('p_0', 101.3) * 1e3 # kPa
+    backend = kwargs.get('backend', 'CoolProp')  # or 'HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS'
 
-    dead = State(p=p_0, T=T_0, fluid=fluid)
-    cycle = Cycle(fluid=fluid, dead=dead)
+    dead = State(p=p_0, T=T_0, fluid=fluid, backend=backend)
+    cycle = CycleGraph(fluid=fluid, dead=dead, backend=backend)
     turb = Turbine(p_hi=p_hi, p_lo=p_lo, eff=turb_eff, fluid=fluid, cycle=cycle)
-    turb.compute()
-    cond = Condenser(inflow=turb.outflow, p=p_lo, fluid=fluid, cycle=cycle)
-    cond.compute()
-    pump = Pump(inflow=cond.outflow, p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
-    pump.compute()  
-    boil = Boiler(inflow=pump.outflow, outflow=turb.inflow, fluid=fluid, cycle=cycle)
-    boil.compute()
-    cycle.flow_exergy()
+    cond = Condenser(p=p_lo, fluid=fluid, cycle=cycle)
+    pump = Pump(p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
+    boil = Boiler(fluid=fluid, cycle=cycle)
+    cycle.connect(turb, cond, pump, boil, turb)
+
+    return cycle.solve()
 
-    # Define cycle properties
-    cycle.wnet = turb.work + pump.work
-    cycle.qnet = boil.heat + cond.heat
-    cycle.en_eff = cycle.wnet / boil.heat
-    cycle.bwr = -pump.work / turb.work
-    cycle.ex_eff = cycle.wnet / boil.delta_ef  # cycle exergetic eff
 
-    return cycle    
+def ideal_rankine_array(**kwargs):
+    ''' Evaluate ideal_rankine over arrays of operating points at once.
+    Takes the same keywords as ideal_rankine; p_hi, p_lo, turb_eff, pump_eff
+    and T_0 may be arrays, which are broadcast together. The results depend
+    on the dead state only through T_0, so p_0 is not read. Each step of
+    the Turbine -> Condenser -> Pump -> Boiler sequence is one vectorized
+    property call over all points. Returns a dictionary of arrays of wnet,
+    qnet, en_eff, bwr and ex_eff, and with ledger=True, the exergy ledger
+    of every point as a structured array (see thermodynamics.exergy_ledger)
+    whose case field is the point's index in the flattened inputs. '''
+    fluid = kwargs.get('fluid','Water')
+    p_hi = np.asarray(kwargs.get('p_hi',None), dtype=np.float64) * 1e6  # MPa
+    p_lo = np.asarray(kwargs.get('p_lo',None), dtype=np.float64) * 1e6 # MPa
+    turb_eff = np.asarray(kwargs.get('turb_eff',1.0), dtype=np.float64)
+    pump_eff = np.asarray(kwargs.get('pump_eff',1.0), dtype=np.float64)
+    T_0 = np.asarray(kwargs.get('T_0', 25), dtype=np.float64) + 273.15 # deg C
+    backend = kwargs.get('backend', 'CoolProp')
+    p_hi, p_lo, turb_eff, pump_eff, T_0 = np.broadcast_arrays(p_hi, p_lo, turb_eff, pump_eff, T_0)
+
+    # Turbine: saturated vapor in, expand to p_lo
+    st1 = StateArray(name='1', fluid=fluid, backend=backend).fix('p',p_hi,'x',1.0)
+    st2s = StateArray(name='2s', fluid=fluid, backend=backend).fix('s',st1.s,'p',p_lo)
+    h2 = turb_eff * (st2s.h - st1.h) + st1.h
+    st2 = StateArray(name='2', fluid=fluid, backend=backend).fix('h',h2,'p',p_lo)
+    turb_work = st1.h - st2.h
+    # Condenser: saturated liquid out
+    st3 = StateArray(name='3', fluid=fluid, backend=backend).fix('x',0.0,'p',p_lo)
+    cond_heat = st3.h - st2.h
+    # Pump
+    pump_work = -st3.v * (p_hi - st3.p) / pump_eff
+    st4 = StateArray(name='4', fluid=fluid, backend=backend).fix('p',p_hi,'h',st3.h-pump_work)
+    # Boiler
+    boil_heat = st1.h - st4.h
+    boil_delta_ef = boil_heat - T_0 * (st1.s - st4.s)
 
+    wnet = turb_work + pump_work
+    res = {'wnet': wnet,
+           'qnet': boil_heat + cond_heat,
+           'en_eff': wnet / boil_heat,
+           'bwr': -pump_work / turb_work,
+           'ex_eff': wnet / boil_delta_ef}
+    if kwargs.get('ledger', False):
+        zero = np.zeros_like(wnet)
+        res['ledger'] = exergy_ledger(['Turbine','Condenser','Pump','Boiler'],
+            np.column_stack((turb_work, zero, pump_work, zero)),
+            np.column_stack((zero, cond_heat, zero, boil_heat)),
+            np.column_stack((st2.h - st1.h, st3.h - st2.h, st4.h - st3.h, st1.h - st4.h)),
+            np.column_stack((st2.s - st1.s, st3.s - st2.s, st4.s - st3.s, st1.s - st4.s)),
+            T_0.ravel())
+    return res
 
+@instrumented
 def rankine_superheated(**kwargs):
     fluid = kwargs.get('fluid','Water')
     p_hi = kwargs.get('p_hi',None) * 1e6  # MPa
@@ -42,28 +89,19 @@ def rankine_superheated(**kwargs):
     pump_eff = kwargs.get('pump_eff',1.0)
     T_0 = kwargs.get('T_0', 25) + 273.15 # deg C
     p_0 = kwargs.get('p_0', 101.3) * 1e3 # kPa
+    backend = kwargs.get('backend', 'CoolProp')  # or 'HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS'
 
-    dead = State(p=p_0, T=T_0, fluid=fluid)
-    cycle = Cycle(fluid=fluid, dead=dead)
+    dead = State(p=p_0, T=T_0, fluid=fluid, backend=backend)
+    cycle = CycleGraph(fluid=fluid, dead=dead, backend=backend)
     turb = Turbine(p_hi=p_hi, p_lo=p_lo, T_hi=T_hi, eff=turb_eff, fluid=fluid, cycle=cycle)
-    turb.compute()
-    cond = Condenser(inflow=turb.outflow, p=p_lo, fluid=fluid, cycle=cycle)
-    cond.compute()
-    pump = Pump(inflow=cond.outflow, p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
-    pump.compute()  
-    boil = Boiler(inflow=pump.outflow, outflow=turb.inflow, fluid=fluid, cycle=cycle)
-    boil.compute()
-    cycle.flow_exergy()
-
-    # Define cycle properties
-    cycle.wnet = turb.work + pump.work
-    cycle.qnet = boil.heat + cond.heat
-    cycle.en_eff = cycle.wnet / boil.heat
-    cycle.bwr = -pump.work / turb.work
-    cycle.ex_eff = cycle.wnet / boil.delta_ef  # cycle exergetic eff
-
-    return cycle  
+    cond = Condenser(p=p_lo, fluid=fluid, cycle=cycle)
+    pump = Pump(p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
+    boil = Boiler(T_hi=T_hi, fluid=fluid, cycle=cycle)
+    cycle.connect(turb, cond, pump, boil, turb)
 
+    return cycle.solve()
+
+@instrumented
 def rankine_reheated(**kwargs):
     fluid = kwargs.get('fluid','Water')
     p_hi = kwargs.get('p_hi',None) * 1e6 # MPa
@@ -76,32 +114,214 @@ def rankine_reheated(**kwargs):
     pump_eff = kwargs.get('pump_eff',1.0)
     T_0 = kwargs.get('T_0', 25) + 273.15 # deg C
     p_0 = kwargs.get('p_0', 101.3) * 1e3 # kPa
+    backend = kwargs.get('backend', 'CoolProp')  # or 'HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS'
 
-    dead = State(p=p_0, T=T_0, fluid=fluid)
-    cycle = Cycle(fluid=fluid, dead=dead)
+    dead = State(p=p_0, T=T_0, fluid=fluid, backend=backend)
+    cycle = CycleGraph(fluid=fluid, dead=dead, backend=backend)
 
     # high pressure turbine
     hp_turb = Turbine(p_hi=p_hi, p_lo=p_mid, T_hi=T_hi, eff=hp_turb_eff, name='HP Turb', fluid=fluid, cycle=cycle)
-    hp_turb.compute()
-    lp_boil = Boiler(inflow=hp_turb.outflow, p=p_mid, T_hi=T_mid, name='LP Boil', fluid=fluid, cycle=cycle)
-    lp_boil.compute()
-    lp_turb = Turbine(p_hi=p_mid, p_lo=p_lo, T_hi=T_mid, eff=lp_turb_eff, name='LP Turb', fluid=fluid, cycle=cycle)
-    lp_turb.compute()
-    cond = Condenser(inflow=lp_turb.outflow, p=p_lo, fluid=fluid, cycle=cycle)
-    cond.compute()
-    pump = Pump(inflow=cond.outflow, p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
-    pump.compute()  
-    hp_boil = Boiler(inflow=pump.outflow, outflow=hp_turb.inflow, name='HP Boil', fluid=fluid, cycle=cycle)
-    hp_boil.compute()
-    cycle.flow_exergy()
-
-    # Define cycle properties
-    cycle.wnet = hp_turb.work + lp_turb.work + pump.work
-    cycle.qnet = hp_boil.heat +lp_boil.heat + cond.heat
-    cycle.en_eff = cycle.wnet / (hp_boil.heat +lp_boil.heat)
-    cycle.bwr = -pump.work / (hp_turb.work + lp_turb.work)
-    cycle.ex_eff = cycle.wnet / (hp_boil.delta_ef + lp_boil.delta_ef)  # cycle exergetic eff
-
-    return cycle   
-    
-    
+    lp_boil = Boiler(p=p_mid, T_hi=T_mid, name='LP Boil', fluid=fluid, cycle=cycle)
+    lp_turb = Turbine(p_lo=p_lo, eff=lp_turb_eff, name='LP Turb', fluid=fluid, cycle=cycle)
+    cond = Condenser(p=p_lo, fluid=fluid, cycle=cycle)
+    pump = Pump(p_hi=p_hi, eff=pump_eff, fluid=fluid, cycle=cycle)
+    hp_boil = Boiler(T_hi=T_hi, name='HP Boil', fluid=fluid, cycle=cycle)
+    cycle.connect(hp_turb, lp_boil, lp_turb, cond, pump, hp_boil, hp_turb)
+
+    return cycle.solve()
+
+
+def _stages(kwargs):
+    # stage inlet pressures in Pa, inlet temperatures in K and turbine
+    # efficiencies of rankine_multireheat, as arrays broadcast together
+    p_stages = np.asarray(kwargs.get('p_stages',None), dtype=np.float64) * 1e6  # MPa
+    T_reheat = np.asarray(kwargs.get('T_reheat',None), dtype=np.float64) + 273.15  # deg C
+    turb_effs = np.asarray(kwargs.get('turb_effs',1.0), dtype=np.float64)
+    if p_stages.ndim == 0:
+        raise ValueError('p_stages must be a sequence of stage inlet pressures')
+    return np.broadcast_arrays(p_stages, T_reheat, turb_effs)
+
+@instrumented
+def rankine_multireheat(**kwargs):
+    ''' Rankine cycle with any number of turbine stages, the steam being
+    reheated before every stage after the first.
+        p_stages = inlet pressure of each stage in MPa, highest first; the
+                   first is the boiler pressure
+        T_reheat = inlet temperature of each stage in deg C
+        turb_effs = isentropic efficiency of each stage, or one for all
+        p_lo = condenser pressure in MPa
+    The other keywords are those of rankine_superheated. With two stages the
+    cycle is that of rankine_reheated. '''
+    fluid = kwargs.get('fluid','Water')
+    p_stages, T_reheat, turb_effs = _stages(kwargs)
+    p_lo = kwargs.get('p_lo',None) * 1e6 # MPa
+    pump_eff = kwargs.get('pump_eff',1.0)
+    T_0 = kwargs.get('T_0', 25) + 273.15 # deg C
+    p_0 = kwargs.get('p_0', 101.3) * 1e3 # kPa
+    backend = kwargs.get('backend', 'CoolProp')  # or 'HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS'
+    if p_stages.ndim != 1:
+        raise ValueError('use rankine_multireheat_array for arrays of reheat schedules')
+    n = len(p_stages)
+    p_out = list(p_stages[1:]) + [p_lo]
+    if any(p_in <= p for p_in, p in zip(p_stages, p_out)):
+        raise ValueError('stage pressures must fall from p_stages[0] down to p_lo')
+
+    dead = State(p=p_0, T=T_0, fluid=fluid, backend=backend)
+    cycle = CycleGraph(fluid=fluid, dead=dead, backend=backend)
+    loop = [Turbine(p_hi=p_stages[0], p_lo=p_out[0], T_hi=T_reheat[0], eff=turb_effs[0],
+                    name='Turb 1', fluid=fluid, cycle=cycle)]
+    for i in range(1, n):
+        loop.append(Boiler(p=p_stages[i], T_hi=T_reheat[i], name='Reheat {}'.format(i),
+                           fluid=fluid, cycle=cycle))
+        loop.append(Turbine(p_lo=p_out[i], eff=turb_effs[i], name='Turb {}'.format(i + 1),
+                            fluid=fluid, cycle=cycle))
+    cond = Condenser(p=p_lo, fluid=fluid, cycle=cycle)
+    pump = Pump(p_hi=p_stages[0], eff=pump_eff, fluid=fluid, cycle=cycle)
+    boil = Boiler(T_hi=T_reheat[0], fluid=fluid, cycle=cycle)
+    cycle.connect(*(loop + [cond, pump, boil, loop[0]]))
+
+    return cycle.solve()
+
+def rankine_multireheat_array(**kwargs):
+    ''' Evaluate rankine_multireheat over arrays of reheat schedules at once.
+    Takes the same keywords as rankine_multireheat; p_stages, T_reheat and
+    turb_effs may have shape (..., n) for n stages, e.g. (1000, 3) for a
+    thousand three-stage schedules, and p_lo, pump_eff and T_0 may be arrays
+    of the leading shape. Each state of every stage is one vectorized
+    property call over all schedules. Returns a dictionary of arrays of
+    wnet, qnet, en_eff, bwr and ex_eff, with nan for schedules whose
+    pressures do not fall from stage to stage. '''
+    fluid = kwargs.get('fluid','Water')
+    p_stages, T_reheat, turb_effs = _stages(kwargs)
+    p_lo = np.asarray(kwargs.get('p_lo',None), dtype=np.float64) * 1e6 # MPa
+    pump_eff = np.asarray(kwargs.get('pump_eff',1.0), dtype=np.float64)
+    T_0 = np.asarray(kwargs.get('T_0', 25), dtype=np.float64) + 273.15 # deg C
+    backend = kwargs.get('backend', 'CoolProp')
+    shape = np.broadcast(p_stages[...,0], p_lo, pump_eff, T_0).shape
+    n = p_stages.shape[-1]
+    p_stages, T_reheat, turb_effs = [np.broadcast_to(a, shape + (n,)).reshape(-1, n)
+                                     for a in (p_stages, T_reheat, turb_effs)]
+    p_lo, pump_eff, T_0 = [np.broadcast_to(a, shape).ravel() for a in (p_lo, pump_eff, T_0)]
+    p_out = np.column_stack((p_stages[:,1:], p_lo))
+    bad = np.any(p_out >= p_stages, axis=1)
+
+    turb_work = 0.0
+    reheat = 0.0
+    reheat_delta_ef = 0.0
+    for i in range(n):
+        # stage i+1: reheated to T_reheat, then expanded to the next pressure
+        st_in = StateArray(name='{}a'.format(i + 1), fluid=fluid, backend=backend).fix(
+            'p',p_stages[:,i],'T',T_reheat[:,i])
+        if i == 0:
+            st1 = st_in
+        else:
+            reheat = reheat + st_in.h - st_out.h
+            reheat_delta_ef = reheat_delta_ef + (st_in.h - st_out.h) - T_0 * (st_in.s - st_out.s)
+        st_s = StateArray(name='{}s'.format(i + 1), fluid=fluid, backend=backend).fix(
+            's',st_in.s,'p',p_out[:,i])
+        h_out = st_in.h - turb_effs[:,i] * (st_in.h - st_s.h)
+        turb_work = turb_work + st_in.h - h_out
+        if i < n - 1:
+            # the entropy of the last stage's outflow is not needed
+            st_out = StateArray(name='{}b'.format(i + 1), fluid=fluid, backend=backend).fix(
+                'h',h_out,'p',p_out[:,i])
+    # Condenser: saturated liquid out
+    st3 = StateArray(name='3', fluid=fluid, backend=backend).fix('x',0.0,'p',p_lo)
+    cond_heat = st3.h - h_out
+    # Pump
+    pump_work = -st3.v * (p_stages[:,0] - st3.p) / pump_eff
+    st4 = StateArray(name='4', fluid=fluid, backend=backend).fix('p',p_stages[:,0],'h',st3.h-pump_work)
+    # Boiler
+    boil_heat = st1.h - st4.h
+    boil_delta_ef = boil_heat - T_0 * (st1.s - st4.s)
+
+    wnet = turb_work + pump_work
+    heat_in = boil_heat + reheat
+    res = {'wnet': wnet,
+           'qnet': heat_in + cond_heat,
+           'en_eff': wnet / heat_in,
+           'bwr': -pump_work / turb_work,
+           'ex_eff': wnet / (boil_delta_ef + reheat_delta_ef)}
+    for key in res:
+        res[key] = np.where(bad, np.nan, res[key]).reshape(shape)
+    return res
+
+def rankine_offdesign_array(**kwargs):
+    ''' Evaluate a Rankine cycle at an array of part-load flow fractions at
+    once, e.g. a load-duration curve. Takes the keywords of
+    rankine_superheated (T_hi None for a saturated turbine inlet) for the
+    design point, and
+        flow = flow fraction(s), mass flow over design mass flow
+        turb_map, pump_map = maps.PerformanceMap scaling each machine's
+                             efficiency with flow, or None
+        stodola = if True (the default) the turbine inlet pressure slides
+                  with flow by Stodola's ellipse law, with the condenser
+                  pressure held; else it follows turb_map's pressure ratio
+        mdot = design mass flow rate in kg/s
+    Each step is one vectorized property call over all the flows, as in
+    ideal_rankine_array. Returns a dictionary of arrays of p_hi (MPa),
+    turb_eff, pump_eff, wnet, qnet, en_eff, bwr, ex_eff and power (W). '''
+    fluid = kwargs.get('fluid','Water')
+    flow = np.asarray(kwargs.get('flow',1.0), dtype=np.float64)
+    p_design = kwargs.get('p_hi',None) * 1e6  # MPa
+    p_lo = kwargs.get('p_lo',None) * 1e6 # MPa
+    T_hi = kwargs.get('T_hi',None)
+    turb_eff = kwargs.get('turb_eff',1.0)
+    pump_eff = kwargs.get('pump_eff',1.0)
+    turb_map = kwargs.get('turb_map',None)
+    pump_map = kwargs.get('pump_map',None)
+    stodola = kwargs.get('stodola',True)
+    mdot = kwargs.get('mdot',1.0)
+    T_0 = kwargs.get('T_0', 25) + 273.15 # deg C
+    backend = kwargs.get('backend', 'CoolProp')
+    shape = flow.shape
+    flow = flow.ravel()
+
+    def inlet(p):
+        st = StateArray(name='1', fluid=fluid, backend=backend)
+        if T_hi is None:
+            return st.fix('p',p,'x',1.0)
+        return st.fix('p',p,'T',T_hi + 273.15)
+
+    # Turbine inlet pressure, iterating the ellipse law on the inlet p*v
+    if stodola:
+        st1 = inlet(np.full(flow.shape, p_design))
+        pv = st1.p * st1.v
+        for i in range(3):
+            p_hi = stodola_inlet_pressure(flow, p_design, p_lo, pv_ratio=st1.p * st1.v / pv)
+            st1 = inlet(p_hi)
+    else:
+        pr = turb_map.pr(flow) if turb_map is not None else np.ones_like(flow)
+        p_hi = p_design * pr
+        st1 = inlet(p_hi)
+    turb_eff = turb_eff * (turb_map.eff(flow) if turb_map is not None else 1.0)
+    pump_eff = pump_eff * (pump_map.eff(flow) if pump_map is not None else 1.0)
+
+    # Turbine
+    st2s = StateArray(name='2s', fluid=fluid, backend=backend).fix('s',st1.s,'p',p_lo)
+    h2 = turb_eff * (st2s.h - st1.h) + st1.h
+    turb_work = st1.h - h2
+    # Condenser: saturated liquid out
+    st3 = StateArray(name='3', fluid=fluid, backend=backend).fix('x',0.0,'p',np.full(flow.shape, p_lo))
+    cond_heat = st3.h - h2
+    # Pump, delivering the turbine inlet pressure
+    pump_work = -st3.v * (p_hi - st3.p) / pump_eff
+    st4 = StateArray(name='4', fluid=fluid, backend=backend).fix('p',p_hi,'h',st3.h-pump_work)
+    # Boiler
+    boil_heat = st1.h - st4.h
+    boil_delta_ef = boil_heat - T_0 * (st1.s - st4.s)
+
+    wnet = turb_work + pump_work
+    res = {'p_hi': p_hi / 1e6,
+           'turb_eff': turb_eff * np.ones_like(flow),
+           'pump_eff': pump_eff * np.ones_like(flow),
+           'wnet': wnet,
+           'qnet': boil_heat + cond_heat,
+           'en_eff': wnet / boil_heat,
+           'bwr': -pump_work / turb_work,
+           'ex_eff': wnet / boil_delta_ef,
+           'power': flow * mdot * wnet}
+    for key in res:
+        res[key] = res[key].reshape(shape)
+    return res
+
@@ -0,0 +1,182 @@
+# Cycles assembled from connected components and solved in flow order
+
+from .thermodynamics import Cycle
+from .components import connect_flow
+
+def find_loops(edges):
+    ''' Return the recycle loops of the directed graph given as a list of
+    (upstream, downstream) pairs: each strongly connected component with more
+    than one node, or with an edge back to itself, as a list of nodes. '''
+    succ = {}
+    for a, b in edges:
+        succ.setdefault(a, []).append(b)
+        succ.setdefault(b, [])
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    loops = []
+
+    def visit(v):
+        # Tarjan's algorithm
+        index[v] = low[v] = len(index)
+        stack.append(v)
+        on_stack.add(v)
+        for w in succ[v]:
+            if w not in index:
+                visit(w)
+                low[v] = min(low[v], low[w])
+            elif w in on_stack:
+                low[v] = min(low[v], index[w])
+        if low[v] == index[v]:
+            scc = []
+            while True:
+                w = stack.pop()
+                on_stack.discard(w)
+                scc.append(w)
+                if w is v:
+                    break
+            if len(scc) > 1 or v in succ[v]:
+                loops.append(scc)
+
+    for v in succ:
+        if v not in index:
+            visit(v)
+    return loops
+
+class CycleGraph(Cycle):
+    '''A Cycle built from components.py instances joined by connect(), e.g.
+
+        cycle = CycleGraph('Water', dead=dead)
+        turb = Turbine(p_hi=8e6, p_lo=2e4, cycle=cycle)
+        cond = Condenser(p=2e4, cycle=cycle)
+        pump = Pump(p_hi=8e6, cycle=cycle)
+        boil = Boiler(cycle=cycle)
+        cycle.connect(turb, cond, pump, boil, turb)
+        cycle.solve()
+
+    solve() works out the evaluation order from the connections. Each recycle
+    loop is torn at the connection into the loop's component that was added
+    to the cycle first, and that component starts from the inflow it was
+    given or defines itself (a Turbine from p_hi and T_hi, say). The loop is
+    then evaluated until the torn stream's pressure and enthalpy change by
+    less than tol (relative) between passes. A component whose own inflow
+    held from the first pass goes on defining it after solve(), so that
+    update() of its parameters recomputes the loop from there.
+
+    keyword arguments, besides those of Cycle:
+         tol = relative convergence tolerance of torn streams
+         max_iter = maximum number of passes'''
+
+    def __init__(self, fluid, **kwargs):
+        self.tol = kwargs.pop('tol', 1e-9)
+        self.max_iter = kwargs.pop('max_iter', 50)
+        Cycle.__init__(self, fluid, **kwargs)
+        self.upstream = {}    # component -> component feeding its inflow
+        self.downstream = {}  # component -> component fed by its outflow
+        self.passes = 0
+
+    def connect(self, *components):
+        ''' Connect each component's outflow to the next one's inflow, e.g.
+        connect(turb, cond, pump, boil, turb) for a closed loop. Components not
+        yet in the cycle are added to it. Returns the cycle. '''
+        for comp in components:
+            if not any(comp is p for p in self.proc_list):
+                comp.cycle = self
+                self.add_proc(comp)
+        for comp1, comp2 in zip(components[:-1], components[1:]):
+            if comp1 in self.downstream:
+                raise ValueError('{} outflow is already connected'.format(comp1.name))
+            if comp2 in self.upstream:
+                raise ValueError('{} inflow is already connected'.format(comp2.name))
+            if comp1.outflow is not None:
+                connect_flow(comp1, comp2)
+            self.downstream[comp1] = comp2
+            self.upstream[comp2] = comp1
+        return self
+
+    def order(self):
+        ''' Return (order, tears): the components in evaluation order, and
+        the (upstream, downstream) connections torn to break recycle loops '''
+        procs = self.get_procs()
+        rank = dict((p, i) for i, p in enumerate(procs))
+        edges = [(a, self.downstream[a]) for a in procs if a in self.downstream]
+        tears = []
+        loops = find_loops(edges)
+        while loops:
+            for loop in loops:
+                head = min(loop, key=rank.get)
+                tear = [e for e in edges if e[1] is head and e[0] in loop][0]
+                edges.remove(tear)
+                tears.append(tear)
+            loops = find_loops(edges)
+
+        # topological order, taking the earliest added of the ready components
+        indegree = dict((p, 0) for p in procs)
+        for a, b in edges:
+            indegree[b] += 1
+        ready = [p for p in procs if not indegree[p]]
+        order = []
+        while ready:
+            ready.sort(key=rank.get)
+            comp = ready.pop(0)
+            order.append(comp)
+            for a, b in edges:
+                if a is comp:
+                    indegree[b] -= 1
+                    if not indegree[b]:
+                        ready.append(b)
+        return order, tears
+
+    def solve(self):
+        ''' Evaluate the components, iterating until the torn streams
+        converge, then set the flow exergies, cycle totals and process
+        exergies. Returns the cycle. '''
+        order, tears = self.order()
+        defined = set()  # components whose own inflow held as the torn stream
+        for n in range(1, self.max_iter + 1):
+            done = set()
+            guesses = {}  # component after a tear -> inflow (p, h) it used
+            for comp in order:
+                up = self.upstream.get(comp)
+                if up in done:
+                    comp.inflow = up.outflow
+                    comp.release('inflow')
+                down = self.downstream.get(comp)
+                if down in done:
+                    # torn stream: overwrite the state the loop started from.
+                    # Fixing it again from the inputs it holds makes no
+                    # property calls (see State.fix).
+                    comp.adopt('outflow', down.inflow)
+                comp.compute()
+                done.add(comp)
+                if up is not None and up not in done:
+                    made = 'inflow' in comp.__dict__.get('made', ())
+                    guesses[comp] = (comp.inflow.p, comp.inflow.h, made)
+            converged = True
+            for comp, (p, h, made) in guesses.items():
+                close = self._close(comp.inflow, p, h)
+                converged &= close
+                if n == 1 and made and close:
+                    defined.add(comp)
+                comp.release('inflow')
+            if converged:
+                break
+        else:
+            raise ValueError('{} did not converge in {} passes'.format(self.name or 'cycle', self.max_iter))
+        self.passes = n
+        # a component that defines its own inflow (a Turbine from p_hi and
+        # T_hi, say) keeps it, as before the loop was torn, so that update()
+        # recomputes from its parameters
+        for comp in defined:
+            comp.adopt('inflow', comp.inflow)
+            self.upstream[comp].release('outflow')
+
+        self.flow_exergy()
+        self.compute_totals()
+        self.compute_exergy()
+        return self
+
+    def _close(self, state, p, h):
+        return (abs(state.p - p) <= self.tol * max(abs(p), 1.0) and
+                abs(state.h - h) <= self.tol * max(abs(h), 1.0))
@@ -0,0 +1,116 @@
+# Off-design performance maps of turbines and pumps
+#
+# A map gives, against the flow fraction (mass flow over design mass flow),
+# the efficiency and optionally the pressure ratio of a machine, both
+# relative to their design values, so a map is 1.0 at a flow fraction of 1.
+# Maps are read from CSV tables with the columns flow, eff and pr, e.g.
+#
+#     flow,eff,pr
+#     0.4,0.82,0.45
+#     0.7,0.95,0.72
+#     1.0,1.00,1.00
+#     1.1,0.99,1.09
+#
+# Each column is held as the coefficients of a monotone piecewise cubic
+# (Fritsch-Carlson), so evaluating an array of flows is one search and one
+# polynomial evaluation. Flows outside the table take the end values.
+
+import csv
+from .thermodynamics import LazyModule
+
+np = LazyModule('numpy')
+
+class PerformanceMap(object):
+    ''' Relative efficiency and pressure ratio of a machine against flow
+    fraction, e.g.
+
+        turb_map = PerformanceMap.load('turbine_map.csv')
+        turb = Turbine(eff=0.85, map=turb_map, flow=0.6, ...)
+
+        flow = array of flow fractions, increasing
+        eff = efficiency over design efficiency at each flow
+        pr = pressure ratio over design pressure ratio at each flow, or None
+    '''
+    def __init__(self, flow, eff, pr=None, name=''):
+        self.name = name
+        self.flow = np.asarray(flow, dtype=np.float64)
+        if self.flow.ndim != 1 or len(self.flow) < 2 or np.any(np.diff(self.flow) <= 0):
+            raise ValueError('map flows must be at least two increasing values')
+        self._eff = self._coefficients(eff)
+        self._pr = None if pr is None else self._coefficients(pr)
+
+    @classmethod
+    def load(cls, path):
+        ''' Read a map from a CSV file with a header row naming the columns
+        flow, eff and (optionally) pr '''
+        with open(path, newline='') as f:
+            rows = [row for row in csv.DictReader(f)]
+        cols = dict((key.strip(), [float(row[key]) for row in rows]) for key in rows[0])
+        order = np.argsort(cols['flow'])
+        take = lambda key: np.asarray(cols[key])[order] if key in cols else None
+        return cls(take('flow'), take('eff'), take('pr'), name=path)
+
+    def _coefficients(self, y):
+        # cubic coefficients (c0, c1, c2, c3) of each interval in powers of
+        # (flow - flow[i]), with Fritsch-Carlson slopes so that monotone data
+        # gives a monotone curve
+        x = self.flow
+        y = np.asarray(y, dtype=np.float64)
+        if y.shape != x.shape:
+            raise ValueError('map columns must have one value per flow')
+        h = np.diff(x)
+        delta = np.diff(y) / h
+        m = np.empty_like(y)
+        m[0] = delta[0]
+        m[-1] = delta[-1]
+        m[1:-1] = (delta[:-1] + delta[1:]) / 2
+        m[1:-1][delta[:-1] * delta[1:] <= 0] = 0
+        for i in range(len(delta)):
+            if delta[i] == 0:
+                m[i] = m[i+1] = 0
+            else:
+                a = m[i] / delta[i]
+                b = m[i+1] / delta[i]
+                r = a * a + b * b
+                if r > 9:
+                    m[i] = 3 * a / np.sqrt(r) * delta[i]
+                    m[i+1] = 3 * b / np.sqrt(r) * delta[i]
+        c2 = (3 * delta - 2 * m[:-1] - m[1:]) / h
+        c3 = (m[:-1] + m[1:] - 2 * delta) / h**2
+        return np.column_stack((y[:-1], m[:-1], c2, c3))
+
+    def _evaluate(self, coef, flow):
+        flow = np.clip(np.asarray(flow, dtype=np.float64), self.flow[0], self.flow[-1])
+        i = np.clip(np.searchsorted(self.flow, flow, side='right') - 1, 0, len(coef) - 1)
+        dx = flow - self.flow[i]
+        c = coef[i]
+        val = c[...,0] + dx * (c[...,1] + dx * (c[...,2] + dx * c[...,3]))
+        return val if val.ndim else float(val)
+
+    def eff(self, flow):
+        ''' Efficiency relative to design at flow fraction(s) flow '''
+        return self._evaluate(self._eff, flow)
+
+    def pr(self, flow):
+        ''' Pressure ratio relative to design at flow fraction(s) flow, or
+        1.0 if the map has none '''
+        if self._pr is None:
+            return np.ones_like(np.asarray(flow, dtype=np.float64)) if np.ndim(flow) else 1.0
+        return self._evaluate(self._pr, flow)
+
+    def has_pr(self):
+        return self._pr is not None
+
+def stodola_inlet_pressure(flow, p_in, p_out, p_out_off=None, pv_ratio=1.0):
+    ''' Turbine inlet pressure at flow fraction(s) flow by Stodola's ellipse
+    law, mdot ~ sqrt((p_in**2 - p_out**2) / (p_in * v_in)), from the design
+    inlet and outlet pressures p_in and p_out.
+        p_out_off = off-design outlet pressure, default p_out
+        pv_ratio = off-design over design p_in * v_in, 1.0 for an inlet
+                   held at the design temperature (ideal gas)
+    '''
+    if p_out_off is None:
+        p_out_off = p_out
+    flow = np.asarray(flow, dtype=np.float64)
+    p = np.sqrt(p_out_off**2 + flow**2 * pv_ratio * (p_in**2 - p_out**2))
+    return p if p.ndim else float(p)
@@ -0,0 +1,357 @@
+# Find the high-side pressure and temperature that maximize cycle or plant efficiency
+
+import math
+import CoolProp.CoolProp as CP
+from . import cycles
+from .rankine import compute_plant
+
+try:
+    import scipy.optimize
+except ImportError:  # SciPy is optional, the built-in methods are used without it
+    scipy = None
+
+GOLDEN = (3 - math.sqrt(5)) / 2
+
+# efficiencies that can be maximized, and whether they belong to the Plant
+OBJECTIVES = {'en_eff': False, 'ex_eff': False,
+              'plant_en_eff': True, 'plant_ex_eff': True}
+
+# value returned for cases that cannot be evaluated, worse than any -efficiency
+PENALTY = 1.0
+
+##############################################################################
+# ------------------- Minimizers ---------------------------------------------
+##############################################################################
+
+def golden_section(f, a, b, xtol=1e-4, maxiter=100):
+    ''' Minimize f on [a, b] by golden-section search. Returns (x, f(x)). '''
+    c = b - (1 - GOLDEN) * (b - a)
+    d = a + (1 - GOLDEN) * (b - a)
+    fc = f(c)
+    fd = f(d)
+    for i in range(maxiter):
+        if abs(b - a) <= xtol:
+            break
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - (1 - GOLDEN) * (b - a)
+            fc = f(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + (1 - GOLDEN) * (b - a)
+            fd = f(d)
+    if fc < fd:
+        return c, fc
+    return d, fd
+
+def brent(f, a, b, xtol=1e-4, maxiter=100):
+    ''' Minimize f on [a, b] with Brent's method, combining parabolic
+    interpolation with golden-section steps. Returns (x, f(x)). '''
+    x = w = v = a + GOLDEN * (b - a)
+    fx = fw = fv = f(x)
+    d = e = 0.0
+    for i in range(maxiter):
+        xm = 0.5 * (a + b)
+        tol1 = 1e-8 * abs(x) + xtol / 3
+        tol2 = 2 * tol1
+        if abs(x - xm) <= tol2 - 0.5 * (b - a):
+            break
+        golden = True
+        if abs(e) > tol1:
+            # try a parabolic step through x, w and v
+            r = (x - w) * (fx - fv)
+            q = (x - v) * (fx - fw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            if abs(p) < abs(0.5 * q * e) and q * (a - x) < p < q * (b - x):
+                e = d
+                d = p / q
+                u = x + d
+                if u - a < tol2 or b - u < tol2:
+                    d = tol1 if xm >= x else -tol1
+                golden = False
+        if golden:
+            e = (a if x >= xm else b) - x
+            d = GOLDEN * e
+        u = x + (d if abs(d) >= tol1 else math.copysign(tol1, d))
+        fu = f(u)
+        if fu <= fx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            v, fv, w, fw, x, fx = w, fw, x, fx, u, fu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if fu <= fw or w == x:
+                v, fv, w, fw = w, fw, u, fu
+            elif fu <= fv or v == x or v == w:
+                v, fv = u, fu
+    return x, fx
+
+def nelder_mead(f, x0, bounds, xtol=1e-4, ftol=1e-7, maxiter=200):
+    ''' Minimize f from x0 with the Nelder-Mead simplex method, keeping every
+    vertex inside bounds = [(lo, hi), ...]. Returns (x, f(x)). '''
+    n = len(x0)
+    def clip(x):
+        return [min(max(xi, lo), hi) for xi, (lo, hi) in zip(x, bounds)]
+    simplex = [clip(x0)]
+    for i in range(n):
+        x = list(simplex[0])
+        lo, hi = bounds[i]
+        step = 0.1 * (hi - lo)
+        x[i] = x[i] + step if x[i] + step <= hi else x[i] - step
+        simplex.append(x)
+    values = [f(x) for x in simplex]
+    for it in range(maxiter):
+        order = sorted(range(n + 1), key=lambda k: values[k])
+        simplex = [simplex[k] for k in order]
+        values = [values[k] for k in order]
+        size = max(abs(simplex[k][i] - simplex[0][i]) / (bounds[i][1] - bounds[i][0])
+                   for k in range(1, n + 1) for i in range(n))
+        if size <= xtol and abs(values[-1] - values[0]) <= ftol:
+            break
+        centroid = [sum(x[i] for x in simplex[:-1]) / n for i in range(n)]
+        def point(coef):
+            return clip([c + coef * (c - xw) for c, xw in zip(centroid, simplex[-1])])
+        xr = point(1.0)
+        fr = f(xr)
+        if fr < values[0]:
+            xe = point(2.0)
+            fe = f(xe)
+            if fe < fr:
+                simplex[-1], values[-1] = xe, fe
+            else:
+                simplex[-1], values[-1] = xr, fr
+        elif fr < values[-2]:
+            simplex[-1], values[-1] = xr, fr
+        else:
+            xc = point(0.5 if fr < values[-1] else -0.5)
+            fc = f(xc)
+            if fc < min(fr, values[-1]):
+                simplex[-1], values[-1] = xc, fc
+            else:
+                # shrink towards the best vertex
+                for k in range(1, n + 1):
+                    simplex[k] = [b + 0.5 * (x - b) for b, x in zip(simplex[0], simplex[k])]
+                    values[k] = f(simplex[k])
+    k = min(range(n + 1), key=lambda k: values[k])
+    return simplex[k], values[k]
+
+##############################################################################
+# ------------------- Cycle optimization -------------------------------------
+##############################################################################
+
+class Optimum(object):
+    ''' Result of optimize_cycle
+        x = dictionary of the optimal values of the varied inputs
+        value = the efficiency at x
+        nfev = number of cycle evaluations made (cached repeats not counted)
+        method = name of the method used
+        cycle, plant = the Cycle and (for plant objectives) Plant at x '''
+    def __init__(self, x, value, nfev, method, cycle=None, plant=None):
+        self.x = x
+        self.value = value
+        self.nfev = nfev
+        self.method = method
+        self.cycle = cycle
+        self.plant = plant
+
+    def __repr__(self):
+        return 'Optimum(x={}, value={:.6g}, nfev={}, method={!r})'.format(
+            self.x, self.value, self.nfev, self.method)
+
+class Infeasible(ValueError):
+    ''' Raised for inputs that break a constraint, by violation (> 0) '''
+    def __init__(self, message, violation):
+        ValueError.__init__(self, message)
+        self.violation = violation
+
+class CycleObjective(object):
+    ''' Callable returning minus the objective efficiency of a cycle function
+    for a vector of the varied inputs. Evaluations are memoized on the inputs
+    rounded to digits significant digits, in memo (a dict that may be shared
+    between searches). '''
+    def __init__(self, func, names, objective, kwargs, props=None, memo=None, digits=10):
+        self.func = func
+        self.names = names
+        self.objective = objective
+        self.kwargs = kwargs
+        self.props = props or {}
+        self.memo = {} if memo is None else memo
+        self.digits = digits
+        self.nfev = 0
+        self.prefix = (func.__name__, objective,
+                       tuple(sorted(kwargs.items())), tuple(sorted(self.props.items())))
+
+    def evaluate(self, x):
+        ''' Return (efficiency, cycle, plant) for the inputs x '''
+        kwargs = dict(self.kwargs)
+        kwargs.update(zip(self.names, x))
+        fluid = kwargs.get('fluid','Water')
+        # the turbine inlet must not be below the saturation temperature
+        if 'T_hi' in kwargs and 'p_hi' in kwargs:
+            t_sat = CP.PropsSI('T','P',kwargs['p_hi']*1e6,'Q',1,fluid)
+            if kwargs['T_hi'] + 273.15 <= t_sat:
+                raise Infeasible('T_hi is below the saturation temperature at p_hi',
+                                 (t_sat - kwargs['T_hi'] - 273.15) / 100 + 1e-3)
+        cycle = self.func(**kwargs)
+        plant = None
+        if OBJECTIVES[self.objective]:
+            plant = compute_plant(cycle, self.props)
+            value = getattr(plant, self.objective[len('plant_'):])
+        else:
+            value = getattr(cycle, self.objective)
+        return value, cycle, plant
+
+    def __call__(self, x):
+        key = self.prefix + tuple(float('{:.{}g}'.format(xi, self.digits)) for xi in x)
+        val = self.memo.get(key)
+        if val is None:
+            self.nfev += 1
+            try:
+                value = self.evaluate(x)[0]
+                val = PENALTY if value != value else -value
+            except Infeasible as e:
+                # grow the penalty with the violation to steer searches back
+                val = PENALTY + e.violation
+            except ValueError:
+                val = PENALTY
+            self.memo[key] = val
+        return val
+
+def feasible_bounds(bounds, fluid='Water', t_brine=None, pinch=10.0):
+    ''' Narrow the bounds on p_hi (MPa) and T_hi (deg C) so the boiler stays
+    below the critical pressure and, if a brine inlet temperature (deg C) is
+    given, pinch degrees below the brine temperature. '''
+    bounds = dict(bounds)
+    if 'p_hi' in bounds:
+        lo, hi = bounds['p_hi']
+        hi = min(hi, 0.999 * CP.PropsSI('PCRIT',fluid) / 1e6)
+        if t_brine is not None:
+            t_max = min(t_brine - pinch + 273.15, CP.PropsSI('TCRIT',fluid))
+            hi = min(hi, CP.PropsSI('P','T',t_max,'Q',1,fluid) / 1e6)
+        bounds['p_hi'] = (lo, hi)
+    if 'T_hi' in bounds and t_brine is not None:
+        lo, hi = bounds['T_hi']
+        bounds['T_hi'] = (lo, min(hi, t_brine - pinch))
+    for name, (lo, hi) in bounds.items():
+        if not lo < hi:
+            raise ValueError('No feasible values of {} within the bounds'.format(name))
+    return bounds
+
+def optimize_cycle(cycle='ideal_rankine', objective='en_eff', bounds=None, x0=None,
+                   method=None, xtol=1e-4, t_brine=None, pinch=10.0, cool_eff=1.0,
+                   memo=None, **kwargs):
+    ''' Find the inputs of a cycle function that maximize an efficiency, e.g.
+
+        opt = optimize_cycle('rankine_superheated', fluid='n-Butane', p_lo=0.3,
+                             bounds={'p_hi': (0.5, 3.7), 'T_hi': (100, 200)},
+                             objective='plant_ex_eff', t_brine=150)
+
+    arguments:
+        cycle = name of (or the) cycle function in cycles.py
+        objective = 'en_eff' or 'ex_eff' of the cycle, or 'plant_en_eff' or
+                    'plant_ex_eff' of the plant from rankine.compute_plant
+        bounds = dictionary of the varied inputs and their (lower, upper)
+                 bounds, in the units of the cycle function (MPa, deg C)
+        x0 = dictionary of starting values, default the middle of the bounds
+        method = 'brent' (default) or 'golden' for one input, 'nelder-mead'
+                 (default) or, with SciPy installed, 'slsqp' for more
+        t_brine = brine inlet temperature (deg C); keeps the boiler pinch
+                  degrees colder and is passed on to compute_plant
+        cool_eff = plant cooling efficiency passed on to compute_plant
+        memo = dictionary of evaluations to reuse, shared between calls
+        kwargs = fixed inputs passed to the cycle function
+    Returns an Optimum. '''
+    func = getattr(cycles, cycle) if isinstance(cycle, str) else cycle
+    if objective not in OBJECTIVES:
+        raise ValueError('Unknown objective {!r}'.format(objective))
+    if not bounds:
+        raise ValueError('Give bounds for at least one input to vary')
+    bounds = feasible_bounds(bounds, kwargs.get('fluid','Water'), t_brine, pinch)
+    names = list(bounds.keys())
+    props = {'cool_eff': cool_eff}
+    if t_brine is not None:
+        props['t_brine'] = t_brine
+    f = CycleObjective(func, names, objective, kwargs, props, memo)
+    limits = [bounds[name] for name in names]
+    if x0 is None:
+        start = [0.5 * (lo + hi) for lo, hi in limits]
+    else:
+        start = [min(max(x0.get(name, 0.5 * (lo + hi)), lo), hi)
+                 for name, (lo, hi) in zip(names, limits)]
+
+    if len(names) == 1:
+        method = (method or 'brent').lower()
+        lo, hi = limits[0]
+        if method == 'brent':
+            x, fx = brent(lambda x: f([x]), lo, hi, xtol)
+        elif method == 'golden':
+            x, fx = golden_section(lambda x: f([x]), lo, hi, xtol)
+        else:
+            raise ValueError('Unknown method {!r} for one input'.format(method))
+        x = [x]
+    else:
+        method = (method or 'nelder-mead').lower()
+        if method == 'nelder-mead' and scipy is None:
+            x, fx = nelder_mead(f, start, limits, xtol)
+        elif method in ('nelder-mead', 'slsqp'):
+            if scipy is None:
+                raise ValueError('The {} method needs SciPy'.format(method))
+            # SciPy works on inputs scaled to [0, 1]
+            scale = lambda y: [lo + yi * (hi - lo) for yi, (lo, hi) in zip(y, limits)]
+            y0 = [(xi - lo) / (hi - lo) for xi, (lo, hi) in zip(start, limits)]
+            options = {'xatol': xtol, 'fatol': 1e-7} if method == 'nelder-mead' else {'ftol': 1e-9}
+            res = scipy.optimize.minimize(lambda y: f(scale(y)), y0, method=method,
+                                          bounds=[(0, 1)] * len(names), options=options)
+            x, fx = scale(res.x), res.fun
+        else:
+            raise ValueError('Unknown method {!r} for several inputs'.format(method))
+
+    x = dict(zip(names, (float(xi) for xi in x)))
+    value, cyc, plant = f.evaluate([x[name] for name in names])
+    return Optimum(x, value, f.nfev, method, cyc, plant)
+
+def optimize_over_brine(t_brines, bounds=None, width=0.15, **kwargs):
+    ''' Run optimize_cycle for each brine inlet temperature in t_brines,
+    starting each search from the previous optimum and, for one input,
+    searching only width (fraction of the bounds) either side of it. The
+    search falls back to the full bounds if the optimum lands on the edge of
+    the narrowed interval. Evaluations are shared through one memo.
+    Returns a list of Optimum. '''
+    memo = kwargs.pop('memo', None)
+    if memo is None:
+        memo = {}
+    results = []
+    prev = None
+    for t_brine in t_brines:
+        full = feasible_bounds(bounds, kwargs.get('fluid','Water'), t_brine, kwargs.get('pinch',10.0))
+        opt = None
+        if prev is not None:
+            narrow = {}
+            for name, (lo, hi) in full.items():
+                w = width * (hi - lo)
+                x = min(max(prev.x[name], lo), hi)
+                narrow[name] = (max(lo, x - w), min(hi, x + w))
+            opt = optimize_cycle(bounds=narrow, x0=prev.x, t_brine=t_brine, memo=memo, **kwargs)
+            for name, (lo, hi) in narrow.items():
+                tol = 1e-3 * (hi - lo)
+                at_edge = ((abs(opt.x[name] - lo) < tol and lo > full[name][0]) or
+                           (abs(opt.x[name] - hi) < tol and hi < full[name][1]))
+                if at_edge:
+                    nfev = opt.nfev
+                    opt = optimize_cycle(bounds=full, x0=prev.x, t_brine=t_brine, memo=memo, **kwargs)
+                    opt.nfev += nfev
+                    break
+        if opt is None:
+            opt = optimize_cycle(bounds=full, t_brine=t_brine, memo=memo, **kwargs)
+        results.append(opt)
+        prev = opt
+    return results
@@ -1,13 +1,15 @@
 # Model the Rankine Cycle with Geothermal Brine Heat Source
 
 from __future__ import print_function
-import matplotlib   # for pretty pictures
-matplotlib.use('Agg') # to get matplotlib to save figures to a file instead of using X windows
-import matplotlib.pyplot as plt
 import sys
-from prettytable import PrettyTable, MSWORD_FRIENDLY, PLAIN_COLUMNS #for output formatting
-import CoolProp.CoolProp as CP
+import os
+import re
 from numbers import Number
+from . import thermodynamics
+from .thermodynamics import CP, np
+
+# matplotlib and prettytable are slow to import, so they are only imported
+# by the functions that draw plots and tables
 
 ##############################################################################
 # ------------------- Print output functions ---------------------------------
@@ -31,6 +33,9 @@ def print_output_to_screen(plant,props):
         print_process_table(plant.geo,in_kW)
         print_exergy_table(plant.geo,in_kW)
     print_plant_results(plant)
+    if getattr(plant.rank, 'report', None):
+        print('\nPerformance Report:')
+        print_report_table(plant.rank.report)
     return
 
 def print_user_values(props):
@@ -54,6 +59,7 @@ def print_user_values(props):
     return
 
 def print_state_table(cycle,in_kW=False):
+    from prettytable import PrettyTable #for output formatting
     s_list = cycle.get_states()
     s_list.append(cycle.dead)
     if in_kW:
@@ -87,6 +93,7 @@ def print_state_table(cycle,in_kW=False):
     return
 
 def print_process_table(cycle,in_kW=False):
+    from prettytable import PrettyTable
     p_list = cycle.get_procs()
     if in_kW:
         headers = ['Process','State','Q(kW)','W(kW)']
@@ -113,6 +120,7 @@ def print_process_table(cycle,in_kW=False):
     return
 
 def print_exergy_table(cycle,in_kW):
+    from prettytable import PrettyTable
     p_list = cycle.get_procs()
     if in_kW:
         headers = ['Proc','State','Ex.In(kW)','Ex.Out(kW)','Delt.Ef(kW)','Ex.D(kW)','Ex.Eff.','Ex.Bal']
@@ -146,6 +154,24 @@ def print_exergy_table(cycle,in_kW):
     print(t)
     return
 
+def print_report_table(report):
+    ''' Print the property calls and component timings of a PerfReport '''
+    from prettytable import PrettyTable
+    t = PrettyTable(['Source','Input Pair','Calls'])
+    t.align['Calls'] = 'r'
+    for item in report.as_dict()['property_calls']:
+        t.add_row([item['source'], item['pair'], item['count']])
+    t.add_row(['Total','',report.total_calls()])
+    print(t)
+    t = PrettyTable(['Component','Class','Computes','Time(ms)'])
+    for item in ['Computes','Time(ms)']:
+        t.align[item] = 'r'
+    t.float_format['Time(ms)'] = '8.3'
+    for item in report.as_dict()['components']:
+        t.add_row([item['name'], item['class'], item['computes'], item['time']*1000])
+    print(t)
+    return
+
 def print_cycle_values(cycle):
     print('\nCycle Values \n------------ ')
     print('thermal efficiency = {:2.1f}%'.format(cycle.en_eff*100))
@@ -153,6 +179,9 @@ def print_cycle_values(cycle):
     return
 
 def create_plot(cycle, props):
+    import matplotlib   # for pretty pictures
+    matplotlib.use('Agg') # to get matplotlib to save figures to a file instead of using X windows
+    import matplotlib.pyplot as plt
     p_list = cycle.get_states()
     s_list = cycle.get_states()
     superheat = s_list[3].name
@@ -247,41 +276,57 @@ def print_plant_results(plant):
     return
 
 
+# saturation domes already built, keyed by fluid
+_sat_domes = {}
+
+def sat_dome(fluid, n=200):
+    ''' Return arrays (T, s_liq, s_vap) of the saturation dome of fluid from
+    its minimum temperature up to the critical point. The temperatures are
+    spaced geometrically away from TCRIT, so the points are densest where the
+    dome closes. Each dome is kept in memory and saved in CACHE_DIR/dome so
+    later calls, and later runs, skip the property calls. '''
+    key = (fluid, n)
+    if key in _sat_domes:
+        return _sat_domes[key]
+    import CoolProp
+    dome_dir = os.path.join(thermodynamics.CACHE_DIR, 'dome')
+    filename = os.path.join(dome_dir, '{}_{}_{}.npz'.format(
+        re.sub(r'[^\w.-]', '_', fluid), n, CoolProp.__version__))
+    try:
+        with np.load(filename) as data:
+            dome = (data['T'], data['s_liq'], data['s_vap'])
+    except (IOError, OSError, KeyError, ValueError):
+        tmin = CP.PropsSI('TMIN',fluid)
+        tcrit = CP.PropsSI('TCRIT',fluid)  # critical temp for fluid
+        T = tcrit - np.geomspace(tcrit - tmin, 1e-3 * (tcrit - tmin), n)
+        s_liq = CP.PropsSI('S','T',T,'Q',np.zeros(n),fluid)
+        s_vap = CP.PropsSI('S','T',T,'Q',np.ones(n),fluid)
+        # drop any points CoolProp could not solve
+        ok = np.isfinite(s_liq) & np.isfinite(s_vap)
+        dome = (T[ok], s_liq[ok], s_vap[ok])
+        try:
+            if not os.path.isdir(dome_dir):
+                os.makedirs(dome_dir)
+            tmp = filename + '.{}.tmp.npz'.format(os.getpid())
+            np.savez(tmp, T=dome[0], s_liq=dome[1], s_vap=dome[2])
+            os.replace(tmp, filename)
+        except (IOError, OSError):
+            pass  # the in-memory copy is still used
+    _sat_domes[key] = dome
+    return dome
+
 def get_sat_dome(cycle):
     fluid = cycle.fluid
     slist = cycle.get_states()
     # find min temp to use for dome
     t_state_min = 300  # default room temp in K
-    #print('slist:',slist)
     for state in slist[:-1]:
-        #print('state.T:',state.T)
         t_state_min = min([state.T,t_state_min])
-    t_fluid_min = CP.PropsSI('TMIN',fluid)
-    #print('t_fluid_min:',t_fluid_min)
-    #print('t_state_min:',t_state_min)
-    tmin = max([t_fluid_min,t_state_min-10]) # add 10 deg cushion
-    tcrit = CP.PropsSI('TCRIT',fluid)  # critical temp for fluid
-    #print('tcrit=',tcrit,' pcrit=',pcrit,' scrit=',scrit)
-    liq_pts = []
-    vap_pts = []
-    tpts = []
-    spts = []
-
-    # for temps from tmin to tmax, find entropy at both sat liq and sat vap.
-    t = tmin  # initial temp for dome
-    dt = 1.0
-    #print('tmin:',tmin)
-    while t < tcrit:
-        s = CP.PropsSI('S','T',t,'Q',0,fluid)
-        liq_pts.append((s,t))
-        s = CP.PropsSI('S','T',t,'Q',1,fluid)
-        vap_pts.append((s,t))
-        t += dt
-    # now, unravel the liq_pts and vap_pts tuples to make the spts and tpts lists
-    for item in liq_pts:
-        spts.append(item[0])
-        tpts.append(item[1])
-    for item in vap_pts[::-1]:
-        spts.append(item[0])
-        tpts.append(item[1])
-    return spts, tpts
\ No newline at end of file
+    tmin = t_state_min - 10 # add 10 deg cushion
+    T, s_liq, s_vap = sat_dome(fluid)
+    keep = T >= tmin
+    T, s_liq, s_vap = T[keep], s_liq[keep], s_vap[keep]
+    # liquid branch up to the critical point, then the vapor branch back down
+    spts = np.concatenate((s_liq, s_vap[::-1]))
+    tpts = np.concatenate((T, T[::-1]))
+    return spts.tolist(), tpts.tolist()
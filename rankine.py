@@ -1,9 +1,9 @@
 # Model the Rankine Cycle with Geothermal Brine Heat Source
 
 from __future__ import print_function
-from .thermodynamics import State, Cycle, Geotherm, Plant  # custom thermo state class in thermodynamics.py
+from .thermodynamics import State, Cycle, Geotherm, Plant, instrumented, CP, DEAD_T  # custom thermo state class in thermodynamics.py
+from .graph import CycleGraph
 import sys
-import CoolProp.CoolProp as CP
 from numbers import Number
 from .print_rankine import print_output_to_screen
 from .components import Turbine, Condenser, Pump, Boiler, connect_flow
@@ -39,6 +39,7 @@ def main():
 
     return
 
+@instrumented
 def compute_cycle(props):
     fluid = props.get('fluid',None)
     p_hi = props.get('p_hi',None)
@@ -54,30 +55,30 @@ def compute_cycle(props):
     superheat = props.get('superheat',False)
     mdot = props.get('cycle_mdot',1.0)
     units = props.get('units','si')
+    backend = props.get('backend','CoolProp')
+    t_0 = props.get('t_0',None)  # dead state (ambient) temperature, deg C
+    t_0 = DEAD_T if t_0 is None else t_0 + 273.15  # K
+    p_0 = props.get('p_0',0.101325) * 10**6  # dead state pressure, MPa to Pa
 
     # set dead state
-    dead = State(name='Dead State',fluid=fluid)
-    print('Fluid={}'.format(fluid))
-    dead.fix('T',15+273.0, 'p', 101325.0)
+    dead = State(name='Dead State',fluid=fluid,backend=backend)
+    dead.fix('T',t_0, 'p', p_0)
     dead.ef = 0
 
     # initialize cycle
-    cyc = Cycle(fluid,name='Rankine',mdot=mdot,dead=dead)
+    cyc = CycleGraph(fluid,name='Rankine',mdot=mdot,dead=dead,backend=backend)
 
     # check to see if enough pressures and temperatures were entered
     if superheat and not(
         p_hi and
         isinstance(t_hi, Number)):
-        print('\nERROR\nIf you are superheating the fluid, specify both a high pressure and high temperature for the cycle')
-        sys.exit()
+        raise ValueError('If you are superheating the fluid, specify both a high pressure and high temperature for the cycle')
     # check to see if one high and one low value were entered
     elif not superheat:
         if not (p_hi or isinstance(t_hi,Number)):
-            print('\nERROR\nYou must enter at least one high value (temperature or pressure) for the cycle')
-            sys.exit()
+            raise ValueError('You must enter at least one high value (temperature or pressure) for the cycle')
         elif not (p_lo or isinstance(t_lo,Number)):
-            print('\nERROR\nYou must enter one low value (temperature or pressure) for the cycle.')
-            sys.exit()
+            raise ValueError('You must enter one low value (temperature or pressure) for the cycle.')
 
     # use pressures instead of temperatures when accessing CoolProp. So we
     # want to find the saturation pressures for the given temperatures and
@@ -94,88 +95,20 @@ def compute_cycle(props):
     # Define States
     # State 1, saturated vapor at high temperature
     st1 = State(cycle=cyc,name='1')
-    h_sat = CP.PropsSI('H','P',p_hi,'Q',1,fluid) #enthalpy at sat vapor
     if superheat:
         st1.fix('p',p_hi,'T',t_hi)
     else:
         st1.fix('p',p_hi,'x',1.0)
 
     turb = Turbine(inflow=st1, p_lo=p_lo, eff=turb_eff, fluid=fluid, cycle=cyc)
-    turb.compute()
-    # st2 = turb.outflow
-
-    cond = Condenser(inflow=turb.outflow, p=p_lo, fluid=fluid, cycle=cyc)
-    cond.compute()
-    # st3 = cond.outflow
-
-    pump = Pump(fluid=fluid, inflow=cond.outflow, p_hi=p_hi, eff=pump_eff, cycle=cyc)
-    pump.compute()  
-    # st4 = pump.outflow
-
-    boil = Boiler(fluid=fluid, inflow=pump.outflow, outflow=turb.inflow, cycle=cyc)
-    boil.compute()
-
-    # Calculate flow exergy values for each state in cycle
-    # cyc.compute()
-    cyc.flow_exergy()
-
-    # calculate exergy values for each process
-    # Boiler
-    boil.ex_in = boil.delta_ef
-    boil.ex_d = 0
-    boil.ex_out = 0
-    boil.ex_eff = 1
-    boil.ex_bal = boil.ex_in - boil.ex_out - boil.delta_ef - boil.ex_d
-    # add results to cycle exergy totals
-    cyc.ex_in += boil.ex_in
-    cyc.ex_d += boil.ex_d
-    cyc.ex_out += boil.ex_out
-    cyc.delta_ef += boil.delta_ef
-
-    # Turbine
-    turb.ex_in = 0
-    turb.ex_d = turb.cycle.dead.T * (turb.outflow.s - turb.inflow.s)
-    turb.ex_out = turb.work
-    turb.ex_eff = turb.ex_out / -turb.delta_ef
-    turb.ex_bal = turb.ex_in - turb.ex_out - turb.delta_ef - turb.ex_d
-    # add results to cycle exergy totals
-    cyc.ex_in += turb.ex_in
-    cyc.ex_d += turb.ex_d
-    cyc.ex_out += turb.ex_out
-    cyc.delta_ef += turb.delta_ef
-
-    # Condenser
-    cond.ex_in = 0
-    cond.ex_d = 0
-    cond.ex_out = -cond.delta_ef
-    cond.ex_eff = 1
-    cond.ex_bal = cond.ex_in - cond.ex_out - cond.delta_ef - cond.ex_d
-    # add results to cycle exergy totals
-    cyc.ex_in += cond.ex_in
-    cyc.ex_d += cond.ex_d
-    cyc.ex_out += cond.ex_out
-    cyc.delta_ef += cond.delta_ef
-
-    # Pump
-    pump.ex_out = 0
-    pump.ex_in = -pump.work
-    pump.ex_d = pump.cycle.dead.T * (pump.outflow.s - pump.inflow.s)
-    pump.ex_eff = pump.delta_ef / pump.ex_in
-    pump.ex_bal = pump.ex_in - pump.ex_out - pump.delta_ef - pump.ex_d
-    # add results to cycle exergy totals
-    cyc.ex_in += pump.ex_in
-    cyc.ex_d += pump.ex_d
-    cyc.ex_out += pump.ex_out
-    cyc.delta_ef += pump.delta_ef
-
-    # Define cycle properties
-    cyc.wnet = turb.work + pump.work
-    cyc.qnet = boil.heat + cond.heat
-    cyc.en_eff = cyc.wnet / boil.heat
-    cyc.bwr = -pump.work / turb.work
-    cyc.ex_eff = cyc.wnet / boil.delta_ef  # cycle exergetic eff
-
-    print('PUMP WORK=',pump.work)
+    cond = Condenser(p=p_lo, fluid=fluid, cycle=cyc)
+    pump = Pump(fluid=fluid, p_hi=p_hi, eff=pump_eff, cycle=cyc)
+    boil = Boiler(fluid=fluid, T_hi=t_hi if superheat else None, cycle=cyc)
+    cyc.connect(turb, cond, pump, boil, turb)
+
+    # compute the processes, flow exergy values for each state in cycle,
+    # cycle totals and exergy values for each process
+    cyc.solve()
 
     return cyc
 
@@ -185,15 +118,11 @@ def compute_plant(rank,props):
     units = props.get('units','si')
     # initialize geothermal cycle using defaults defined in object
     fluid = u'Salt Water, 20% salinity'
-    # set brine dead state
-    dead = State(cycle=None,name='Br.Dead',fluid=fluid)
-    # dead.fix('T',298.0,'p',101325.0)
-    dead.h = 61.05 * 1000 # J/kg
-    dead.s = 0.2205 * 1000 # J/kg.K
-    dead.T = 15 + 273 # K
-    dead.p = 101325 # Pa
-    dead.ef = 0
-    geo = Geotherm(fluid=fluid,dead=dead)
+    # set brine dead state, at the ambient temperature if given
+    geo = Geotherm(fluid=fluid)
+    t_0 = props.get('t_0',None)
+    geo.dead = geo.brine_state(DEAD_T if t_0 is None else t_0 + 273.15, name='Br.Dead', p=101325)
+    geo.dead.ef = 0
 
     #   Find the mass flow rate of the brine based on cooling efficiency and
     #   the heat gained by the boiler in the Rankine cycle.
@@ -203,11 +132,8 @@ def compute_plant(rank,props):
         if 'boil' in p.name.lower():
             heat = p.heat
     # create initial brine state
-    g1 = State(cycle=geo,name='Br.In')
-    g1.s = 1.492 * 1000 # J/kg.K
-    g1.h = 491.6 * 1000 # J/kg
-    g1.T = 120 + 273.15 # K
-    g1.p = 5 * 10**5    # bars to Pa
+    t_brine = props.get('t_brine',120) + 273.15  # convert deg C to K
+    g1 = geo.brine_state(t_brine, name='Br.In', cycle=geo)
     g1.flow_exergy()
     geo.inflow = g1
     # set brine mass flow rate
@@ -231,12 +157,25 @@ def interactive():
 
 if __name__ == '__main__':
     import argparse
+    from . import annual, batch, report, serve
     parser = argparse.ArgumentParser(description='Calculate the properties of a Rankine power cycle')
     parser.add_argument('-i', '--interactive', action='store_true',
                         help='interactively create and evaluate a Rankine power cycle')
+    subparsers = parser.add_subparsers(dest='command')
+    batch.add_arguments(subparsers.add_parser('batch', help=batch.DESCRIPTION, description=batch.DESCRIPTION))
+    serve.add_arguments(subparsers.add_parser('serve', help=serve.DESCRIPTION, description=serve.DESCRIPTION))
+    annual.add_arguments(subparsers.add_parser('annual', help=annual.DESCRIPTION, description=annual.DESCRIPTION))
+    report.add_arguments(subparsers.add_parser('report', help=report.DESCRIPTION, description=report.DESCRIPTION))
     args = parser.parse_args(sys.argv[1:])
-    print(args)
-    if args.interactive:
+    if args.command == 'annual':
+        annual.run(args)
+    elif args.command == 'batch':
+        batch.run(args)
+    elif args.command == 'report':
+        report.run(args)
+    elif args.command == 'serve':
+        serve.run(args)
+    elif args.interactive:
         interactive()
     else:
         main()
@@ -0,0 +1,422 @@
+# State, process and exergy tables of many cases as text, CSV or Markdown
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.rankine report cases.csv -o report.md
+#     $ python -m rankine.report cases.csv -o report.txt --table exergy --kW
+#
+# print_rankine prints the tables of one cycle with PrettyTable, which keeps
+# a Python object per cell. Here the same tables are rendered for any number
+# of cases from columnar results: structured arrays of states and processes
+# with a case field, as collect makes of cache.summarize results, or the
+# exergy ledger of sweep(ledger=True). The rows are written a chunk at a
+# time: the digits of each numeric column are worked out for the whole chunk
+# with integer arithmetic and laid, with the other cells, into one byte
+# buffer, so there are no per-row objects and memory is bounded by the chunk.
+# Rows of the same case must be contiguous; a Net row follows each case.
+
+from __future__ import print_function
+import argparse
+import os
+import re
+import sys
+import numpy as np
+from . import batch
+from .cache import STATE_DTYPE, PROCESS_DTYPE
+
+DESCRIPTION = 'write the state, process and exergy tables of many cases to a report file'
+
+FORMATS = {'.txt': 'text', '.csv': 'csv', '.md': 'markdown'}
+
+TABLES = ['states','processes','exergy']
+TITLES = {'states': 'States', 'processes': 'Process Energy', 'exergy': 'Process Exergy'}
+
+# rows formatted and written at once
+CHUNK = 65536
+
+# printf formats of numeric columns: '%d' or '%.Nf', and a literal suffix
+SPEC = re.compile(r'%(?:\.(\d+))?([df])(.*)$')
+
+def _fields(arr):
+    return arr.dtype.names if hasattr(arr, 'dtype') else tuple(arr)
+
+def _starts(arr):
+    # index of the first row of each case
+    n = len(arr['name'])
+    if 'case' not in _fields(arr):
+        return np.zeros(min(n, 1), dtype=np.intp)
+    case = np.asarray(arr['case'])
+    return np.flatnonzero(np.r_[n > 0, case[1:] != case[:-1]])
+
+def _scale(arr, mdot, in_kW):
+    # J/kg to kJ/kg, or to kW with the mass flow rate of each row's case
+    if not in_kW:
+        return 1e-3
+    mdot = np.asarray(mdot, dtype=np.float64)
+    if mdot.ndim and 'case' in _fields(arr):
+        return mdot[np.asarray(arr['case'])] * 1e-3
+    return mdot * 1e-3
+
+def _case_column(arr):
+    return [('Case', np.asarray(arr['case']), '%d')] if 'case' in _fields(arr) else []
+
+def _interleave(rows, totals, starts):
+    # rows with totals[j] placed after the last row of case j
+    n = len(rows)
+    at = np.r_[starts[1:], n] + np.arange(len(starts))
+    out = np.empty(n + len(starts), dtype=np.result_type(rows, totals))
+    keep = np.ones(len(out), dtype=bool)
+    keep[at] = False
+    out[keep] = rows
+    out[at] = totals
+    return out
+
+def _add_totals(arr, columns, totals):
+    # add a Net row to each case, from the dictionary of header -> totals
+    # of each case; other numeric columns are left nan
+    starts = _starts(arr)
+    if not len(starts):
+        return columns
+    out = []
+    for header, values, spec in columns:
+        if header == 'Case':
+            net = values[starts]
+        elif spec is None:
+            net = np.full(len(starts), 'Net')
+        else:
+            net = totals.get(header, np.full(len(starts), np.nan))
+        out.append((header, _interleave(np.asarray(values), net, starts), spec))
+    return out
+
+def state_columns(states, mdot=1.0, in_kW=False):
+    ''' Return the columns of the state table of print_state_table, a list
+    of (header, values, spec) with spec the printf format of a numeric
+    column or None for strings.
+        states = structured array (or dictionary of arrays) with the fields
+                 name, p, T, h, s, ef and x in SI units, and optionally case
+        mdot = mass flow rate, or array of them indexed by case, for in_kW
+    '''
+    f = _scale(states, mdot, in_kW)
+    if in_kW:
+        headers = ['H(kW)','S(kW/K)','Ef(kW)']
+    else:
+        headers = ['h(kJ/kg)','s(kJ/kg.K)','ef(kJ/kg)']
+    return _case_column(states) + [
+        ('State', np.asarray(states['name']), None),
+        ('P(kPa)', states['p'] / 1000, '%.0f'),
+        ('T(deg C)', states['T'] - 273, '%.2f'),
+        (headers[0], states['h'] * f, '%.2f'),
+        (headers[1], states['s'] * f, '%.5f'),
+        (headers[2], states['ef'] * f, '%.2f'),
+        ('x', np.asarray(states['x']), '%.2f')]
+
+def process_columns(processes, mdot=1.0, in_kW=False, totals=True):
+    ''' Return the columns of the process energy table of
+    print_process_table (see state_columns), with a Net row after each case
+    if totals.
+        processes = structured array (or dictionary of arrays) with the
+                    fields name, heat and work in J/kg, and optionally case
+    '''
+    f = _scale(processes, mdot, in_kW)
+    heat = processes['heat'] * f
+    work = processes['work'] * f
+    q, w = ('Q(kW)','W(kW)') if in_kW else ('Q(kJ/kg)','W(kJ/kg)')
+    columns = _case_column(processes) + [
+        ('Process', np.asarray(processes['name']), None), (q, heat, '%.1f'), (w, work, '%.1f')]
+    if totals:
+        starts = _starts(processes)
+        if len(starts):
+            columns = _add_totals(processes, columns, {q: np.add.reduceat(heat, starts),
+                                                       w: np.add.reduceat(work, starts)})
+    return columns
+
+def exergy_columns(processes, mdot=1.0, in_kW=False, totals=True):
+    ''' Return the columns of the process exergy table of
+    print_exergy_table (see state_columns), with a Net row after each case
+    if totals. processes needs the fields name, heat, work, delta_ef, ex_in,
+    ex_out, ex_d and ex_eff, and optionally ex_bal and case: an array of
+    cache.PROCESS_DTYPE or a thermodynamics.exergy_ledger. '''
+    f = _scale(processes, mdot, in_kW)
+    unit = 'kW' if in_kW else 'kJ/kg'
+    cols = dict((field, processes[field] * f) for field in ['delta_ef','ex_in','ex_out','ex_d'])
+    if 'ex_bal' in _fields(processes):
+        cols['ex_bal'] = processes['ex_bal'] * f
+    else:
+        cols['ex_bal'] = cols['ex_in'] - cols['ex_out'] - cols['delta_ef'] - cols['ex_d']
+    headers = dict((field, '{}({})'.format(name, unit)) for field, name in
+                   [('ex_in','Ex.In'), ('ex_out','Ex.Out'), ('delta_ef','Delt.Ef' if in_kW else 'delt.ef'),
+                    ('ex_d','Ex.D'), ('ex_bal','Ex.Bal')])
+    columns = _case_column(processes) + [('Proc', np.asarray(processes['name']), None)]
+    columns += [(headers[field], cols[field], '%.1f') for field in ['ex_in','ex_out','delta_ef','ex_d']]
+    columns += [('Ex.Eff.', processes['ex_eff'] * 100, '%.1f%%'), ('Ex.Bal', cols['ex_bal'], '%.1f')]
+    if totals:
+        starts = _starts(processes)
+        if len(starts):
+            sums = dict((headers[field], np.add.reduceat(cols[field], starts))
+                        for field in ['ex_in','ex_out','delta_ef','ex_d'])
+            # the cycle's exergetic efficiency, net work over the exergy
+            # taken in by the processes adding heat
+            heat_in = np.where(processes['heat'] > 0, processes['delta_ef'], 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sums['Ex.Eff.'] = (np.add.reduceat(processes['work'], starts) /
+                                   np.add.reduceat(heat_in, starts) * 100)
+            columns = _add_totals(processes, columns, sums)
+    return columns
+
+def table_columns(table, results, in_kW=False):
+    ''' Return the columns of one of TABLES from a dictionary of 'states'
+    and 'processes' arrays and optionally 'mdot' (see collect) '''
+    mdot = results.get('mdot', 1.0)
+    if table == 'states':
+        return state_columns(results['states'], mdot, in_kW)
+    if table == 'processes':
+        return process_columns(results['processes'], mdot, in_kW)
+    if table == 'exergy':
+        return exergy_columns(results['processes'], mdot, in_kW)
+    raise ValueError('unknown table {!r}, not one of {}'.format(table, TABLES))
+
+def _width(header, values, spec):
+    # widest cell of a column; a number's formatted width grows with its
+    # magnitude, so only the least and greatest values are formatted
+    if spec is None:
+        return max([len(header)] + ([int(np.char.str_len(values).max())] if len(values) else []))
+    cells = [header]
+    values = np.asarray(values)
+    real = values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+    if len(real):
+        cells += [spec % real.min(), spec % real.max()]
+    if len(real) < len(values):
+        cells.append(spec % -np.inf)
+    return max(len(cell) for cell in cells)
+
+def _quote(cells):
+    # quote the CSV fields that need it
+    need = np.zeros(cells.shape, dtype=bool)
+    for char in [',', '"', '\n']:
+        need |= np.char.find(cells, char) >= 0
+    if need.any():
+        quoted = np.char.add(np.char.add('"', np.char.replace(cells, '"', '""')), '"')
+        cells = np.where(need, quoted, cells)
+    return cells
+
+def _number(values, spec, width, pad=b' '):
+    # (n, width) array of the bytes of values formatted by spec, '%d' or
+    # '%.Nf' with an optional literal suffix, right aligned with pad bytes.
+    # The digits of whole columns come from integer arithmetic; only values
+    # that are not finite or too large for it are formatted one at a time.
+    match = SPEC.match(spec)
+    decimals = int(match.group(1) or 0)
+    suffix = (match.group(3) % ()).encode()
+    full = width
+    values = np.asarray(values)
+    n = len(values)
+    out = np.full((n, width), ord(pad), dtype=np.uint8)
+    if suffix:
+        width -= len(suffix)
+        out[:, width:] = np.frombuffer(suffix, dtype=np.uint8)
+    if values.dtype.kind in 'iu':
+        m = np.abs(values).astype(np.int64)
+        neg = values < 0
+        exact = np.ones(n, dtype=bool)
+    else:
+        values = values.astype(np.float64, copy=False)
+        scaled = np.abs(values) * 10.0**decimals
+        m = np.rint(scaled)
+        # false for nan and inf, and for values within rounding error of
+        # half a last digit, which only % rounds correctly
+        with np.errstate(invalid='ignore'):
+            exact = (m < 2.0**53) & (np.abs(np.abs(scaled - m) - 0.5) > scaled * 1e-15)
+        m = np.where(exact, m, 0).astype(np.int64)
+        neg = np.signbit(values)
+    if decimals and width > decimals:
+        out[:, width - 1 - decimals] = ord('.')
+    lead = np.full(n, width)  # column of the first digit of each row
+    i = 0
+    while i <= decimals or m.any():
+        col = width - 1 - i - (decimals > 0 and i >= decimals)
+        if col < 0:
+            exact &= m == 0
+            break
+        write = (m > 0) | (i <= decimals)
+        out[:, col] = np.where(write, (m % 10).astype(np.uint8) + ord('0'), out[:, col])
+        lead = np.where(write, col, lead)
+        m //= 10
+        i += 1
+    neg &= exact
+    exact &= ~neg | (lead > 0)
+    out[neg & exact, lead[neg & exact] - 1] = ord('-')
+    if not exact.all():
+        cells = np.char.mod(spec, values[~exact])
+        if pad == b' ':
+            cells = np.char.rjust(cells, full)
+        out[~exact] = np.frombuffer(cells.astype('S{}'.format(full)).tobytes(),
+                                    dtype=np.uint8).reshape(-1, full)
+    return out
+
+def _lines(columns, widths, fmt):
+    # the text of the rows of a chunk, laid out a column at a time in an
+    # (n, line length) array of bytes
+    n = len(columns[0][0])
+    if fmt == 'csv':
+        # cells as wide as the widest of the chunk, padded with NULs that
+        # are then removed
+        first, sep, last, pad = b'', b',', b'\n', b'\x00'
+        widths = [None] * len(columns)
+    else:
+        first, sep, last, pad = b'| ', b' | ', b' |\n', b' '
+    parts = []
+    for (values, spec), width in zip(columns, widths):
+        if spec is None:
+            cells = np.asarray(values, dtype=str)
+            cells = _quote(cells) if width is None else np.char.ljust(cells, width)
+            cells = np.ascontiguousarray(np.char.encode(cells, 'utf-8'))
+            cells = cells.view(np.uint8).reshape(n, cells.itemsize)
+        else:
+            cells = _number(values, spec, width or _width('', values, spec), pad)
+        parts.append(cells)
+    size = len(first) + len(sep) * (len(parts) - 1) + len(last) + sum(p.shape[1] for p in parts)
+    buf = np.empty((n, size), dtype=np.uint8)
+    pos = 0
+    for j, cells in enumerate(parts):
+        lit = first if j == 0 else sep
+        buf[:, pos:pos+len(lit)] = np.frombuffer(lit, dtype=np.uint8)
+        pos += len(lit)
+        buf[:, pos:pos+cells.shape[1]] = cells
+        pos += cells.shape[1]
+    buf[:, pos:] = np.frombuffer(last, dtype=np.uint8)
+    data = buf.tobytes()
+    if fmt == 'csv':
+        data = data.replace(b'\x00', b'')
+    return data.decode('utf-8')
+
+def render(columns, out, fmt='text', chunk=CHUNK):
+    ''' Write a table given as a list of (header, values, spec) columns (see
+    state_columns) to the text file out, chunk rows at a time.
+        fmt = 'text' for fixed-width columns laid out as PrettyTable does,
+              'csv' or 'markdown'
+    '''
+    if fmt not in FORMATS.values():
+        raise ValueError('unknown report format {!r}'.format(fmt))
+    headers = [header for header, values, spec in columns]
+    n = len(columns[0][1]) if columns else 0
+    widths = None
+    rule = ''
+    if fmt == 'csv':
+        out.write(','.join(headers) + '\n')
+    else:
+        widths = [_width(*col) for col in columns]
+        cells = [h.ljust(w) if spec is None else h.rjust(w)
+                 for h, w, (header, values, spec) in zip(headers, widths, columns)]
+        head = '| ' + ' | '.join(cells) + ' |\n'
+        if fmt == 'text':
+            rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+\n'
+            out.write(rule + head + rule)
+        else:
+            out.write(head + '|' + '|'.join(':' + '-' * (w + 1) if spec is None else '-' * (w + 1) + ':'
+                                            for w, (header, values, spec) in zip(widths, columns)) + '|\n')
+    for i in range(0, n, chunk):
+        out.write(_lines([(values[i:i+chunk], spec) for header, values, spec in columns], widths, fmt))
+    out.write(rule)
+
+def write_report(results, out, fmt='text', tables=TABLES, in_kW=False, chunk=CHUNK):
+    ''' Write the given TABLES of a dictionary of 'states' and 'processes'
+    arrays (see collect) to the text file out, each under its title. CSV
+    tables are only separated by a blank line. '''
+    for i, table in enumerate(tables):
+        if fmt == 'markdown':
+            out.write('{}## {}\n\n'.format('\n' if i else '', TITLES[table]))
+        elif fmt == 'text':
+            out.write('{}{}:\n'.format('\n' if i else '', TITLES[table]))
+        elif i:
+            out.write('\n')
+        render(table_columns(table, results, in_kW), out, fmt, chunk)
+
+def collect(results):
+    ''' Gather a list of results dictionaries (see cache.summarize), or None
+    for cases that failed, into the dictionary write_report takes: 'states'
+    and 'processes' arrays with a case field holding the index in results,
+    and 'mdot', the cycle mass flow rate of each case '''
+    done = [(i, result) for i, result in enumerate(results) if result is not None]
+    mdot = np.full(len(results), np.nan)
+    mdot[[i for i, result in done]] = [result['cycle']['mdot'] for i, result in done]
+    collected = {'mdot': mdot}
+    for key, dtype in [('states', STATE_DTYPE), ('processes', PROCESS_DTYPE)]:
+        arrays = [result[key] for i, result in done]
+        arr = np.empty(sum(len(a) for a in arrays), dtype=[('case','i8')] + dtype.descr)
+        if arrays:
+            arr['case'] = np.repeat([i for i, result in done], [len(a) for a in arrays])
+            joined = np.concatenate(arrays)
+            for field in dtype.names:
+                arr[field] = joined[field]
+        collected[key] = arr
+    return collected
+
+def add_arguments(parser):
+    parser.add_argument('input', nargs='?', default='-',
+                        help='CSV or JSON lines file of cases, default stdin')
+    parser.add_argument('-o', '--output',
+                        help='report file, default stdout; a CSV report of several '
+                             'tables is written to a file per table')
+    parser.add_argument('--format', choices=sorted(FORMATS.values()),
+                        help='default from the output file extension, or text')
+    parser.add_argument('--input-format', choices=['csv','jsonl'],
+                        help='default from the file extension, or sniffed')
+    parser.add_argument('-t', '--table', action='append', choices=TABLES,
+                        help='table to write, may be repeated; default all')
+    parser.add_argument('--kW', action='store_true', dest='in_kW',
+                        help='report kW with each case\'s mass flow rate instead of kJ/kg')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='compute every case instead of using the result cache')
+    return parser
+
+def run(args):
+    ''' Compute the cases and write the report described by the parsed
+    arguments of add_arguments. Returns the collected results. '''
+    from .cache import ResultCache, summarize
+    from .rankine import compute_cycle, compute_plant
+    cache = None if args.no_cache else ResultCache()
+    in_fmt = args.input_format or batch.FORMATS.get(os.path.splitext(args.input)[1].lower())
+    fin = sys.stdin if args.input == '-' else open(args.input, newline='')
+    results = []
+    failed = 0
+    try:
+        for props in batch.read_cases(fin, in_fmt):
+            try:
+                batch.check_case(props)
+                if cache is not None:
+                    results.append(cache.compute(props))
+                else:
+                    cycle = compute_cycle(props)
+                    results.append(summarize(cycle, compute_plant(cycle, props)))
+            except (ValueError, ZeroDivisionError) as e:
+                results.append(None)
+                failed += 1
+                print('case {}: {}'.format(len(results) - 1, str(e).splitlines()[0] if str(e)
+                                           else type(e).__name__), file=sys.stderr)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+    collected = collect(results)
+    tables = args.table or TABLES
+    fmt = args.format
+    if fmt is None:
+        fmt = FORMATS.get(os.path.splitext(args.output)[1].lower(), 'text') if args.output else 'text'
+    if not args.output:
+        write_report(collected, sys.stdout, fmt, tables, args.in_kW)
+    elif fmt == 'csv' and len(tables) > 1:
+        stem, ext = os.path.splitext(args.output)
+        for table in tables:
+            with open('{}-{}{}'.format(stem, table, ext or '.csv'), 'w', newline='') as f:
+                write_report(collected, f, fmt, [table], args.in_kW)
+    else:
+        with open(args.output, 'w', newline='') as f:
+            write_report(collected, f, fmt, tables, args.in_kW)
+    print('{} cases reported, {} failed'.format(len(results) - failed, failed), file=sys.stderr)
+    return collected
+
+def main(argv=None):
+    parser = add_arguments(argparse.ArgumentParser(description=DESCRIPTION))
+    return run(parser.parse_args(argv))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
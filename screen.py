@@ -0,0 +1,180 @@
+# Screen working fluids for the organic Rankine cycle against a brine inlet temperature
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.screen --t-brine 150
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import CoolProp.CoolProp as CP
+from .rankine import compute_cycle, compute_plant
+
+# columns of the ranked table
+COLUMNS = ['fluid','p_hi','p_lo','t_hi','t_lo','en_eff','ex_eff',
+           'plant_en_eff','plant_ex_eff','brine_mdot']
+
+def fluid_catalogue():
+    ''' Return the names of every pure and pseudo-pure fluid CoolProp ships '''
+    return sorted(CP.get_global_param_string('FluidsList').split(','))
+
+def check_feasible(fluid, props):
+    ''' Return the boiler and condenser pressures (Pa) and saturation
+    temperatures (K) of the cycle for fluid, or raise ValueError saying why
+    the requested pressures or temperatures are not possible. '''
+    t_brine = props.get('t_brine',120) + 273.15
+    pcrit = CP.PropsSI('PCRIT',fluid)
+    tcrit = CP.PropsSI('TCRIT',fluid)
+    ptriple = CP.PropsSI('PTRIPLE',fluid)
+    tmin = max(CP.PropsSI('TTRIPLE',fluid), CP.PropsSI('TMIN',fluid))
+
+    p_hi = props.get('p_hi',None)
+    p_lo = props.get('p_lo',None)
+    t_hi = props.get('t_hi',None)
+    t_lo = props.get('t_lo',None)
+    if p_hi:
+        p_hi = p_hi * 1e6
+        if p_hi >= pcrit:
+            raise ValueError('high pressure is above PCRIT')
+        t_hi = CP.PropsSI('T','P',p_hi,'Q',1,fluid)
+    else:
+        t_hi = t_hi + 273.15
+        if t_hi >= tcrit:
+            raise ValueError('high temperature is above TCRIT')
+        if t_hi <= tmin:
+            raise ValueError('high temperature is below the triple point')
+        p_hi = CP.PropsSI('P','T',t_hi,'Q',1,fluid)
+    if p_lo:
+        p_lo = p_lo * 1e6
+        if p_lo <= ptriple:
+            raise ValueError('low pressure is below the triple point')
+        t_lo = CP.PropsSI('T','P',p_lo,'Q',0,fluid)
+    else:
+        t_lo = t_lo + 273.15
+        if t_lo >= tcrit:
+            raise ValueError('low temperature is above TCRIT')
+        if t_lo <= tmin:
+            raise ValueError('low temperature is below the triple point')
+        p_lo = CP.PropsSI('P','T',t_lo,'Q',0,fluid)
+    if not p_lo < p_hi:
+        raise ValueError('low pressure is not below the high pressure')
+    if t_hi >= t_brine:
+        raise ValueError('boiler is not colder than the brine')
+    return p_hi, p_lo, t_hi, t_lo
+
+def screen_fluid(fluid, props):
+    ''' Evaluate compute_cycle and compute_plant for one fluid. Returns
+    (row, None) with a dict of COLUMNS, or (None, reason) if skipped. '''
+    try:
+        p_hi, p_lo, t_hi, t_lo = check_feasible(fluid, props)
+        case = dict(props)
+        case.update({'fluid': fluid, 'p_hi': p_hi / 1e6, 'p_lo': p_lo / 1e6,
+                     't_hi': None, 't_lo': None, 'superheat': False})
+        cyc = compute_cycle(case)
+        plant = compute_plant(cyc, case)
+    except ValueError as e:
+        return None, str(e).splitlines()[0] if str(e) else 'property calculation failed'
+    if not (cyc.wnet > 0 and plant.en_eff > 0):
+        return None, 'cycle produces no net work'
+    row = {'fluid': fluid, 'p_hi': p_hi / 1e6, 'p_lo': p_lo / 1e6,
+           't_hi': t_hi - 273.15, 't_lo': t_lo - 273.15,
+           'en_eff': cyc.en_eff, 'ex_eff': cyc.ex_eff,
+           'plant_en_eff': plant.en_eff, 'plant_ex_eff': plant.ex_eff,
+           'brine_mdot': plant.geo.mdot}
+    return row, None
+
+def _screen_chunk(fluids, props):
+    return [screen_fluid(fluid, props) for fluid in fluids]
+
+def screen_fluids(fluids=None, workers=None, chunksize=4, sort='plant_en_eff', **props):
+    ''' Evaluate the organic Rankine cycle and geothermal plant for every
+    fluid in fluids (default the whole CoolProp catalogue) in a process pool.
+    props are the compute_cycle/compute_plant keys. The cycle pressures come
+    from p_hi and p_lo (MPa) or, if not given, from the saturation
+    temperatures t_hi and t_lo (deg C). t_hi defaults to 10 degrees below
+    t_brine (deg C, default 120), and t_lo to 30 deg C.
+
+    Returns (ranked, skipped): ranked is a list of row dictionaries (see
+    COLUMNS) sorted by plant efficiency (or the column named by sort), ties
+    broken by the smaller brine mass flow; skipped is a list of
+    (fluid, reason) for fluids whose requested pressures are not feasible. '''
+    if fluids is None:
+        fluids = fluid_catalogue()
+    props.setdefault('t_brine', 120)
+    props.setdefault('backend', 'HEOS')
+    if not props.get('p_hi') and props.get('t_hi') is None:
+        props['t_hi'] = props['t_brine'] - 10
+    if not props.get('p_lo') and props.get('t_lo') is None:
+        props['t_lo'] = 30
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [fluids[i:i+chunksize] for i in range(0, len(fluids), chunksize)]
+
+    results = []
+    if workers == 1:
+        for chunk in chunks:
+            results.extend(_screen_chunk(chunk, props))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_screen_chunk, chunk, props) for chunk in chunks]
+            for future in futures:
+                results.extend(future.result())
+
+    ranked = []
+    skipped = []
+    for fluid, (row, reason) in zip(fluids, results):
+        if row is None:
+            skipped.append((fluid, reason))
+        else:
+            ranked.append(row)
+    ranked.sort(key=lambda row: (-row[sort], row['brine_mdot']))
+    return ranked, skipped
+
+def print_screen_table(ranked, top=None):
+    from prettytable import PrettyTable
+    headers = ['Rank','Fluid','P_hi(MPa)','P_lo(MPa)','T_hi(C)','T_lo(C)',
+               'Cyc.En.Eff','Cyc.Ex.Eff','Plant.En.Eff','Plant.Ex.Eff','Brine(kg/s)']
+    t = PrettyTable(headers)
+    for item in headers[2:]:
+        t.align[item] = 'r'
+    for i, row in enumerate(ranked[:top]):
+        t.add_row([i+1, row['fluid'],
+                   '{:.4f}'.format(row['p_hi']), '{:.4f}'.format(row['p_lo']),
+                   '{:.1f}'.format(row['t_hi']), '{:.1f}'.format(row['t_lo']),
+                   '{:.1%}'.format(row['en_eff']), '{:.1%}'.format(row['ex_eff']),
+                   '{:.1%}'.format(row['plant_en_eff']), '{:.1%}'.format(row['plant_ex_eff']),
+                   '{:.2f}'.format(row['brine_mdot'])])
+    print(t)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rank working fluids for a geothermal organic Rankine cycle')
+    parser.add_argument('--t-brine', type=float, default=120, help='brine inlet temperature (deg C)')
+    parser.add_argument('--p-hi', type=float, help='boiler pressure (MPa)')
+    parser.add_argument('--p-lo', type=float, help='condenser pressure (MPa)')
+    parser.add_argument('--t-hi', type=float, help='boiler saturation temperature (deg C), default t-brine - 10')
+    parser.add_argument('--t-lo', type=float, help='condenser saturation temperature (deg C), default 30')
+    parser.add_argument('--turb-eff', type=float, default=1.0)
+    parser.add_argument('--pump-eff', type=float, default=1.0)
+    parser.add_argument('--cool-eff', type=float, default=1.0)
+    parser.add_argument('--cycle-mdot', type=float, default=1.0, help='working fluid mass flow rate (kg/s)')
+    parser.add_argument('--fluids', help='comma separated fluids to screen, default every CoolProp fluid')
+    parser.add_argument('--sort', default='plant_en_eff', choices=['plant_en_eff','plant_ex_eff','en_eff','ex_eff'])
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    parser.add_argument('--top', type=int, help='only print the best TOP fluids')
+    args = parser.parse_args(argv)
+    fluids = args.fluids.split(',') if args.fluids else None
+    props = {}
+    for key in ['t_brine','p_hi','p_lo','t_hi','t_lo','turb_eff','pump_eff','cool_eff','cycle_mdot']:
+        if getattr(args, key) is not None:
+            props[key] = getattr(args, key)
+    ranked, skipped = screen_fluids(fluids, workers=args.workers, sort=args.sort, **props)
+    print_screen_table(ranked, args.top)
+    print('{} fluids ranked, {} skipped'.format(len(ranked), len(skipped)))
+    for fluid, reason in skipped:
+        print('  skipped {}: {}'.format(fluid, reason))
+    return ranked, skipped
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,290 @@
+# Serve cycle evaluations over a local socket from a warm worker pool
+#
+# Run from the directory containing the package with
+#
+#     $ python -m rankine.rankine serve --port 8750 --workers 4
+#     $ python -m rankine.serve --unix /tmp/rankine.sock
+#
+# Clients send one JSON object per line, a props dictionary with the keys
+# compute_cycle and compute_plant take (see batch.INPUTS) and optionally an
+# "id". The server answers each with one line holding the id, the
+# batch.RESULTS, an error message for cases that failed and the latency in
+# seconds from receiving the request to sending the answer. Answers to a
+# connection may come back out of order, so give requests an id. A line
+# {"stats": true} is answered with the latency statistics of the server.
+#
+# Requests are queued and sent to the worker processes in batches. At most
+# max_pending requests wait in the queue; once it is full the server stops
+# reading from the connections until the workers catch up. On close the
+# requests already queued are still answered before the workers shut down.
+
+from __future__ import print_function
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .batch import evaluate
+
+DESCRIPTION = 'serve cycle evaluations as JSON lines over a local socket'
+
+PORT = 8750
+
+# evaluated by each worker process as it starts, to import CoolProp and load
+# its fluid data before the first request arrives
+WARM_CASE = {'fluid': 'Water', 'p_hi': 4.0, 'p_lo': 0.01}
+
+def _warm(cases):
+    for props in cases:
+        evaluate(props)
+
+def _ready():
+    return os.getpid()
+
+def _evaluate_batch(cases):
+    return [evaluate(props) for props in cases]
+
+class Server(object):
+    '''Evaluates requests read from local socket connections in a pool of
+    worker processes, e.g.
+
+        server = Server(workers=4)
+        await server.start(port=8750)
+        await server.serve_forever()
+
+    keyword arguments:
+         workers = number of worker processes, default os.cpu_count()
+         batch_size = most requests sent to a worker at once
+         batch_wait = seconds to wait for a batch to fill
+         max_pending = most requests queued before reading stops
+         max_batches = most batches being evaluated at once, default workers
+         warm = props dictionaries each worker evaluates as it starts
+         log = file object a line per request is written to, or None'''
+
+    def __init__(self, **kwargs):
+        self.workers = kwargs.get('workers', None) or os.cpu_count() or 1
+        self.batch_size = kwargs.get('batch_size', 16)
+        self.batch_wait = kwargs.get('batch_wait', 0.002)
+        self.max_pending = kwargs.get('max_pending', 256)
+        self.max_batches = kwargs.get('max_batches', None) or self.workers
+        self.warm = kwargs.get('warm', [WARM_CASE])
+        self.log = kwargs.get('log', None)
+        self.pool = None
+        self.server = None
+        self.queue = None
+        self.slots = None
+        self.batcher = None
+        self.evaluating = set()
+        self.count = 0
+        self.errors = 0
+        self.batches = 0
+        self.throttled = 0
+        self.latencies = collections.deque(maxlen=10000)
+
+    async def start(self, host='127.0.0.1', port=PORT, path=None):
+        ''' Start the worker processes, wait until each has warmed up, then
+        listen on the Unix socket path if given, or else on host and port.
+        Returns the address listened on. '''
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm,
+                                        initargs=(self.warm,))
+        # one call per worker, submitted together so that every worker starts
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _ready)
+                               for i in range(self.workers)])
+        self.queue = asyncio.Queue(self.max_pending)
+        self.slots = asyncio.Semaphore(self.max_batches)
+        self.batcher = loop.create_task(self._batch())
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port)
+        return self.server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        ''' Stop listening, answer the requests already queued and wait for
+        the batches being evaluated, then shut down the worker processes
+        without blocking the event loop '''
+        if self.server is not None:
+            self.server.close()
+        if self.batcher is not None:
+            if not self.batcher.done():
+                await self.queue.join()
+            self.batcher.cancel()
+        if self.evaluating:
+            await asyncio.wait(self.evaluating)
+        if self.pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.pool.shutdown)
+
+    async def handle(self, reader, writer):
+        ''' Answer the requests of one connection '''
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                start = time.perf_counter()
+                try:
+                    props = json.loads(line)
+                    if not isinstance(props, dict):
+                        raise ValueError('request is not a JSON object')
+                except ValueError as e:
+                    self._reply(writer, {'id': None, 'error': str(e)}, start)
+                    continue
+                if props.get('stats'):
+                    writer.write((json.dumps(self.stats()) + '\n').encode())
+                    continue
+                rid = props.pop('id', None)
+                future = asyncio.get_running_loop().create_future()
+                # backpressure: no more lines are read while the queue is full
+                if self.queue.full():
+                    self.throttled += 1
+                await self.queue.put((props, future))
+                task = asyncio.ensure_future(self._answer(writer, rid, future, start))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, writer, rid, future, start):
+        reply = {'id': rid}
+        reply.update(await future)
+        self._reply(writer, reply, start)
+        await writer.drain()
+
+    def _reply(self, writer, reply, start):
+        reply['latency'] = time.perf_counter() - start
+        self.count += 1
+        self.errors += reply['error'] is not None
+        self.latencies.append(reply['latency'])
+        if self.log is not None:
+            print('{} {:.2f} ms{}'.format(reply['id'], reply['latency']*1e3,
+                  ' ' + reply['error'] if reply['error'] else ''), file=self.log)
+        writer.write((json.dumps(reply) + '\n').encode())
+
+    async def _batch(self):
+        # collect queued requests into batches and hand them to the pool,
+        # with at most max_batches being evaluated at once
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            await self.slots.acquire()
+            task = loop.create_task(self._evaluate(batch))
+            self.evaluating.add(task)
+            task.add_done_callback(self.evaluating.discard)
+            for item in batch:
+                self.queue.task_done()
+
+    async def _evaluate(self, batch):
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.pool, _evaluate_batch, [props for props, future in batch])
+        except Exception as e:
+            results = [{'error': '{}: {}'.format(type(e).__name__, e)}] * len(batch)
+        finally:
+            self.slots.release()
+        self.batches += 1
+        for (props, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        ''' Return the number of requests answered, errors and batches, the
+        number of reads held back by a full queue, and the latency
+        percentiles in seconds of the last 10000 requests '''
+        times = sorted(self.latencies)
+        stats = {'requests': self.count, 'errors': self.errors, 'batches': self.batches,
+                 'throttled': self.throttled, 'queued': self.queue.qsize() if self.queue else 0}
+        if times:
+            stats['latency'] = dict((name, times[min(int(q * len(times)), len(times) - 1)])
+                                    for name, q in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)])
+            stats['latency']['mean'] = sum(times) / len(times)
+            stats['latency']['max'] = times[-1]
+        return stats
+
+async def query(cases, host='127.0.0.1', port=PORT, path=None):
+    ''' Send props dictionaries to a server over one connection and return
+    the answers in the order of cases '''
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i, props in enumerate(cases):
+            request = dict(props, id=i)
+            writer.write((json.dumps(request) + '\n').encode())
+        await writer.drain()
+        answers = [None] * len(cases)
+        for i in range(len(cases)):
+            answer = json.loads(await reader.readline())
+            answers[answer['id']] = answer
+        return answers
+    finally:
+        writer.close()
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=PORT, help='TCP port to listen on')
+    parser.add_argument('--unix', metavar='PATH', help='listen on this Unix socket instead')
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    parser.add_argument('--batch-size', type=int, default=16,
+                        help='most requests sent to a worker at once')
+    parser.add_argument('--batch-wait', type=float, default=2.0,
+                        help='milliseconds to wait for a batch to fill')
+    parser.add_argument('--max-pending', type=int, default=256,
+                        help='most requests queued before reading stops')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='print the latency of each request')
+    return parser
+
+def run(args):
+    ''' Serve until interrupted, with the parsed arguments of add_arguments '''
+    server = Server(workers=args.workers, batch_size=args.batch_size,
+                    batch_wait=args.batch_wait / 1e3, max_pending=args.max_pending,
+                    log=sys.stderr if args.verbose else None)
+
+    async def serve():
+        try:
+            address = await server.start(args.host, args.port, args.unix)
+            print('serving on {} with {} workers'.format(address, server.workers), file=sys.stderr)
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return server.stats()
+
+def main(argv=None):
+    parser = add_arguments(argparse.ArgumentParser(description=DESCRIPTION))
+    return run(parser.parse_args(argv))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+# Parametric sweeps of the Rankine cycle functions over grids of inputs
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from . import cycles
+from .thermodynamics import LEDGER_DTYPE
+
+# cycle results collected for every case
+RESULTS = ['en_eff','bwr','wnet','qnet','ex_eff']
+
+def grid(**ranges):
+    ''' Return the Cartesian product of the parameter ranges as a list of
+    keyword dictionaries for the cycle functions. A scalar is treated as a
+    range of one value. Cases are ordered with the last parameter varying
+    fastest, the same as nested for loops in keyword order. '''
+    names = list(ranges.keys())
+    values = []
+    for name in names:
+        val = ranges[name]
+        if isinstance(val, str) or not hasattr(val, '__iter__'):
+            val = [val]
+        values.append(list(val))
+    return [dict(zip(names, case)) for case in itertools.product(*values)]
+
+def run_case(func, kwargs, ledger=False):
+    ''' Evaluate one cycle and return its results as a tuple in RESULTS
+    order. Cases CoolProp cannot solve give nan for every result. With
+    ledger=True, returns (results, exergy ledger) instead, the ledger being
+    None for cases that could not be solved. '''
+    try:
+        cycle = func(**kwargs)
+    except ValueError:
+        results = (np.nan,) * len(RESULTS)
+        return (results, None) if ledger else results
+    results = tuple(getattr(cycle, name) for name in RESULTS)
+    return (results, cycle.exergy_ledger()) if ledger else results
+
+def _run_chunk(func_name, cases, ledger=False):
+    func = getattr(cycles, func_name)
+    return [run_case(func, kwargs, ledger) for kwargs in cases]
+
+def sweep(cycle='ideal_rankine', workers=None, chunksize=None, ledger=False, **ranges):
+    ''' Evaluate a cycle function from cycles.py over the Cartesian grid of
+    the given parameter ranges, e.g.
+
+        res = sweep('rankine_superheated', fluid='Water',
+                    p_hi=np.linspace(2, 10, 20), p_lo=0.01,
+                    T_hi=[400, 450, 500], turb_eff=[0.8, 0.85, 0.9])
+
+    arguments:
+        cycle = name of (or the) cycle function in cycles.py
+        workers = number of worker processes, default os.cpu_count(). Use
+                  1 to run every case in this process.
+        chunksize = number of cases sent to a worker per task, default
+                    splits the grid into about 4 tasks per worker
+        ledger = if True, also return the exergy ledgers of every case
+        ranges = parameter ranges (or scalars) passed as keywords to the
+                 cycle function
+
+    Returns a dictionary of columns: a NumPy array for each parameter and
+    each of RESULTS, in grid() order no matter which worker ran a case.
+    With ledger=True, 'ledger' holds the rows of every case's exergy ledger
+    in one structured array whose case field is the case's grid index. '''
+    func_name = cycle if isinstance(cycle, str) else cycle.__name__
+    cases = grid(**ranges)
+    n = len(cases)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not chunksize:
+        chunksize = max(1, -(-n // (4 * workers)))
+    chunks = [cases[i:i+chunksize] for i in range(0, n, chunksize)]
+
+    rows = []
+    if workers == 1:
+        for chunk in chunks:
+            rows.extend(_run_chunk(func_name, chunk, ledger))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, func_name, chunk, ledger) for chunk in chunks]
+            # collect in submission order to keep the grid order
+            for future in futures:
+                rows.extend(future.result())
+
+    result = {}
+    if ledger:
+        ledgers = []
+        for i, (results, case_ledger) in enumerate(rows):
+            if case_ledger is not None:
+                case_ledger['case'] = i
+                ledgers.append(case_ledger)
+        result['ledger'] = np.concatenate(ledgers) if ledgers else np.empty(0, LEDGER_DTYPE)
+        rows = [results for results, case_ledger in rows]
+    for name in ranges:
+        result[name] = np.array([case[name] for case in cases])
+    values = np.array(rows, dtype=np.float64).reshape(n, len(RESULTS))
+    for i, name in enumerate(RESULTS):
+        result[name] = np.ascontiguousarray(values[:,i])
+    return result
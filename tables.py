@@ -0,0 +1,398 @@
+# Memory-mapped property tables, the 'TABLE' State backend
+#
+# Build the table of a fluid, and print its interpolation error against the
+# Helmholtz EOS, from the directory containing the package with
+#
+#     $ python -m rankine.tables Water n-Butane
+#
+# A table file holds, on a grid of pressures spaced evenly in log p, the
+# saturation curves and the liquid and vapor properties on grids in (p, h)
+# and (p, s). The h and s columns of each row are spaced evenly between the
+# row's lowest (T_lo) or highest (T_hi) temperature and saturation, so cell
+# edges fall on the saturation curves. Processes map the file read-only and
+# share one copy of it in the page cache.
+
+from __future__ import print_function
+import json
+import math
+import os
+import re
+import struct
+import sys
+import numpy as np
+from . import thermodynamics
+from .thermodynamics import CP
+
+MAGIC = b'RNKTABLE'
+FORMAT_VERSION = 1
+
+# densities are kept as logarithms (lnd), which interpolate far better in
+# the vapor, where density is close to proportional to pressure
+SAT = ['T_sat','h_l','h_v','s_l','s_v','lnd_l','lnd_v','h_lo','h_hi','s_lo','s_hi']
+GRIDS = ['ph_liq_T','ph_liq_s','ph_liq_lnd','ph_vap_T','ph_vap_s','ph_vap_lnd',
+         'ps_liq_T','ps_liq_h','ps_liq_lnd','ps_vap_T','ps_vap_h','ps_vap_lnd']
+
+# tables already mapped, keyed by path
+_tables = {}
+
+def table_path(fluid, directory=None):
+    ''' File of the fluid's table, in directory (default CACHE_DIR/mmap) '''
+    import CoolProp
+    if directory is None:
+        directory = os.path.join(thermodynamics.CACHE_DIR, 'mmap')
+    return os.path.join(directory, '{}_CoolProp{}_v{}.rkt'.format(
+        re.sub(r'[^\w.-]', '_', fluid), CoolProp.__version__, FORMAT_VERSION))
+
+def get_table(fluid, directory=None):
+    ''' Return the PropertyTable of fluid, mapping its file, which is built
+    first if it does not exist '''
+    path = table_path(fluid, directory)
+    table = _tables.get(path)
+    if table is None:
+        if not os.path.exists(path):
+            build_table(fluid, path)
+        table = _tables[path] = PropertyTable.load(path)
+    return table
+
+class PropertyTable(object):
+    ''' Property grids of one fluid. flash() interpolates them for the same
+    properties State.flash returns.
+        header = dictionary of the grid bounds, sizes and error report
+        arrays = dictionary of the SAT (1D) and GRIDS (2D) arrays
+    '''
+    def __init__(self, header, arrays):
+        self.header = header
+        self.fluid = header['fluid']
+        self.n_p = header['n_p']
+        self.n_y = header['n_y']
+        self.lp0 = math.log(header['p_min'])
+        self.dlp = (math.log(header['p_max']) - self.lp0) / (self.n_p - 1)
+        self.arrays = arrays
+        self.error = header.get('error')
+
+    @classmethod
+    def load(cls, path):
+        ''' Map the table file read-only '''
+        with open(path, 'rb') as f:
+            magic, version, size = struct.unpack('<8sII', f.read(16))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError('{} is not a version {} property table'.format(path, FORMAT_VERSION))
+            header = json.loads(f.read(size).decode('utf-8'))
+        data = np.memmap(path, dtype='<f8', mode='r', offset=header['offset'])
+        # plain ndarray views of the map index faster than the memmap
+        data = data.view(np.ndarray)
+        arrays = {}
+        start = 0
+        for name, shape in header['arrays']:
+            size = int(np.prod(shape))
+            arrays[name] = data[start:start+size].reshape(shape)
+            start += size
+        return cls(header, arrays)
+
+    def save(self, path):
+        ''' Write the table to path, replacing any file there atomically '''
+        names = [(name, list(self.arrays[name].shape)) for name in SAT + GRIDS]
+        header = dict(self.header, arrays=names)
+        # start the arrays on the first 64 byte boundary after the header
+        header['offset'] = 0
+        text = b''
+        while 16 + len(text) > header['offset']:
+            header['offset'] = -(-(16 + len(text)) // 64) * 64
+            text = json.dumps(header).encode('utf-8')
+        text += b' ' * (header['offset'] - 16 - len(text))
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp = path + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(struct.pack('<8sII', MAGIC, FORMAT_VERSION, len(text)))
+            f.write(text)
+            for name in SAT + GRIDS:
+                f.write(np.ascontiguousarray(self.arrays[name], dtype='<f8').tobytes())
+        os.replace(tmp, path)
+
+    def _row(self, p):
+        # row index and weight of pressure p
+        t = (math.log(p) - self.lp0) / self.dlp
+        if not 0 <= t <= self.n_p - 1:
+            raise ValueError('p = {} Pa is outside the {} property table'.format(p, self.fluid))
+        i = min(int(t), self.n_p - 2)
+        return i, t - i
+
+    def _across(self, f, i, w):
+        # interpolate f(row) between rows i and i+1, cubic (Lagrange) away
+        # from the end rows, since the saturation curves bend sharply
+        # toward the critical point
+        if 0 < i < self.n_p - 2:
+            f0, f1, f2, f3 = f(i-1), f(i), f(i+1), f(i+2)
+            return (f1 + w * (-f0/3 - f1/2 + f2 - f3/6
+                              + w * ((f0 + f2)/2 - f1
+                                     + w * ((f3 - f0)/6 + (f1 - f2)/2))))
+        f1 = f(i)
+        return f1 + w * (f(i+1) - f1)
+
+    def _sat(self, name, i, w):
+        return self._across(self.arrays[name].item, i, w)
+
+    def _grid(self, name, i, w, u):
+        # interpolate at row weight w and column position u (0-1), linear
+        # along the row
+        a = self.arrays[name]
+        c = u * (self.n_y - 1)
+        j = min(int(c), self.n_y - 2)
+        wc = c - j
+        def col(k):
+            v = a.item(k, j)
+            return v + wc * (a.item(k, j+1) - v)
+        return self._across(col, i, w)
+
+    def _invert(self, name, i, w, val):
+        # column position u where the interpolated row of name equals val
+        a = self.arrays[name]
+        def row(j):
+            return self._across(lambda k: a.item(k, j), i, w)
+        lo, hi = 0, self.n_y - 1
+        v_lo, v_hi = row(lo), row(hi)
+        if not v_lo <= val <= v_hi:
+            raise ValueError('{} = {} is outside the {} property table'.format(name[-1], val, self.fluid))
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            v_mid = row(mid)
+            if v_mid <= val:
+                lo, v_lo = mid, v_mid
+            else:
+                hi, v_hi = mid, v_mid
+        return (lo + (val - v_lo) / (v_hi - v_lo)) / (self.n_y - 1)
+
+    def _props(self, p, T, h, s, d, x):
+        return {'T': T, 'p': p, 'd': d, 'v': 1/d, 'u': h - p/d, 'h': h, 's': s, 'x': x}
+
+    def _saturated(self, p, x, i, w):
+        T = self._sat('T_sat', i, w)
+        h_l, h_v = self._sat('h_l', i, w), self._sat('h_v', i, w)
+        s_l, s_v = self._sat('s_l', i, w), self._sat('s_v', i, w)
+        v_l, v_v = math.exp(-self._sat('lnd_l', i, w)), math.exp(-self._sat('lnd_v', i, w))
+        return self._props(p, T, h_l + x*(h_v - h_l), s_l + x*(s_v - s_l), 1/(v_l + x*(v_v - v_l)), x)
+
+    def _flash_py(self, p, y, kind):
+        # fix from pressure and enthalpy (kind 'h') or entropy (kind 's')
+        i, w = self._row(p)
+        y_l = self._sat(kind + '_l', i, w)
+        y_v = self._sat(kind + '_v', i, w)
+        if y < y_l:
+            phase = 'liq'
+            y_lo = self._sat(kind + '_lo', i, w)
+            u = (y - y_lo) / (y_l - y_lo)
+        elif y > y_v:
+            phase = 'vap'
+            y_hi = self._sat(kind + '_hi', i, w)
+            u = (y - y_v) / (y_hi - y_v)
+        else:
+            return self._saturated(p, (y - y_l) / (y_v - y_l), i, w)
+        if not 0 <= u <= 1:
+            raise ValueError('{} = {} is outside the {} property table'.format(kind, y, self.fluid))
+        prefix = 'p' + kind + '_' + phase + '_'
+        other = 's' if kind == 'h' else 'h'
+        T = self._grid(prefix + 'T', i, w, u)
+        d = math.exp(self._grid(prefix + 'lnd', i, w, u))
+        if kind == 'h':
+            return self._props(p, T, y, self._grid(prefix + 's', i, w, u), d, -1.0)
+        return self._props(p, T, self._grid(prefix + 'h', i, w, u), y, d, -1.0)
+
+    def _flash_pT(self, p, T):
+        i, w = self._row(p)
+        phase = 'liq' if T < self._sat('T_sat', i, w) else 'vap'
+        u = self._invert('ph_' + phase + '_T', i, w, T)
+        prefix = 'ph_' + phase + '_'
+        if phase == 'liq':
+            h_lo, h_hi = self._sat('h_lo', i, w), self._sat('h_l', i, w)
+        else:
+            h_lo, h_hi = self._sat('h_v', i, w), self._sat('h_hi', i, w)
+        return self._props(p, T, h_lo + u*(h_hi - h_lo), self._grid(prefix + 's', i, w, u),
+                           math.exp(self._grid(prefix + 'lnd', i, w, u)), -1.0)
+
+    def _sat_pressure(self, T):
+        # invert the saturation temperature curve, linear in each row's log p
+        a = self.arrays['T_sat']
+        lo, hi = 0, self.n_p - 1
+        if not a.item(lo) <= T <= a.item(hi):
+            raise ValueError('T = {} K is outside the {} property table'.format(T, self.fluid))
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if a.item(mid) <= T:
+                lo = mid
+            else:
+                hi = mid
+        t = lo + (T - a.item(lo)) / (a.item(hi) - a.item(lo))
+        return math.exp(self.lp0 + t * self.dlp)
+
+    def flash(self, prop1, val1, prop2, val2):
+        ''' Return a dictionary of T, p, d, v, u, h, s and x (-1 for a single
+        phase) from two of p, T, h, s and x. Raises ValueError for other
+        pairs or states outside the table. '''
+        given = {prop1: float(val1), prop2: float(val2)}
+        if 'Q' in given:
+            given['x'] = given.pop('Q')
+        if 'p' in given:
+            p = given['p']
+            if 'h' in given:
+                return self._flash_py(p, given['h'], 'h')
+            if 's' in given:
+                return self._flash_py(p, given['s'], 's')
+            if 'x' in given:
+                i, w = self._row(p)
+                return self._saturated(p, given['x'], i, w)
+            if 'T' in given:
+                return self._flash_pT(p, given['T'])
+        elif 'T' in given and 'x' in given:
+            p = self._sat_pressure(given['T'])
+            i, w = self._row(p)
+            return self._saturated(p, given['x'], i, w)
+        raise ValueError('the TABLE backend cannot fix a state from {} and {}'.format(prop1, prop2))
+
+def _resample(y_dense, columns, dense, n_y):
+    # interpolate the dense columns at n_y values of y evenly spaced in each row
+    out = dict((name, np.empty((len(y_dense), n_y))) for name in columns)
+    for k in range(len(y_dense)):
+        y = np.linspace(y_dense[k,0], y_dense[k,-1], n_y)
+        for name in columns:
+            out[name][k] = np.interp(y, y_dense[k], dense[name][k])
+    return out
+
+def build_table(fluid, path=None, n_p=400, n_y=200, dense=2, p_min=None, p_max=None,
+                T_lo=None, T_hi=None, n_check=2000):
+    ''' Compute the property table of fluid with the Helmholtz EOS, check
+    its interpolation error at n_check random states and save it to path
+    (default table_path(fluid)). Returns the PropertyTable.
+
+    arguments:
+        n_p = number of pressures, spaced evenly in log p
+        n_y = number of h (and s) columns in each of the liquid and vapor grids
+        dense = each row is computed at dense * n_y temperatures, then
+                interpolated at the n_y columns
+        p_min, p_max = pressure range (Pa), default from the saturation
+                       pressure at T_lo to 0.98 PCRIT
+        T_lo, T_hi = temperature range (K), default from the triple point to
+                     the lower of TMAX and 1.5 TCRIT '''
+    if path is None:
+        path = table_path(fluid)
+    heos = 'HEOS::' + fluid
+    tcrit = CP.PropsSI('TCRIT', fluid)
+    if T_lo is None:
+        T_lo = max(CP.PropsSI('TTRIPLE', fluid), CP.PropsSI('TMIN', fluid)) + 0.01
+    if T_hi is None:
+        T_hi = min(CP.PropsSI('TMAX', fluid), 1.5 * tcrit)
+    if p_min is None:
+        p_min = 1.001 * CP.PropsSI('P', 'T', T_lo, 'Q', 0, heos)
+    if p_max is None:
+        p_max = 0.98 * CP.PropsSI('PCRIT', fluid)
+    p = np.exp(np.linspace(math.log(p_min), math.log(p_max), n_p))
+
+    arrays = {}
+    for q, phase in [(0, 'l'), (1, 'v')]:
+        sat = CP.PropsSI(['T','H','S','D'], 'P', p, 'Q', np.full(n_p, float(q)), heos)
+        arrays['T_sat'] = sat[:,0]
+        arrays['h_' + phase], arrays['s_' + phase], arrays['lnd_' + phase] = sat[:,1], sat[:,2], np.log(sat[:,3])
+
+    # rows of dense temperatures up to (liquid) or from (vapor) saturation,
+    # with the saturated end point taken from the saturation curve
+    m = dense * n_y
+    g = np.linspace(0, 1, m)
+    T_sat = arrays['T_sat'][:,None]
+    for phase, T, end in [('liq', T_lo + (T_sat - T_lo) * g[None,:-1], 'l'),
+                          ('vap', T_sat + (T_hi - T_sat) * g[None,1:], 'v')]:
+        P = np.broadcast_to(p[:,None], T.shape)
+        # imposing the phase also solves the liquid close to the triple point
+        imposed = 'P|liquid' if phase == 'liq' else 'P|gas'
+        hsd = CP.PropsSI(['H','S','D'], imposed, P.ravel(), 'T', T.ravel(), heos).reshape(T.shape + (3,))
+        sat = [arrays['T_sat'], arrays['h_' + end], arrays['s_' + end], np.exp(arrays['lnd_' + end])]
+        cols = [T] + [hsd[...,k] for k in range(3)]
+        if phase == 'liq':
+            cols = [np.hstack((c, s[:,None])) for c, s in zip(cols, sat)]
+        else:
+            cols = [np.hstack((s[:,None], c)) for c, s in zip(cols, sat)]
+        dense_cols = {'T': cols[0], 'h': cols[1], 's': cols[2], 'lnd': np.log(cols[3])}
+        if not all(np.isfinite(c).all() for c in cols):
+            raise ValueError('CoolProp could not compute every {} state of {}'.format(phase, fluid))
+        ph = _resample(dense_cols['h'], ['T','s','lnd'], dense_cols, n_y)
+        ps = _resample(dense_cols['s'], ['T','h','lnd'], dense_cols, n_y)
+        for name in ph:
+            arrays['ph_' + phase + '_' + name] = ph[name]
+        for name in ps:
+            arrays['ps_' + phase + '_' + name] = ps[name]
+        if phase == 'liq':
+            arrays['h_lo'], arrays['s_lo'] = dense_cols['h'][:,0], dense_cols['s'][:,0]
+        else:
+            arrays['h_hi'], arrays['s_hi'] = dense_cols['h'][:,-1], dense_cols['s'][:,-1]
+
+    import CoolProp
+    header = {'fluid': fluid, 'coolprop': CoolProp.__version__, 'n_p': n_p, 'n_y': n_y,
+              'p_min': float(p_min), 'p_max': float(p_max), 'T_lo': float(T_lo), 'T_hi': float(T_hi)}
+    table = PropertyTable(header, arrays)
+    if n_check:
+        table.error = table.header['error'] = table_error(table, n_check)
+    table.save(path)
+    return table
+
+def table_error(table, n=2000, seed=0):
+    ''' Compare the table with the Helmholtz EOS at n random states for each
+    of the (p, h) and (p, s) grids, spread evenly in log p and in h (or s)
+    across the liquid, two-phase and vapor regions. Returns a dictionary of
+    the maximum and RMS errors of each interpolated property, e.g.
+    error['ph']['s']['max']: relative errors of T and d, and errors of h
+    (J/kg) and s (J/kg.K), whose zero is arbitrary. '''
+    rng = np.random.RandomState(seed)
+    heos = 'HEOS::' + table.fluid
+    p = np.exp(table.lp0 + rng.uniform(0, 1, n) * table.dlp * (table.n_p - 1))
+    frac = rng.uniform(0, 1, n)
+    error = {}
+    for kind, outputs in [('h', ['T','s','d']), ('s', ['T','h','d'])]:
+        y = np.empty(n)
+        for k in range(n):
+            i, w = table._row(p[k])
+            y_lo, y_hi = table._sat(kind + '_lo', i, w), table._sat(kind + '_hi', i, w)
+            y[k] = y_lo + frac[k] * (y_hi - y_lo)
+        ref = CP.PropsSI([name.upper() for name in outputs], 'P', p, kind.upper(), y, heos)
+        ok = np.all(np.isfinite(ref), axis=1)
+        got = np.array([[table._flash_py(p[k], y[k], kind)[name] for name in outputs]
+                        for k in range(n) if ok[k]])
+        ref = ref[ok]
+        error['p' + kind] = {'points': int(ok.sum())}
+        for c, name in enumerate(outputs):
+            if name in ('T', 'd'):
+                err = np.abs(got[:,c] / ref[:,c] - 1)
+            else:
+                err = np.abs(got[:,c] - ref[:,c])
+            error['p' + kind][name] = {'max': float(err.max()), 'rms': float(np.sqrt(np.mean(err**2)))}
+    return error
+
+def print_error(table):
+    print('{} property table, {} x {} grids, max (RMS) error against HEOS:'.format(
+        table.fluid, table.n_p, table.n_y))
+    units = {'T': '', 'd': '', 'h': ' J/kg', 's': ' J/kg.K'}
+    for grid in ['ph', 'ps']:
+        err = table.error[grid]
+        print('  ({}, {}): '.format(grid[0], grid[1]) + ', '.join(
+            '{} {:.1e}{} ({:.1e})'.format(name, err[name]['max'], units[name], err[name]['rms'])
+            for name in ['T','h','s','d'] if name in err))
+    print('  (errors of T and d are relative)')
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Build memory-mapped property tables')
+    parser.add_argument('fluids', nargs='+')
+    parser.add_argument('--directory', help='default CACHE_DIR/mmap')
+    parser.add_argument('--n-p', type=int, default=400, help='number of pressures')
+    parser.add_argument('--n-y', type=int, default=200, help='number of h (and s) columns per phase')
+    parser.add_argument('--force', action='store_true', help='rebuild existing tables')
+    args = parser.parse_args(argv)
+    for fluid in args.fluids:
+        path = table_path(fluid, args.directory)
+        if args.force or not os.path.exists(path):
+            build_table(fluid, path, n_p=args.n_p, n_y=args.n_y)
+        table = PropertyTable.load(path)
+        print_error(table)
+        print('  saved in {}'.format(path))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
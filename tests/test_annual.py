@@ -0,0 +1,50 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import io
+from pytest import approx
+from .. import annual
+from ..rankine import compute_cycle, compute_plant
+
+CASE = dict(annual.DEFAULT_CASE, cond_approach=10)
+
+def weather(n):
+    lines = ['hour,t_0,t_brine']
+    for i in range(n):
+        lines.append('{},{},{}'.format(i, 10 + (i % 4) * 0.02 + (i % 8 > 3) * 5, 120 + i % 3))
+    return '\n'.join(lines) + '\n'
+
+def test_hour_props():
+    sim = annual.Simulation(CASE)
+    props = sim.hour_props({'t_0': 12.345, 't_brine': 130.04})
+    assert props['t_0'] == 12.3 and props['t_lo'] == 22.3 and props['t_brine'] == 130.0
+
+def test_simulation():
+    sim = annual.Simulation(CASE)
+    records = list(sim.run(annual.batch.read_cases(io.StringIO(weather(24)))))
+    totals = sim.totals()
+    # t_0 rounds to 10.0, 10.1, 15.0 and 15.1
+    assert totals['rows'] == 24 and totals['failed'] == 0 and totals['cycles_computed'] == 4
+    props = dict(CASE, t_0=15.1, t_lo=25.1, t_brine=121.0)
+    cyc = compute_cycle(props)
+    plant = compute_plant(cyc, props)
+    assert records[7]['power'] == approx(cyc.mdot * cyc.wnet / 1e3)
+    assert records[7]['ex_eff'] == approx(plant.ex_eff)
+    assert totals['energy'] == approx(sum(r['power'] for r in records) / 1e3)
+    assert totals['power_min'] < totals['power_mean'] < totals['power_max']
+    assert totals['en_eff'] == approx(totals['energy'] / totals['brine_heat'])
+
+def test_main(tmp_path, capsys):
+    infile = tmp_path / 'weather.csv'
+    infile.write_text(weather(8) + '8,200,120\n')
+    outfile = tmp_path / 'hourly.csv'
+    totals = annual.main([str(infile), '-o', str(outfile), '--case', '{"fluid": "n-Butane", "p_hi": 3.5, "cond_approach": 10}'])
+    assert totals['rows'] == 9 and totals['failed'] == 1
+    lines = outfile.read_text().splitlines()
+    assert lines[0].split(',')[:3] == ['hour', 't_0', 't_brine'] and len(lines) == 10
+    assert 'MWh' in capsys.readouterr().out
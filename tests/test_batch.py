@@ -0,0 +1,79 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import io
+import json
+from pytest import approx
+from .. import batch
+from ..rankine import compute_cycle, compute_plant
+
+CSV = '''fluid,p_hi,p_lo,turb_eff,pump_eff,superheat,t_brine
+n-Butane,3.5,0.3,0.8,0.75,false,
+Isobutane,2.0,0.4,0.85,0.8,false,130
+Water,,,0.8,0.75,false,
+'''
+
+def test_read_cases():
+    cases = list(batch.read_cases(io.StringIO(CSV)))
+    assert cases[0] == {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8,
+                        'pump_eff': 0.75, 'superheat': False}
+    assert cases[1]['t_brine'] == 130
+    lines = io.StringIO('\n'.join(json.dumps(case) for case in cases) + '\n')
+    assert list(batch.read_cases(lines)) == cases
+
+def test_run_batch():
+    cases = batch.read_cases(io.StringIO(CSV))
+    records = list(batch.run_batch(cases, workers=1, chunksize=2))
+    assert [r['case'] for r in records] == [0, 1, 2]
+    props = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8, 'pump_eff': 0.75}
+    plant = compute_plant(compute_cycle(props), props)
+    assert records[0]['plant_en_eff'] == approx(plant.en_eff)
+    assert records[0]['error'] is None
+    # no pressures or temperatures given
+    assert records[2]['wnet'] is None and 'high value' in records[2]['error']
+
+def test_evaluate_bad_case():
+    assert batch.evaluate({'fluid': 'Water', 'p_hi': 'high', 'p_lo': 0.01})['error'] == \
+        "p_hi must be a number, not 'high'"
+    assert 'fluid must be a string' in batch.evaluate({'fluid': 3, 'p_hi': 4.0, 'p_lo': 0.01})['error']
+    assert 'not a dictionary' in batch.evaluate(['Water', 4.0, 0.01])['error']
+
+def test_main_bad_lines(tmp_path):
+    infile = tmp_path / 'cases.jsonl'
+    infile.write_text('\n'.join([
+        '{"fluid": "n-Butane", "p_hi": 3.5, "p_lo": 0.3}', '["Water", 4.0, 0.01]', '42',
+        '{"fluid": "Water", "p_hi": 4.0,', '{"fluid": "Water", "p_hi": 4.0, "p_lo": 0.01}']) + '\n')
+    outfile = tmp_path / 'results.jsonl'
+    for workers in ['1', '2']:
+        assert batch.main([str(infile), '-o', str(outfile), '--workers', workers, '--ordered']) == 5
+        records = [json.loads(line) for line in outfile.read_text().splitlines()]
+        assert [r['case'] for r in records] == list(range(5))
+        assert [r['error'] is None for r in records] == [True, False, False, False, True]
+        assert 'not a dictionary' in records[1]['error'] and 'not a dictionary' in records[2]['error']
+        assert records[3]['error'].startswith('line 4: ') and records[3]['wnet'] is None
+        assert records[4]['wnet'] > 0
+
+def test_run_batch_pool():
+    cases = [{'fluid': 'n-Butane', 'p_hi': p_hi, 'p_lo': 0.3} for p_hi in [2.0, 2.5, 3.0, 3.5, 4.0]]
+    serial = list(batch.run_batch(cases, workers=1))
+    records = list(batch.run_batch(iter(cases), workers=2, chunksize=1, ordered=True))
+    assert [r['case'] for r in records] == list(range(5))
+    assert [r['wnet'] for r in records] == approx([r['wnet'] for r in serial])
+    records = batch.run_batch(iter(cases), workers=2, chunksize=2)
+    assert sorted(r['case'] for r in records) == list(range(5))
+
+def test_main_csv(tmp_path):
+    infile = tmp_path / 'cases.csv'
+    infile.write_text(CSV)
+    outfile = tmp_path / 'results.csv'
+    assert batch.main([str(infile), '-o', str(outfile), '--workers', '1']) == 3
+    lines = outfile.read_text().splitlines()
+    header = lines[0].split(',')
+    assert header[:2] == ['case', 'fluid'] and header[-1] == 'error'
+    assert len(lines) == 4
+    assert lines[2].split(',')[header.index('t_brine')] == '130.0'
@@ -0,0 +1,49 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+from ..benchmarks.suite import run, compare, time_call, percentile
+
+def test_percentile():
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 50) == 3.0
+    assert percentile([1.0, 2.0], 90) == pytest.approx(1.9)
+
+def test_time_call():
+    res = time_call(lambda: None, min_time=0.0, min_repeat=20)
+    assert res['repeat'] == 20
+    assert res['min'] <= res['p50'] <= res['p90'] <= res['p99'] <= res['max']
+    assert res['ops_sec'] == pytest.approx(1 / res['mean'])
+
+def test_compare_reports_regressions():
+    results = run(['State.fix[p-x]'], min_time=0.0)
+    assert list(results['results']) == ['State.fix[p-x]']
+    ops = results['results']['State.fix[p-x]']['ops_sec']
+    faster = {'results': {'State.fix[p-x]': {'ops_sec': 2 * ops}}}
+    slower = {'results': {'State.fix[p-x]': {'ops_sec': 0.5 * ops}}}
+    assert compare(results, slower, threshold=0.1) == []
+    [(name, base, new, change)] = compare(results, faster, threshold=0.1)
+    assert name == 'State.fix[p-x]' and change == pytest.approx(-0.5)
+
+def test_state_fix_benchmarks_make_property_calls():
+    from ..thermodynamics import PerfReport
+    from ..benchmarks import bench_state_fix
+    from ..benchmarks.suite import BENCHMARKS
+    funcs = [setup() for name, setup in BENCHMARKS if name.startswith('State.fix')]
+    funcs += [bench_state_fix.fix_call(*case, abstract_state=abstract_state)
+              for case in bench_state_fix.CASES for abstract_state in [False, True]]
+    for func in funcs:
+        func()
+        with PerfReport() as report:
+            func()
+        assert report.total_calls() > 0
+
+def test_compute_modules_import_fast():
+    from ..benchmarks.bench_import import time_import
+    res = time_import()
+    assert res['loaded'] == []
+    assert res['time'] < 1.0
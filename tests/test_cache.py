@@ -0,0 +1,64 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import os
+from pytest import approx
+from .. import cache as cache_module
+from ..cache import ResultCache, cache_key, normalize
+from ..rankine import compute_cycle
+
+PROPS = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8, 'pump_eff': 0.75}
+
+def test_cache_key():
+    assert normalize({'fluid': 'Water', 'p_hi': 4})['p_hi'] == 4.0
+    assert cache_key(PROPS) == cache_key(dict(PROPS, p_hi=3.5, cool_eff=1, units='si'))
+    assert cache_key(PROPS) != cache_key(dict(PROPS, p_lo=0.31))
+    assert cache_key(PROPS) != cache_key(dict(PROPS, backend='HEOS'))
+    # results of other code are not read back
+    key = cache_key(PROPS)
+    cache_module._code_version = '0' * 64
+    try:
+        assert cache_key(PROPS) != key
+    finally:
+        cache_module._code_version = None
+    assert cache_key(PROPS) == key
+
+def test_cache_hit(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    result = cache.compute(PROPS)
+    assert cache.misses == 1
+    cyc = compute_cycle(PROPS)
+    assert result['cycle']['en_eff'] == approx(cyc.en_eff)
+    assert list(result['processes']['name']) == [p.name for p in cyc.get_procs()]
+
+    # a new process reads the file
+    other = ResultCache(str(tmp_path))
+    hit = other.compute(dict(PROPS, units='si'))
+    assert other.hits == 1 and other.misses == 0
+    assert hit['cycle'] == approx(result['cycle'])
+    assert hit['plant'] == approx(result['plant'])
+    assert hit['states']['s'] == approx(result['states']['s'])
+    assert hit['processes']['ex_d'] == approx(result['processes']['ex_d'])
+    assert other.compute(PROPS) is hit
+
+def test_cache_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), memory=0)
+    cases = [dict(PROPS, p_hi=p_hi) for p_hi in [2.0, 2.5, 3.0, 3.5]]
+    last = dict(PROPS, p_hi=1.5)
+    for props in cases:
+        cache.compute(props)
+    size = cache.size()
+    cache.max_bytes = size * 0.6
+    for i, props in enumerate(cases):
+        os.utime(cache.path(cache_key(props)), (i + 1, i + 1))  # cases[0] least recently used
+    cache.compute(last)
+    assert cache.evictions and cache.size() <= 0.8 * cache.max_bytes
+    assert cache.get(cases[0]) is None
+    assert cache.get(last) is not None
+    cache.clear()
+    assert cache.size() == 0
@@ -1,6 +1,9 @@
 
+import pytest
+import numpy as np
 from pytest import approx
-from ..cycles import ideal_rankine, rankine_superheated, rankine_reheated
+from ..cycles import ideal_rankine, rankine_superheated, rankine_reheated, ideal_rankine_array
+from ..cycles import rankine_multireheat, rankine_multireheat_array
 
 def test_ideal_rankine_butane():
     fluid = 'n-Butane'
@@ -73,4 +76,201 @@ def test_rankine_reheat_2():
         fluid=fluid)
     assert cycle.en_eff == approx(0.373, abs=1e-3)
     assert cycle.bwr == approx(0.006, abs=1e-3)
-    assert cycle.wnet == approx(1336.7e3, rel=1e-3)
\ No newline at end of file
+    assert cycle.wnet == approx(1336.7e3, rel=1e-3)
+
+
+REFERENCE_CASES = [
+    (ideal_rankine, dict(fluid='n-Butane', p_hi=3.5, p_lo=0.3, turb_eff=0.8, pump_eff=0.75)),
+    (ideal_rankine, dict(fluid='Water', p_hi=8.0, p_lo=0.020)),
+    (rankine_superheated, dict(fluid='Water', p_hi=4.0, p_lo=0.010, T_hi=400)),
+    (rankine_superheated, dict(fluid='Water', p_hi=3.0, p_lo=0.050, T_hi=400)),
+    (rankine_reheated, dict(fluid='Water', p_hi=4.0, p_mid=0.4, p_lo=0.010, T_hi=400, T_mid=400)),
+    (rankine_reheated, dict(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440, T_mid=440)),
+]
+
+@pytest.mark.parametrize('backend', ['HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS'])
+def test_backend_deviation(backend):
+    max_dev = 0.0
+    for func, kwargs in REFERENCE_CASES:
+        ref = func(**kwargs)
+        cycle = func(backend=backend, **kwargs)
+        for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+            dev = abs(getattr(cycle, attr) / getattr(ref, attr) - 1)
+            max_dev = max(max_dev, dev)
+    print('max relative deviation of {} from PropsSI/HEOS: {:.2e}'.format(backend, max_dev))
+    assert max_dev < 1e-3
+
+def test_ideal_rankine_array():
+    p_hi = np.array([3.5, 8.0, 2.0])
+    p_lo = np.array([0.3, 0.02, 0.01])
+    turb_eff = np.array([0.8, 1.0, 0.85])
+    pump_eff = np.array([0.75, 1.0, 0.9])
+    res = ideal_rankine_array(fluid='Water', p_hi=p_hi, p_lo=p_lo,
+        turb_eff=turb_eff, pump_eff=pump_eff)
+    for i in range(len(p_hi)):
+        cycle = ideal_rankine(fluid='Water', p_hi=p_hi[i], p_lo=p_lo[i],
+            turb_eff=turb_eff[i], pump_eff=pump_eff[i])
+        for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+            assert res[attr][i] == approx(getattr(cycle, attr), rel=1e-6)
+
+def test_rankine_multireheat():
+    ref = rankine_reheated(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440, T_mid=440,
+        hp_turb_eff=0.9, lp_turb_eff=0.85, pump_eff=0.8)
+    cycle = rankine_multireheat(fluid='Water', p_stages=[8.0, 1.0], T_reheat=[440, 440],
+        p_lo=0.020, turb_effs=[0.9, 0.85], pump_eff=0.8)
+    assert [p.name for p in cycle.get_procs()] == ['Turb 1', 'Reheat 1', 'Turb 2', 'Condenser', 'Pump', 'Boiler']
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+
+def test_rankine_multireheat_array():
+    p_stages = np.array([[12.0, 3.0, 0.6], [16.0, 4.0, 1.0], [16.0, 2.0, 0.4], [12.0, 14.0, 1.0]])
+    T_reheat = [520, 500, 480]
+    res = rankine_multireheat_array(fluid='Water', p_stages=p_stages, T_reheat=T_reheat,
+        p_lo=0.01, turb_effs=0.85, pump_eff=0.8)
+    assert res['wnet'].shape == (4,)
+    for i in range(3):
+        cycle = rankine_multireheat(fluid='Water', p_stages=p_stages[i], T_reheat=T_reheat,
+            p_lo=0.01, turb_effs=0.85, pump_eff=0.8)
+        for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+            assert res[attr][i] == approx(getattr(cycle, attr), rel=1e-6)
+    # pressures rising between stages
+    assert np.isnan(res['wnet'][3])
+    with pytest.raises(ValueError):
+        rankine_multireheat(fluid='Water', p_stages=p_stages[3], T_reheat=T_reheat, p_lo=0.01)
+
+def test_update_pump_eff_only_recomputes_downstream():
+    kwargs = dict(fluid='Water', p_hi=4.0, p_lo=0.010, T_hi=400)
+    cycle = rankine_superheated(pump_eff=1.0, **kwargs)
+    recomputed = cycle.update('Pump', eff=0.7)
+    assert [p.name for p in recomputed] == ['Pump', 'Boiler']
+    ref = rankine_superheated(pump_eff=0.7, **kwargs)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+
+def test_update_reheat_lp_boiler():
+    kwargs = dict(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440)
+    cycle = rankine_reheated(T_mid=440, **kwargs)
+    recomputed = cycle.update('LP Boil', T_hi=480 + 273.15)
+    # the condenser outflow is still saturated liquid at p_lo, so the pump
+    # and HP boiler are left alone
+    assert [p.name for p in recomputed] == ['LP Boil', 'LP Turb', 'Condenser']
+    ref = rankine_reheated(T_mid=480, **kwargs)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+
+def test_update_turbine_inlet():
+    kwargs = dict(fluid='Water', p_hi=4.0, p_lo=0.010)
+    cycle = rankine_superheated(T_hi=400, **kwargs)
+    recomputed = cycle.update('Turbine', T_hi=500 + 273.15)
+    # the turbine still fixes its inlet, which the boiler reads
+    assert [p.name for p in recomputed] == ['Turbine', 'Condenser', 'Boiler']
+    ref = rankine_superheated(T_hi=500, **kwargs)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+    # the shared pressure reaches the pump as well as the turbine
+    recomputed = cycle.update('Turbine', p_hi=6e6)
+    assert [p.name for p in recomputed] == ['Turbine', 'Condenser', 'Pump', 'Boiler']
+    ref = rankine_superheated(fluid='Water', p_hi=6.0, p_lo=0.010, T_hi=500)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+
+def test_update_forwards_to_owner():
+    kwargs = dict(fluid='Water', p_hi=8.0, p_lo=0.008, turb_eff=0.85, pump_eff=0.8)
+    cycle = rankine_superheated(T_hi=480, **kwargs)
+    # the turbine fixes its inlet, so the boiler's T_hi is passed on to it
+    recomputed = cycle.update('Boiler', T_hi=560 + 273.15)
+    assert [p.name for p in recomputed] == ['Turbine', 'Condenser', 'Boiler']
+    ref = rankine_superheated(T_hi=560, **kwargs)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+    # a change of p_lo moves every state at the condenser pressure
+    cycle = rankine_reheated(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440, T_mid=440)
+    cycle.update('Condenser', p=1e4)
+    ref = rankine_reheated(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.010, T_hi=440, T_mid=440)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+    # no component fixes the boiler inlet from a temperature
+    with pytest.raises(ValueError):
+        cycle.update('HP Boil', T_lo=400)
+
+def test_set_dead():
+    from ..thermodynamics import State, PerfReport
+    kwargs = dict(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440, T_mid=440,
+                  hp_turb_eff=0.85, lp_turb_eff=0.85, pump_eff=0.8)
+    cycle = rankine_reheated(**kwargs)
+    ref = rankine_reheated(T_0=5, **kwargs)
+    dead = State(fluid='Water', p=101.3e3, T=5 + 273.15)
+    with PerfReport() as report:
+        cycle.set_dead(dead)
+    assert report.total_calls() == 0
+    for attr in ['wnet', 'en_eff', 'ex_eff', 'ex_in', 'ex_out', 'delta_ef', 'ex_d']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+    for proc, ref_proc in zip(cycle.get_procs(), ref.get_procs()):
+        for attr in ['delta_ef', 'ex_d', 'ex_eff', 'ex_bal']:
+            assert getattr(proc, attr) == approx(getattr(ref_proc, attr), rel=1e-9, abs=1e-6)
+
+    res = cycle.dead_state_sweep(np.array([5, 15, 35]) + 273.15, 101.3e3)
+    assert res['ex_eff'][0] == approx(ref.ex_eff, rel=1e-9)
+    assert res['proc_ex_d'][0] == approx([p.ex_d for p in ref.get_procs()])
+    assert res['ex_d'][2] == approx(rankine_reheated(T_0=35, **kwargs).ex_d, rel=1e-9)
+
+def test_set_dead_state_exergy():
+    # the cycles of cycles.py list no states; compute_cycle's lists state 1
+    from ..rankine import compute_cycle
+    props = {'fluid': 'Water', 'p_hi': 8.0, 'p_lo': 0.02, 'turb_eff': 0.85, 'pump_eff': 0.8}
+    cycle = compute_cycle(props)
+    ref = compute_cycle(dict(props, t_0=5))
+    assert len(cycle.get_states()) > 0
+    ef = [st.ef for st in ref.get_states()]
+    assert [st.ef for st in cycle.get_states()] != approx(ef)
+    cycle.set_dead(ref.dead)
+    assert [st.ef for st in cycle.get_states()] == approx(ef, rel=1e-9)
+    assert cycle.ex_eff == approx(ref.ex_eff, rel=1e-9)
+
+    res = cycle.dead_state_sweep(np.array([5, 35]) + 273.15, ref.dead.p)
+    assert res['ef'].shape == (2, len(cycle.get_states()))
+    assert res['ef'][0] == approx(ef, rel=1e-9)
+    ref = compute_cycle(dict(props, t_0=35))
+    assert res['ef'][1] == approx([st.ef for st in ref.get_states()], rel=1e-9)
+
+def test_plant_set_dead():
+    from ..rankine import compute_cycle, compute_plant
+    from ..thermodynamics import DEAD_T
+    props = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8, 'pump_eff': 0.75, 'cool_eff': 0.25}
+    plant = compute_plant(compute_cycle(props), props)
+    # moving to the default dead state changes nothing
+    ex_eff, en_eff = plant.ex_eff, plant.en_eff
+    plant.set_dead(DEAD_T)
+    assert plant.rank.dead.T == 288.0
+    assert (plant.ex_eff, plant.en_eff) == (approx(ex_eff, rel=1e-12), approx(en_eff, rel=1e-12))
+    props['t_0'] = 25
+    ref = compute_plant(compute_cycle(props), props)
+    plant.set_dead(25 + 273.15)
+    assert plant.rank.ex_eff == approx(ref.rank.ex_eff, rel=1e-9)
+    assert plant.geo.mdot == approx(ref.geo.mdot, rel=1e-9)
+    assert plant.en_eff == approx(ref.en_eff, rel=1e-9)
+    assert plant.ex_eff == approx(ref.ex_eff, rel=1e-9)
+
+def test_exergy_ledger():
+    from ..thermodynamics import ROLES
+    cycle = rankine_reheated(fluid='Water', p_hi=8.0, p_mid=1.0, p_lo=0.020, T_hi=440, T_mid=440,
+                             hp_turb_eff=0.85, lp_turb_eff=0.85, pump_eff=0.8)
+    ledger = cycle.exergy_ledger()
+    assert list(ledger['name']) == [p.name for p in cycle.get_procs()]
+    assert [ROLES[r] for r in ledger['role']] == ['work out', 'heat in', 'work out', 'heat out', 'work in', 'heat in']
+    for row, proc in zip(ledger, cycle.get_procs()):
+        for field in ['delta_ef', 'ex_in', 'ex_out', 'ex_d', 'ex_eff']:
+            assert row[field] == approx(getattr(proc, field))
+    assert ledger['ex_bal'] == approx(np.zeros(6), abs=1e-6)
+    assert ledger['ex_d'].sum() == approx(cycle.ex_d)
+
+def test_ideal_rankine_array_ledger():
+    p_hi = np.array([3.5, 8.0])
+    res = ideal_rankine_array(fluid='Water', p_hi=p_hi, p_lo=0.02, turb_eff=0.85, pump_eff=0.8, ledger=True)
+    ledger = res['ledger']
+    assert len(ledger) == 8 and list(ledger['case']) == [0] * 4 + [1] * 4
+    cycle = ideal_rankine(fluid='Water', p_hi=8.0, p_lo=0.02, turb_eff=0.85, pump_eff=0.8)
+    ref = cycle.exergy_ledger()
+    assert list(ledger['name'][4:]) == list(ref['name'])
+    for field in ['work', 'heat', 'delta_ef', 'ex_in', 'ex_out', 'ex_d', 'ex_eff']:
+        assert ledger[field][4:] == approx(ref[field], rel=1e-6, abs=1e-6)
@@ -0,0 +1,51 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+from pytest import approx
+from ..thermodynamics import State
+from ..components import Turbine, Condenser, Pump, Boiler
+from ..graph import CycleGraph, find_loops
+from ..cycles import rankine_superheated
+
+def test_find_loops():
+    assert find_loops([('a','b'), ('b','c')]) == []
+    loops = find_loops([('a','b'), ('b','c'), ('c','a'), ('c','d'), ('d','d')])
+    assert sorted(sorted(loop) for loop in loops) == [['a','b','c'], ['d']]
+
+def make_cycle(turb_T_hi=None):
+    dead = State(p=101.3e3, T=298.15, fluid='Water')
+    cycle = CycleGraph('Water', dead=dead)
+    turb = Turbine(p_hi=4e6, p_lo=1e4, T_hi=turb_T_hi, cycle=cycle)
+    cond = Condenser(p=1e4, cycle=cycle)
+    pump = Pump(p_hi=4e6, cycle=cycle)
+    boil = Boiler(T_hi=673.15, cycle=cycle)
+    cycle.connect(turb, cond, pump, boil, turb)
+    return cycle
+
+def test_order_and_tear():
+    cycle = make_cycle()
+    order, tears = cycle.order()
+    assert [p.name for p in order] == ['Turbine', 'Condenser', 'Pump', 'Boiler']
+    assert [(a.name, b.name) for a, b in tears] == [('Boiler', 'Turbine')]
+
+def test_tear_iteration_converges():
+    ref = rankine_superheated(fluid='Water', p_hi=4.0, p_lo=0.010, T_hi=400)
+    assert ref.passes == 1
+    # the turbine starts from saturated vapor, the boiler superheats it
+    cycle = make_cycle().solve()
+    assert cycle.passes == 2
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-9)
+    for proc in cycle.get_procs():
+        assert proc.ex_bal == approx(0, abs=1e-6)
+
+def test_connect_twice():
+    cycle = make_cycle()
+    with pytest.raises(ValueError):
+        cycle.connect(cycle.get_procs()[0], Condenser(p=1e4))
@@ -0,0 +1,68 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import numpy as np
+from pytest import approx
+from ..maps import PerformanceMap, stodola_inlet_pressure
+from ..components import Turbine, Pump, Condenser, Boiler
+from ..cycles import rankine_superheated, rankine_offdesign_array
+from ..graph import CycleGraph
+from ..thermodynamics import State
+
+MAP = '''flow,eff,pr
+1.1,0.99,1.09
+0.4,0.82,0.45
+0.7,0.95,0.72
+1.0,1.00,1.00
+'''
+
+def test_performance_map(tmp_path):
+    path = tmp_path / 'turbine.csv'
+    path.write_text(MAP)
+    turb_map = PerformanceMap.load(str(path))
+    assert turb_map.eff(0.7) == approx(0.95)
+    assert turb_map.pr(1.0) == approx(1.0)
+    flows = np.linspace(0.2, 1.3, 101)
+    eff = turb_map.eff(flows)
+    assert eff[0] == approx(0.82) and eff[-1] == approx(0.99)
+    # monotone data between 0.4 and 1.0 gives a monotone curve
+    inside = (flows >= 0.4) & (flows <= 1.0)
+    assert np.all(np.diff(eff[inside]) >= 0)
+    assert turb_map.eff(flows[40]) == approx(eff[40])
+    assert PerformanceMap([0.5, 1.0], [0.9, 1.0]).pr(0.5) == 1.0
+
+def test_stodola():
+    assert stodola_inlet_pressure(1.0, 8e6, 1e4) == approx(8e6)
+    p = stodola_inlet_pressure(np.array([0.5, 1.0]), 8e6, 1e4)
+    # nearly proportional to flow for a small outlet pressure
+    assert p[0] == approx(4e6, rel=1e-3)
+
+def test_offdesign_array():
+    design = dict(fluid='Water', p_hi=8.0, p_lo=0.01, T_hi=480, turb_eff=0.85, pump_eff=0.8)
+    turb_map = PerformanceMap([0.3, 0.6, 1.0, 1.1], [0.8, 0.93, 1.0, 0.99])
+    pump_map = PerformanceMap([0.3, 1.0, 1.1], [0.7, 1.0, 0.98])
+    flow = np.array([1.0, 0.6, 0.45])
+    res = rankine_offdesign_array(flow=flow, turb_map=turb_map, pump_map=pump_map, mdot=50.0, **design)
+    ref = rankine_superheated(**design)
+    assert res['wnet'][0] == approx(ref.wnet, rel=1e-6)
+    assert res['power'][0] == approx(50.0 * ref.wnet, rel=1e-6)
+
+    # the same part-load point from components
+    dead = State(p=101.3e3, T=298.15, fluid='Water')
+    cycle = CycleGraph('Water', dead=dead)
+    turb = Turbine(p_hi=8e6, p_lo=1e4, T_hi=753.15, eff=0.85, map=turb_map, flow=0.6,
+                   stodola=True, fluid='Water', cycle=cycle)
+    p_hi = turb.inlet_pressure()
+    assert res['p_hi'][1] == approx(p_hi / 1e6, rel=1e-9)
+    cond = Condenser(p=1e4, fluid='Water', cycle=cycle)
+    pump = Pump(p_hi=p_hi, eff=0.8, map=pump_map, flow=0.6, fluid='Water', cycle=cycle)
+    boil = Boiler(T_hi=753.15, fluid='Water', cycle=cycle)
+    cycle.connect(turb, cond, pump, boil, turb).solve()
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert res[attr][1] == approx(getattr(cycle, attr), rel=1e-6)
+    assert res['en_eff'][2] < res['en_eff'][1] < res['en_eff'][0]
@@ -0,0 +1,64 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+import numpy as np
+from ..optimize import brent, golden_section, nelder_mead, optimize_cycle, optimize_over_brine
+from ..cycles import ideal_rankine, rankine_superheated
+
+@pytest.mark.parametrize('minimize', [brent, golden_section])
+def test_scalar_minimizers(minimize):
+    x, fx = minimize(lambda x: (x - 1.3)**2 + 2, 0.0, 5.0, xtol=1e-6)
+    assert x == pytest.approx(1.3, abs=1e-5)
+    assert fx == pytest.approx(2.0)
+
+def test_nelder_mead_bounded():
+    f = lambda x: (x[0] - 1)**2 + (x[1] + 2)**2
+    x, fx = nelder_mead(f, [0.5, 0.5], [(0, 3), (-1, 1)], xtol=1e-6)
+    assert x == pytest.approx([1.0, -1.0], abs=1e-4)
+
+def test_optimize_ideal_rankine_p_hi():
+    kwargs = dict(fluid='Water', p_lo=0.01, turb_eff=0.85, pump_eff=0.8, backend='HEOS')
+    opt = optimize_cycle('ideal_rankine', bounds={'p_hi': (1.0, 21.0)}, **kwargs)
+    grid = [ideal_rankine(p_hi=p, **kwargs).en_eff for p in np.linspace(1.0, 21.0, 50)]
+    assert opt.value >= max(grid) - 1e-6
+    assert opt.cycle.en_eff == opt.value
+    assert opt.nfev <= 25
+
+def test_optimize_superheated_plant():
+    kwargs = dict(fluid='n-Butane', p_lo=0.3, turb_eff=0.85, pump_eff=0.8, backend='HEOS')
+    opt = optimize_cycle('rankine_superheated', objective='plant_ex_eff', t_brine=150,
+                         bounds={'p_hi': (0.5, 3.7), 'T_hi': (60.0, 160.0)}, **kwargs)
+    # the boiler must stay 10 K below the brine
+    assert opt.x['T_hi'] <= 140.0
+    best = 0.0
+    for p in np.linspace(0.5, 3.7, 10):
+        for T in np.linspace(60.0, 140.0, 10):
+            try:
+                best = max(best, _plant_ex_eff(p, T, kwargs))
+            except ValueError:
+                pass
+    assert opt.value >= best - 1e-4
+    assert opt.nfev < 250
+
+def _plant_ex_eff(p_hi, T_hi, kwargs):
+    from ..rankine import compute_plant
+    import CoolProp.CoolProp as CP
+    if T_hi + 273.15 <= CP.PropsSI('T','P',p_hi*1e6,'Q',1,kwargs['fluid']):
+        return 0.0
+    cycle = rankine_superheated(p_hi=p_hi, T_hi=T_hi, **kwargs)
+    return compute_plant(cycle, {'cool_eff': 1.0, 't_brine': 150}).ex_eff
+
+def test_optimize_over_brine_warm_start():
+    kwargs = dict(fluid='n-Butane', p_lo=0.3, turb_eff=0.85, pump_eff=0.8, backend='HEOS')
+    results = optimize_over_brine([110, 115, 120], bounds={'p_hi': (0.5, 3.7)},
+                                  objective='plant_ex_eff', **kwargs)
+    for t_brine, opt in zip([110, 115, 120], results):
+        assert opt.plant.geo.inflow.T == pytest.approx(t_brine + 273.15)
+        assert opt.cycle.get_procs()[0].inflow.T <= t_brine - 10 + 273.15 + 1e-6
+    assert results[1].nfev <= results[0].nfev
@@ -29,3 +29,18 @@ def test_print_rankine_butane():
     # print output to screen
     print_output_to_screen(plant,props)
     assert cyc.en_eff == pytest.approx(0.14709, abs=1e-4)
+
+def test_sat_dome_cached(tmpdir, monkeypatch):
+    from .. import print_rankine, thermodynamics
+    monkeypatch.setattr(thermodynamics, 'CACHE_DIR', str(tmpdir))
+    monkeypatch.setattr(print_rankine, '_sat_domes', {})
+    T, s_liq, s_vap = print_rankine.sat_dome('Water')
+    assert T[0] == pytest.approx(273.16)
+    # points get denser towards the critical point
+    assert T[-1] - T[-2] < 0.1 < T[1] - T[0]
+    assert (s_liq < s_vap).all()
+    assert tmpdir.join('dome').listdir()
+    # a new process would load the dome from disk
+    monkeypatch.setattr(print_rankine, '_sat_domes', {})
+    T2, _, s_vap2 = print_rankine.sat_dome('Water')
+    assert (T2 == T).all() and (s_vap2 == s_vap).all()
@@ -0,0 +1,54 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import csv
+import io
+import numpy as np
+from pytest import approx
+from .. import report
+from ..cache import summarize
+from ..rankine import compute_cycle, compute_plant
+
+PROPS = {'fluid': 'n-Butane', 'p_hi': 3.5, 'p_lo': 0.3, 'turb_eff': 0.8, 'pump_eff': 0.75,
+         'cycle_mdot': 3.14}
+
+def test_number():
+    values = np.array([0.0, -0.0, 0.005, 0.015, 2.675, -9.995, 123456.789, np.nan, -np.inf])
+    for spec in ['%.0f', '%.2f', '%.1f%%']:
+        width = report._width('', values, spec)
+        cells = report._number(values, spec, width).tobytes().decode()
+        assert cells == ''.join((spec % v).rjust(width) for v in values)
+    assert report._number(np.array([-12, 7]), '%d', 4).tobytes() == b' -12   7'
+
+def test_write_report():
+    cyc = compute_cycle(PROPS)
+    result = summarize(cyc, compute_plant(cyc, PROPS))
+    results = report.collect([result, None, result])
+    assert list(np.unique(results['processes']['case'])) == [0, 2]
+
+    out = io.StringIO()
+    report.write_report(results, out, 'csv', ['processes'], in_kW=True)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[0] == ['Case', 'Process', 'Q(kW)', 'W(kW)']
+    # four processes and a Net row per case
+    assert len(rows) == 11 and rows[5][:2] == ['0', 'Net'] and rows[10][:2] == ['2', 'Net']
+    assert float(rows[5][3]) == approx(cyc.mdot * cyc.wnet / 1e3, abs=0.05)
+
+    out = io.StringIO()
+    report.write_report(results, out, 'text', chunk=3)
+    lines = out.getvalue().splitlines()
+    table = [line for line in lines if line.startswith('|') and 'Net' in line]
+    assert len(table) == 4
+    # every row of a table has the width of its border
+    assert len(set(len(line) for line in lines if line.startswith(('+', '|')))) == 3
+    assert '{:.1%}'.format(cyc.ex_eff) in table[-1]
+
+    out = io.StringIO()
+    report.render(report.exergy_columns(result['processes']), out, 'markdown')
+    lines = out.getvalue().splitlines()
+    assert lines[1].startswith('|:-') and lines[1].endswith(':|') and len(lines) == 7
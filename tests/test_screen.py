@@ -0,0 +1,38 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+from ..screen import screen_fluids, check_feasible
+from .. import rankine
+
+def test_check_feasible():
+    with pytest.raises(ValueError, match='PCRIT'):
+        check_feasible('Water', {'p_hi': 30.0, 'p_lo': 0.01})
+    with pytest.raises(ValueError, match='triple point'):
+        check_feasible('Water', {'p_hi': 3.0, 'p_lo': 1e-4})
+    with pytest.raises(ValueError, match='brine'):
+        check_feasible('Water', {'p_hi': 3.0, 'p_lo': 0.01, 't_brine': 150})
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_screen_fluids(workers):
+    fluids = ['n-Butane', 'IsoButane', 'R134a', 'Helium', 'n-Pentane']
+    ranked, skipped = screen_fluids(fluids, workers=workers, t_brine=120,
+                                    turb_eff=0.8, pump_eff=0.75, cool_eff=0.25)
+    # the boiler at 110 deg C is above TCRIT for R134a and Helium
+    assert skipped == [('R134a', 'high temperature is above TCRIT'),
+                       ('Helium', 'high temperature is above TCRIT')]
+    assert len(ranked) == 3
+    effs = [row['plant_en_eff'] for row in ranked]
+    assert effs == sorted(effs, reverse=True)
+    # rows agree with evaluating the plant directly
+    row = [row for row in ranked if row['fluid'] == 'n-Butane'][0]
+    props = {'fluid': 'n-Butane', 'p_hi': row['p_hi'], 'p_lo': row['p_lo'],
+             'turb_eff': 0.8, 'pump_eff': 0.75, 'cool_eff': 0.25, 't_brine': 120}
+    plant = rankine.compute_plant(rankine.compute_cycle(props), props)
+    assert row['plant_en_eff'] == pytest.approx(plant.en_eff, rel=1e-6)
+    assert row['brine_mdot'] == pytest.approx(plant.geo.mdot, rel=1e-6)
@@ -0,0 +1,67 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import asyncio
+import json
+from pytest import approx
+from .. import serve
+from ..rankine import compute_cycle, compute_plant
+
+CASES = [{'fluid': 'n-Butane', 'p_hi': p_hi, 'p_lo': 0.3, 'turb_eff': 0.8} for p_hi in [2.0, 2.5, 3.0]]
+
+def run_server(client, **kwargs):
+    async def main():
+        server = serve.Server(warm=[], **kwargs)
+        try:
+            address = await server.start(port=0, path=kwargs.get('path'))
+            return await client(server, address)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_serve_tcp():
+    async def client(server, address):
+        answers = await serve.query(CASES + [{'fluid': 'Water'}], port=address[1])
+        reader, writer = await asyncio.open_connection(port=address[1])
+        writer.write(b'not json\n{"stats": true}\n')
+        bad = json.loads(await reader.readline())
+        stats = json.loads(await reader.readline())
+        writer.close()
+        return answers, bad, stats
+
+    answers, bad, stats = run_server(client, workers=2, batch_size=2)
+    assert [a['id'] for a in answers] == [0, 1, 2, 3]
+    cyc = compute_cycle(CASES[2])
+    assert answers[2]['wnet'] == approx(cyc.wnet)
+    assert answers[2]['plant_en_eff'] == approx(compute_plant(cyc, CASES[2]).en_eff)
+    assert answers[3]['wnet'] is None and answers[3]['error']
+    assert all(a['latency'] > 0 for a in answers)
+    assert bad['error'] and bad['id'] is None
+    assert stats['requests'] == 5 and stats['errors'] == 2
+    assert stats['batches'] >= 2 and stats['latency']['max'] >= stats['latency']['p50']
+
+def test_serve_unix_backpressure(tmp_path):
+    path = str(tmp_path / 'rankine.sock')
+
+    async def client(server, address):
+        # all twelve requests are written at once, but with one batch of one
+        # request evaluated at a time at most two may wait in the queue, and
+        # reading is held back (throttled) once they do
+        answers = asyncio.ensure_future(serve.query(CASES * 4, path=path))
+        while not server.throttled:
+            await asyncio.sleep(0.001)
+        assert server.queue.maxsize == 2
+        # closing answers the requests read so far and held back
+        await server.close()
+        return await answers, server.stats()
+
+    answers, stats = run_server(client, workers=1, batch_size=1, max_batches=1,
+                                max_pending=2, path=path)
+    assert stats['throttled'] > 0 and stats['requests'] == 12 and stats['queued'] == 0
+    assert [a['error'] for a in answers] == [None] * 12
+    assert [a['wnet'] for a in answers[3:6]] == approx([a['wnet'] for a in answers[:3]])
@@ -0,0 +1,44 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+import numpy as np
+from ..sweep import sweep, grid
+from ..cycles import ideal_rankine
+
+def test_grid_order():
+    cases = grid(fluid='Water', p_hi=[2.0, 4.0], p_lo=[0.01, 0.02])
+    assert [(c['p_hi'], c['p_lo']) for c in cases] == [
+        (2.0, 0.01), (2.0, 0.02), (4.0, 0.01), (4.0, 0.02)]
+    assert all(c['fluid'] == 'Water' for c in cases)
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sweep_matches_ideal_rankine(workers):
+    p_hi = [3.5, 8.0, 2.0]
+    res = sweep('ideal_rankine', workers=workers, chunksize=2,
+                fluid='Water', p_hi=p_hi, p_lo=[0.02, 0.01], turb_eff=0.85)
+    assert len(res['en_eff']) == 6
+    assert list(res['p_hi']) == [3.5, 3.5, 8.0, 8.0, 2.0, 2.0]
+    for i in range(6):
+        cycle = ideal_rankine(fluid='Water', p_hi=res['p_hi'][i],
+                              p_lo=res['p_lo'][i], turb_eff=0.85)
+        assert res['en_eff'][i] == pytest.approx(cycle.en_eff)
+        assert res['wnet'][i] == pytest.approx(cycle.wnet)
+
+def test_sweep_infeasible_case_is_nan():
+    res = sweep(ideal_rankine, workers=1, fluid='Water', p_hi=[8.0, 50.0], p_lo=0.02)
+    assert np.isfinite(res['en_eff'][0])
+    assert np.isnan(res['en_eff'][1])
+
+def test_sweep_ledger():
+    res = sweep(ideal_rankine, workers=1, ledger=True, fluid='Water', p_hi=[8.0, 50.0, 4.0], p_lo=0.02)
+    ledger = res['ledger']
+    # the infeasible case has no rows
+    assert list(ledger['case']) == [0] * 4 + [2] * 4
+    assert ledger['ex_d'][ledger['case'] == 2].sum() == pytest.approx(
+        ideal_rankine(fluid='Water', p_hi=4.0, p_lo=0.02).ex_d)
@@ -0,0 +1,75 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import mmap
+import pytest
+import numpy as np
+from pytest import approx
+from .. import thermodynamics, tables
+from ..thermodynamics import State, CP
+from ..cycles import rankine_superheated
+
+@pytest.fixture(scope='module')
+def water_table(tmp_path_factory):
+    cache_dir = thermodynamics.CACHE_DIR
+    thermodynamics.CACHE_DIR = str(tmp_path_factory.mktemp('cache'))
+    try:
+        tables.build_table('Water', tables.table_path('Water'), n_p=100, n_y=50, n_check=200)
+        yield tables.get_table('Water')
+    finally:
+        thermodynamics.CACHE_DIR = cache_dir
+
+def test_table_file(water_table):
+    # the arrays are views of the mapped file
+    base = water_table.arrays['ph_vap_T']
+    while isinstance(base, np.ndarray):
+        base = base.base
+    assert isinstance(base, mmap.mmap)
+    assert not water_table.arrays['ph_vap_T'].flags.writeable
+    err = water_table.error
+    assert err['ph']['points'] > 150
+    assert err['ph']['T']['rms'] < 1e-4 and err['ps']['d']['rms'] < 1e-3
+
+def test_bad_version(water_table, tmp_path):
+    path = str(tmp_path / 'bad.rkt')
+    with open(tables.table_path('Water'), 'rb') as f:
+        data = bytearray(f.read())
+    data[8] = tables.FORMAT_VERSION + 1
+    with open(path, 'wb') as f:
+        f.write(data)
+    with pytest.raises(ValueError):
+        tables.PropertyTable.load(path)
+
+@pytest.mark.parametrize('prop1,val1,prop2,val2', [
+    ('p', 4e6, 'T', 673.15),
+    ('p', 1e4, 'h', 2007.5e3),
+    ('s', 6.7e3, 'p', 1e4),
+    ('p', 2e6, 'x', 1.0),
+    ('T', 373.15, 'x', 0.0),
+    ('p', 4e6, 'h', 400e3),
+])
+def test_table_state(water_table, prop1, val1, prop2, val2):
+    st = State(fluid='Water', backend='TABLE')
+    st.fix(prop1, val1, prop2, val2)
+    ref = State(fluid='Water')
+    ref.fix(prop1, val1, prop2, val2)
+    for prop in ['T', 'p', 'h', 's', 'd', 'x']:
+        assert getattr(st, prop) == approx(getattr(ref, prop), rel=2e-3, abs=1.0)
+
+def test_table_errors(water_table):
+    with pytest.raises(ValueError):
+        water_table.flash('p', 30e6, 'h', 2e6)
+    with pytest.raises(ValueError):
+        water_table.flash('h', 2e6, 's', 6e3)
+
+def test_table_cycle(water_table):
+    kwargs = dict(fluid='Water', p_hi=4.0, p_lo=0.010, T_hi=400)
+    ref = rankine_superheated(**kwargs)
+    cycle = rankine_superheated(backend='TABLE', **kwargs)
+    for attr in ['wnet', 'qnet', 'en_eff', 'bwr', 'ex_eff']:
+        assert getattr(cycle, attr) == approx(getattr(ref, attr), rel=1e-3)
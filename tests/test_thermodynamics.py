@@ -0,0 +1,119 @@
+"""
+Run tests by entering
+
+    $ pytest
+
+on the command line.
+"""
+
+import pytest
+import numpy as np
+from ..thermodynamics import State, StateArray
+
+PROPS = ['T','p','d','v','u','h','s','x']
+
+@pytest.mark.parametrize('fluid,prop1,val1,prop2,val2', [
+    ('Water', 'p', 2e6, 'x', 1.0),
+    ('Water', 'p', 4e6, 'T', 400+273.15),
+    ('Water', 'p', 1e4, 'h', 2007.5e3),
+    ('Water', 's', 6.7e3, 'p', 1e4),
+    ('n-Butane', 'p', 0.3e6, 'x', 0.0),
+])
+def test_abstract_state_matches_propssi(fluid, prop1, val1, prop2, val2):
+    ref = State(fluid=fluid)
+    ref.fix(prop1, val1, prop2, val2)
+    st = State(fluid=fluid, abstract_state=True)
+    st.fix(prop1, val1, prop2, val2)
+    for prop in PROPS:
+        assert getattr(st, prop) == pytest.approx(getattr(ref, prop), rel=1e-9, abs=1e-9)
+
+def test_state_array_matches_state():
+    p = np.array([1e4, 2e6, 8e6])
+    h = np.array([2007.5e3, 2800e3, 3300e3])
+    states = StateArray(fluid='Water')
+    states.fix('p', p, 'h', h)
+    for i in range(len(p)):
+        ref = State(fluid='Water')
+        ref.fix('p', p[i], 'h', h[i])
+        for prop in PROPS:
+            assert states.__dict__[prop][i] == pytest.approx(getattr(ref, prop), rel=1e-9, abs=1e-9)
+    assert states.T.dtype == np.float64 and states.T.flags['C_CONTIGUOUS']
+
+def test_state_array_specific_volume_and_quality():
+    sat = StateArray(fluid='Water')
+    sat.fix('p', [1e5, 1e6], 'x', 0.5)
+    states = StateArray(fluid='Water')
+    states.fix('p', sat.p, 'v', sat.v)
+    assert states.x == pytest.approx(np.array([0.5, 0.5]), rel=1e-6)
+    assert states.h == pytest.approx(sat.h, rel=1e-6)
+
+def test_property_cache():
+    from .. import thermodynamics
+    cache = thermodynamics.enable_cache(maxsize=2, digits=6)
+    try:
+        st = State(fluid='Water')
+        st.fix('p', 1e4, 'x', 0.0)
+        h = st.h
+        st.fix('p', 1e4 * (1 + 1e-9), 'x', 0.0)  # same key after quantization
+        assert st.h == h
+        assert (cache.hits, cache.misses) == (1, 1)
+        st.fix('p', 2e4, 'x', 0.0)
+        st.fix('p', 3e4, 'x', 0.0)
+        assert cache.evictions == 1 and len(cache) == 2
+        st2 = State(fluid='n-Butane')
+        st2.fix('p', 0.3e6, 'x', 0.0)
+        thermodynamics.clear_cache('Water')
+        assert len(cache) == 1
+        assert cache.stats()['evictions'] == 2
+    finally:
+        thermodynamics.disable_cache()
+
+def test_perf_report():
+    from ..thermodynamics import PerfReport
+    from ..cycles import ideal_rankine
+    cycle = ideal_rankine(fluid='Water', p_hi=8.0, p_lo=0.02, instrument=True)
+    report = cycle.report.as_dict()
+    names = [item['name'] for item in report['components']]
+    assert names == ['Turbine', 'Condenser', 'Pump', 'Boiler']
+    assert all(item['computes'] == 1 and item['time'] > 0 for item in report['components'])
+    # six PropsSI calls for each of the four states fixed (the boiler finds
+    # the turbine inlet already fixed from the same inputs), and one for the
+    # enthalpy of the turbine's lazy isentropic state
+    assert report['total_calls'] == 4 * 6 + 1
+    assert dict(((c['source'], c['pair']), c['count']) for c in report['property_calls'])[('PropsSI', 'p-x')] == 6
+    # a context manager aggregates several cycles
+    with PerfReport() as sweep_report:
+        for p_hi in [4.0, 8.0]:
+            ideal_rankine(fluid='Water', p_hi=p_hi, p_lo=0.02, backend='HEOS')
+    # one flash per state fixed
+    assert sweep_report.total_calls() == 2 * 5
+    assert sweep_report.components['Turbine'][1] == 2
+    # PropsSI calls through a backend prefix are counted under that backend
+    with PerfReport() as backend_report:
+        State(fluid='Water', backend='HEOS', abstract_state=False).fix('p', 1e5, 'x', 0.0)
+    assert set(source for source, _ in backend_report.calls) == {'PropsSI:HEOS'}
+    assert ideal_rankine(fluid='Water', p_hi=8.0, p_lo=0.02).report is None
+
+def test_lazy_state():
+    from ..thermodynamics import PerfReport
+    ref = State(fluid='Water')
+    ref.fix('s', 6.7e3, 'p', 1e4)
+    with PerfReport() as report:
+        st = State(fluid='Water', lazy=True)
+        st.fix('s', 6.7e3, 'p', 1e4)
+        assert report.total_calls() == 0
+        assert st.h == pytest.approx(ref.h)
+        assert st.h == pytest.approx(ref.h)  # cached after the first read
+        assert report.total_calls() == 1
+        assert st.T == pytest.approx(ref.T)
+        assert report.total_calls() == 2
+    # a single flash fills every property on first access
+    with PerfReport() as report:
+        st = State(fluid='Water', lazy=True, backend='HEOS')
+        st.fix('s', 6.7e3, 'p', 1e4)
+        assert st.x == pytest.approx(ref.x, rel=1e-6)
+        for prop in PROPS:
+            assert getattr(st, prop) == pytest.approx(getattr(ref, prop), rel=1e-6)
+        assert report.total_calls() == 1
+    with pytest.raises(AttributeError):
+        st.not_a_property
@@ -1,10 +1,263 @@
 # Create Python class for a thermodynamic state
 
-import CoolProp.CoolProp as CP  #must have CoolProp library installed
+import importlib
+import math
+import os
+import functools
+import time
+from collections import OrderedDict
 from pprint import pprint
 
+class LazyModule(object):
+    ''' Stand-in for a module that is imported the first time one of its
+    attributes is used, so importing the compute modules stays cheap for
+    short-lived processes. Attributes are cached on first use. '''
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._name), attr)
+        self.__dict__[attr] = value
+        return value
+
+CP = LazyModule('CoolProp.CoolProp')  #must have CoolProp library installed
+np = LazyModule('numpy')
+
 UNITS = 'si'
 
+# default dead state (ambient) temperature of the cycles and the brine, K
+DEAD_T = 15 + 273.0
+
+# Property backends a State can use. 'CoolProp' calls PropsSI with the full
+# Helmholtz EOS; the CoolProp backends flash a cached AbstractState. The
+# tabular backends interpolate in property tables built from the Helmholtz
+# EOS: CoolProp's own, or for 'TABLE' the memory-mapped tables of tables.py.
+BACKENDS = ('CoolProp', 'HEOS', 'BICUBIC&HEOS', 'TTSE&HEOS', 'TABLE')
+
+# directory for files cached between runs, such as the tabular backend tables
+CACHE_DIR = os.environ.get('RANKINE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.rankine'))
+
+# Set to True to have every State flash a cached CoolProp AbstractState once
+# per fix() instead of calling PropsSI for each property.
+ABSTRACT_STATE = False
+
+# Set to True to have every State defer the property calls of fix() until a
+# property is first read (see State.fix).
+LAZY_STATE = False
+
+# one AbstractState per (backend, fluid), shared by every State
+_abstract_states = {}
+
+_tables_dir = None
+
+def configure_tables(directory=None):
+    ''' Have CoolProp save the tables it builds for the tabular backends under
+    directory (default CACHE_DIR/tables), one folder per fluid, and load them
+    from there on later runs instead of building them again. '''
+    global _tables_dir
+    if directory is None:
+        directory = os.path.join(CACHE_DIR, 'tables')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    CP.set_config_bool(CP.SAVE_RAW_TABLES, True)
+    # CoolProp appends the fluid folder name directly to this string
+    CP.set_config_string(CP.ALTERNATIVE_TABLES_DIRECTORY, os.path.join(directory, ''))
+    _tables_dir = directory
+    return directory
+
+def is_tabular(backend):
+    return backend.startswith('BICUBIC') or backend.startswith('TTSE')
+
+def get_abstract_state(fluid, backend='HEOS'):
+    ''' Return the cached CoolProp AbstractState for the given fluid and backend.
+    A backend given in the fluid string (e.g. 'INCOMP::MEG[0.5]') takes precedence. '''
+    if '::' in fluid:
+        backend, fluid = fluid.split('::', 1)
+    key = (backend, fluid)
+    AS = _abstract_states.get(key)
+    if AS is None:
+        if is_tabular(backend) and _tables_dir is None:
+            configure_tables()
+        AS = CP.AbstractState(backend, fluid)
+        _abstract_states[key] = AS
+    return AS
+
+class PropertyCache(object):
+    ''' A size-bounded LRU cache of property lookups made by State.fix and
+    State.calc_prop. Entries are keyed on the fluid, backend, input pair and
+    the input values rounded to a number of significant digits, so that
+    lookups closer than that share an entry.
+        maxsize = maximum number of entries kept before the least recently
+                  used one is evicted
+        digits = significant digits kept from each input value (None to key
+                 on the exact value)
+    '''
+    def __init__(self, maxsize=4096, digits=12):
+        self.maxsize = maxsize
+        self.digits = digits
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def quantize(self, val):
+        if self.digits is None:
+            return val
+        return float('{:.{}g}'.format(val, self.digits))
+
+    def key(self, fluid, backend, prop1, val1, prop2, val2, *extra):
+        return (fluid, backend, prop1, self.quantize(val1), prop2, self.quantize(val2)) + extra
+
+    def get(self, key):
+        try:
+            val = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return val
+
+    def put(self, key, val):
+        self._data[key] = val
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self, fluid=None):
+        ''' Remove every entry, or only the entries for one fluid '''
+        if fluid is None:
+            self._data.clear()
+        else:
+            for key in [key for key in self._data if key[0] == fluid]:
+                del self._data[key]
+
+    def stats(self):
+        return {'size': len(self._data), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+# property cache shared by every State, off unless enable_cache() is called
+_property_cache = None
+
+def enable_cache(maxsize=4096, digits=12):
+    ''' Turn on the shared property cache and return it '''
+    global _property_cache
+    _property_cache = PropertyCache(maxsize=maxsize, digits=digits)
+    return _property_cache
+
+def disable_cache():
+    global _property_cache
+    _property_cache = None
+
+def get_cache():
+    return _property_cache
+
+def clear_cache(fluid=None):
+    ''' Empty the shared property cache, or only its entries for one fluid '''
+    if _property_cache is not None:
+        _property_cache.clear(fluid)
+
+class PerfReport(object):
+    ''' Counts the property calls made by States, per source ('PropsSI',
+    'PropsSI:<backend>' for a non-default backend, or the AbstractState
+    backend) and input pair, and times each component's
+    compute(), while it is active. Activate it with a with-statement:
+
+        with PerfReport() as report:
+            cycle = ideal_rankine(...)
+        print(report.as_dict())
+
+    Reports can be nested; every active report records the same calls. '''
+    def __init__(self):
+        self.calls = {}       # (source, 'p-x') -> number of calls
+        self.components = {}  # component name -> [class name, computes, seconds]
+
+    def __enter__(self):
+        _reports.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _reports.remove(self)
+        return False
+
+    def count_call(self, source, prop1, prop2):
+        key = (source, prop1 + '-' + prop2)
+        self.calls[key] = self.calls.get(key, 0) + 1
+
+    def time_component(self, component, seconds):
+        entry = self.components.get(component.name)
+        if entry is None:
+            entry = self.components[component.name] = [type(component).__name__, 0, 0.0]
+        entry[1] += 1
+        entry[2] += seconds
+
+    def merge(self, other):
+        ''' Add the counts and timings of another report to this one '''
+        for key, n in other.calls.items():
+            self.calls[key] = self.calls.get(key, 0) + n
+        for name, (cls, n, seconds) in other.components.items():
+            entry = self.components.setdefault(name, [cls, 0, 0.0])
+            entry[1] += n
+            entry[2] += seconds
+        return self
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def as_dict(self):
+        return {'property_calls': [{'source': source, 'pair': pair, 'count': n}
+                                   for (source, pair), n in sorted(self.calls.items())],
+                'total_calls': self.total_calls(),
+                'components': [{'name': name, 'class': cls, 'computes': n, 'time': seconds}
+                               for name, (cls, n, seconds) in self.components.items()]}
+
+# the PerfReports currently recording, innermost last
+_reports = []
+
+def timed(compute):
+    ''' Decorator for a component's compute() that records its run time in
+    the active PerfReports, and in its cycle's report if it has one '''
+    @functools.wraps(compute)
+    def wrapper(self):
+        report = getattr(self.cycle, 'report', None)
+        if not _reports and report is None:
+            return compute(self)
+        pushed = report is not None and report not in _reports
+        if pushed:
+            _reports.append(report)
+        t = time.perf_counter()
+        try:
+            return compute(self)
+        finally:
+            seconds = time.perf_counter() - t
+            for rep in _reports:
+                rep.time_component(self, seconds)
+            if pushed:
+                _reports.remove(report)
+    return wrapper
+
+def instrumented(build):
+    ''' Decorator for a function that builds and returns a Cycle. Called with
+    instrument=True (a keyword, or a key of a props dictionary argument) it
+    records the whole build in a new PerfReport attached as cycle.report. '''
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        instrument = kwargs.get('instrument', False)
+        if args and isinstance(args[0], dict):
+            instrument = instrument or args[0].get('instrument', False)
+        if not instrument:
+            return build(*args, **kwargs)
+        with PerfReport() as report:
+            cycle = build(*args, **kwargs)
+        cycle.report = report
+        return cycle
+    return wrapper
+
 class State(object):
     ''' This is a class that can be used to define a thermodynamic state for a given fluid. The user must enter the fluid string to select in CoolProp and then 2 independent named variables for the state to be properly defined. All variables are specific, in that they are valued per unit mass. Optional variables and their default units are:
         T = temperature, (deg C)
@@ -17,8 +270,12 @@ class State(object):
         x, Q = quality (real number between 0 and 1 inclusive)
         velocity = velocity (m/s) for kinetic energy
         z = relative height (m) for potential energy
+    The backend can be 'CoolProp' (default, PropsSI with the full Helmholtz
+    EOS), 'HEOS', one of the faster tabular backends 'BICUBIC&HEOS' and
+    'TTSE&HEOS', or 'TABLE' for the memory-mapped tables of tables.py. A State
+    in a cycle uses the cycle's backend by default.
     '''
-    def __init__(self, name="", fluid=None, units=UNITS, cycle=None, backend='CoolProp', **kwargs):
+    def __init__(self, name="", fluid=None, units=UNITS, cycle=None, backend='CoolProp', abstract_state=None, lazy=None, **kwargs):
 
         # print('kwargs')
         # pprint(kwargs)
@@ -30,6 +287,16 @@ class State(object):
 
         self.cycle = cycle  # should be an object of class cycle
 
+        if self.cycle and backend == 'CoolProp':
+            backend = getattr(self.cycle, 'backend', backend)
+        self.backend = backend
+        if abstract_state is None:
+            abstract_state = ABSTRACT_STATE or backend != 'CoolProp'
+        self.abstract_state = abstract_state  # flash once per fix() if True
+        if lazy is None:
+            lazy = LAZY_STATE
+        self.lazy = lazy  # defer property calls until they are read if True
+
         if self.cycle:
             self.fluid = cycle.fluid
             # add state to cycle's state list if not dead state
@@ -147,34 +414,279 @@ class State(object):
         """
         Wrapper for CoolProp or other thermodynamic property calculator
         """
+        cache = _property_cache
+        if cache is not None:
+            key = cache.key(self.fluid, self.backend, prop1, val1, prop2, val2, prop_return)
+            val_return = cache.get(key)
+            if val_return is None:
+                val_return = self._calc_prop(prop_return, prop1, val1, prop2, val2)
+                cache.put(key, val_return)
+            return val_return
+        return self._calc_prop(prop_return, prop1, val1, prop2, val2)
+
+    def _calc_prop(self, prop_return, prop1, val1, prop2, val2):
+        if self.backend == 'TABLE':
+            return self.flash(prop1, val1, prop2, val2)[prop_return]
+        if _reports:
+            source = 'PropsSI' if self.backend == 'CoolProp' else 'PropsSI:' + self.backend
+            for report in _reports:
+                report.count_call(source, prop1, prop2)
         prop1, val1 = self.CP_convert(prop1,val1)
         prop2, val2 = self.CP_convert(prop2,val2)
         CP_prop_return,_ = self.CP_convert(prop_return)
         # print('(p1,v1)->({},{})'.format(prop1,val1),'(p2,v2)->({},{})'.format(prop2,val2),'prop_return={}'.format(prop_return))
-        val_return = CP.PropsSI(CP_prop_return, prop1, val1, prop2, val2, self.fluid)
+        fluid = self.fluid
+        if self.backend != 'CoolProp' and '::' not in fluid:
+            if is_tabular(self.backend) and _tables_dir is None:
+                configure_tables()
+            fluid = self.backend + '::' + fluid
+        val_return = CP.PropsSI(CP_prop_return, prop1, val1, prop2, val2, fluid)
         if prop_return == 'v':
             val_return = 1/val_return
         return val_return
 
+    def flash(self, prop1, val1, prop2, val2):
+        """
+        Update the fluid's cached AbstractState once and return a dictionary
+        of every state property read from that single flash
+        """
+        if _reports:
+            for report in _reports:
+                report.count_call(self.backend if self.backend != 'CoolProp' else 'HEOS', prop1, prop2)
+        if self.backend == 'TABLE':
+            from .tables import get_table
+            return get_table(self.fluid).flash(prop1, val1, prop2, val2)
+        prop1, val1 = self.CP_convert(prop1,val1)
+        prop2, val2 = self.CP_convert(prop2,val2)
+        backend = self.backend
+        if backend == 'CoolProp':
+            backend = 'HEOS'
+        AS = get_abstract_state(self.fluid, backend)
+        pair, val1, val2 = CP.generate_update_pair(CP.get_parameter_index(prop1), val1,
+                                                   CP.get_parameter_index(prop2), val2)
+        AS.update(pair, val1, val2)
+        d = AS.rhomass()
+        return {'T': AS.T(), 'p': AS.p(), 'd': d, 'v': 1/d, 'u': AS.umass(),
+                'h': AS.hmass(), 's': AS.smass(), 'x': AS.Q()}
+
     def fix(self, prop1, val1, prop2, val2, units=None):
         """
-        Fix the state of the fluid from two independent properties
+        Fix the state of the fluid from two independent properties.
+        For a lazy State the other properties are not computed here but on
+        first access: one at a time with PropsSI, or all together when one
+        call gives them all (an AbstractState flash or a property cache).
+        Errors from an impossible state are then raised on first access.
+        A state fixed again from the inputs it already holds is left as it
+        is, without a property call.
         """
         # Put in error check if fluid in two-phase and temp and pressure are
         # both specified
 
         if units:
             self.units = units
+        inputs = (self.fluid, self.backend, self.units) + tuple(sorted([(prop1, val1), (prop2, val2)]))
+        if (self.fixed and self.__dict__.get('_inputs') == inputs and
+                self.__dict__.get(prop1) == val1 and self.__dict__.get(prop2) == val2):
+            return
 
         coolprops = {'T','p','d','v','u','h','s','x'}
         calc_props = coolprops - {prop1} - {prop2}
         # print('prop1={}  prop2={}'.format(prop1,prop2))
         self.__dict__[prop1] = val1
         self.__dict__[prop2] = val2
-        for prop in calc_props:
-            self.__dict__[prop] = self.calc_prop(prop, prop1, val1, prop2, val2)
+        self.__dict__.pop('_pending', None)
+        if self.lazy:
+            for prop in calc_props:
+                self.__dict__.pop(prop, None)
+            self._pending = (prop1, val1, prop2, val2, calc_props)
+        else:
+            props = self._lookup_props(calc_props, prop1, val1, prop2, val2)
+            for prop in calc_props:
+                self.__dict__[prop] = props[prop]
+        self._inputs = inputs
         self.fixed = True
 
+    def __getattr__(self, name):
+        # only called for attributes that are not set, such as the properties
+        # a lazy fix() has not computed yet
+        pending = self.__dict__.get('_pending')
+        if pending is None or name not in pending[4]:
+            raise AttributeError("'State' object has no attribute '{}'".format(name))
+        prop1, val1, prop2, val2, calc_props = pending
+        if self.abstract_state or _property_cache is not None:
+            props = self._lookup_props(calc_props, prop1, val1, prop2, val2)
+            for prop in calc_props:
+                self.__dict__[prop] = props[prop]
+            calc_props.clear()
+        else:
+            self.__dict__[name] = self.calc_prop(name, prop1, val1, prop2, val2)
+            calc_props.discard(name)
+        if not calc_props:
+            del self.__dict__['_pending']
+        return self.__dict__[name]
+
+    def _lookup_props(self, calc_props, prop1, val1, prop2, val2):
+        ''' return the properties not given to fix(), from the property cache
+        if it is enabled '''
+        cache = _property_cache
+        if cache is None:
+            return self._fix_props(calc_props, prop1, val1, prop2, val2)
+        key = cache.key(self.fluid, self.backend, prop1, val1, prop2, val2)
+        props = cache.get(key)
+        if props is None:
+            props = self._fix_props(calc_props, prop1, val1, prop2, val2)
+            cache.put(key, props)
+        return props
+
+    def _fix_props(self, calc_props, prop1, val1, prop2, val2):
+        ''' compute the properties not given to fix() '''
+        if self.abstract_state:
+            return self.flash(prop1, val1, prop2, val2)
+        return dict((prop, self._calc_prop(prop, prop1, val1, prop2, val2)) for prop in calc_props)
+
+class StateArray(object):
+    ''' A batch of thermodynamic states for one fluid, stored as contiguous
+    float64 NumPy arrays. Fix the whole batch at once from arrays of any two
+    independent properties, e.g.
+
+        states = StateArray(fluid='Water')
+        states.fix('p', p_arr, 'h', h_arr)
+
+    and read the arrays states.T, states.p, states.d, states.v, states.u,
+    states.h, states.s and states.x. Property names and units are the same
+    as for State. Points that CoolProp cannot solve are set to nan.
+    '''
+    # CoolProp outputs, in the order they are requested from PropsSI
+    CP_outputs = ['T','P','D','U','H','S','Q']
+    props = ['T','p','d','u','h','s','x']
+
+    def __init__(self, name="", fluid=None, units=UNITS, backend='CoolProp'):
+        self.name = name
+        self.fluid = fluid
+        self.units = units
+        self.backend = backend
+        self.fixed = False
+        self.size = 0
+        self.T = None
+        self.p = None
+        self.d = None
+        self.v = None
+        self.u = None
+        self.h = None
+        self.s = None
+        self.x = None
+
+    def __repr__(self):
+        return self.name
+
+    def __len__(self):
+        return self.size
+
+    def CP_convert(self,prop,value=None):
+        ''' make necessary conversions for CoolProp functions '''
+        prop = prop.upper()
+        # use Q for quality but will accept x
+        if prop == 'X':
+            prop = 'Q'
+        # use density for CoolProp
+        elif prop == 'V':
+            prop = 'D'
+            if value is not None:
+                value = 1/value
+        return prop,value
+
+    def fix(self, prop1, val1, prop2, val2, units=None):
+        """
+        Fix every state in the batch from two arrays (or scalars, which are
+        broadcast) of independent properties with one vectorized CoolProp call
+        """
+        if units:
+            self.units = units
+        val1, val2 = np.broadcast_arrays(np.asarray(val1, dtype=np.float64),
+                                         np.asarray(val2, dtype=np.float64))
+        val1 = np.ascontiguousarray(val1.ravel())
+        val2 = np.ascontiguousarray(val2.ravel())
+        self.size = val1.size
+        CP_prop1, CP_val1 = self.CP_convert(prop1,val1)
+        CP_prop2, CP_val2 = self.CP_convert(prop2,val2)
+        fluid = self.fluid
+        if self.backend != 'CoolProp' and '::' not in fluid:
+            if is_tabular(self.backend) and _tables_dir is None:
+                configure_tables()
+            fluid = self.backend + '::' + fluid
+        out = CP.PropsSI(self.CP_outputs, CP_prop1, CP_val1, CP_prop2, CP_val2, fluid)
+        # PropsSI drops the leading dimension for a single point
+        out = np.reshape(np.asarray(out, dtype=np.float64), (self.size, len(self.CP_outputs)))
+        out[np.isinf(out)] = np.nan
+        for i, prop in enumerate(self.props):
+            self.__dict__[prop] = np.ascontiguousarray(out[:,i])
+        self.v = 1/self.d
+        # keep the given input values exactly, as State.fix does
+        self.__dict__[prop1] = val1
+        self.__dict__[prop2] = val2
+        if prop1 == 'v' or prop2 == 'v':
+            self.d = 1/self.v
+        self.fixed = True
+        return self
+
+    def __getitem__(self, i):
+        ''' Return point i of the batch as a fixed scalar State '''
+        st = State(name=self.name, fluid=self.fluid, units=self.units, backend=self.backend)
+        for prop in ['T','p','d','v','u','h','s','x']:
+            st.__dict__[prop] = float(self.__dict__[prop][i])
+        st.fixed = self.fixed
+        return st
+
+# roles of the processes in an exergy ledger, by index
+ROLES = ('work out', 'work in', 'heat in', 'heat out')
+
+LEDGER_DTYPE = [('case','i8'),('name','U16'),('role','i1'),('heat','f8'),('work','f8'),
+                ('delta_ef','f8'),('ex_in','f8'),('ex_out','f8'),('ex_d','f8'),
+                ('ex_eff','f8'),('ex_bal','f8')]
+
+def exergy_roles(work, heat, delta_ef, ds, T_0):
+    ''' Apply the exergy rules of each process role to arrays (broadcast
+    together) of process work, heat, change in flow exergy, change in
+    entropy and dead state temperature. Work out (turbines) and work in
+    (pumps) destroy exergy T_0*ds; heat in is taken as an exergy input and
+    heat out as an exergy output. Returns the arrays
+    (role, ex_in, ex_out, ex_d, ex_eff), role indexing ROLES. '''
+    out = work > 0
+    into = work < 0
+    heat_in = ~out & ~into & (heat > 0)
+    heat_out = ~(out | into | heat_in)
+    role = np.where(out, 0, np.where(into, 1, np.where(heat_in, 2, 3))).astype(np.int8)
+    ex_in = np.where(into, -work, np.where(heat_in, delta_ef, 0.0))
+    ex_out = np.where(out, work, np.where(heat_out, -delta_ef, 0.0))
+    ex_d = np.where(out | into, T_0 * ds, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ex_eff = np.where(out, work / -delta_ef, np.where(into, delta_ef / -work, 1.0))
+    return role, ex_in, ex_out, ex_d, ex_eff
+
+def exergy_ledger(names, work, heat, dh, ds, T_0):
+    ''' Return the exergy ledger of n cases of a cycle with k processes as
+    a structured array of n*k rows (LEDGER_DTYPE), case by case.
+        names = the k process names
+        work, heat, dh, ds = arrays of shape (n, k) of process work, heat
+                             and changes in enthalpy and entropy
+        T_0 = dead state temperature of each case, shape (n,), or one for all
+    '''
+    work, heat, dh, ds = [np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (work, heat, dh, ds)]
+    if not work.shape == heat.shape == dh.shape == ds.shape:
+        work, heat, dh, ds = np.broadcast_arrays(work, heat, dh, ds)
+    n, k = work.shape
+    T_0 = np.broadcast_to(np.reshape(np.asarray(T_0, dtype=np.float64), (-1, 1)), (n, k))
+    delta_ef = dh - T_0 * ds
+    role, ex_in, ex_out, ex_d, ex_eff = exergy_roles(work, heat, delta_ef, ds, T_0)
+    ledger = np.empty(n * k, dtype=LEDGER_DTYPE)
+    ledger['case'] = np.repeat(np.arange(n), k)
+    ledger['name'] = np.tile(np.asarray(names, dtype=str), n)
+    for field, val in [('role', role), ('heat', heat), ('work', work), ('delta_ef', delta_ef),
+                       ('ex_in', ex_in), ('ex_out', ex_out), ('ex_d', ex_d), ('ex_eff', ex_eff),
+                       ('ex_bal', ex_in - ex_out - delta_ef - ex_d)]:
+        ledger[field] = val.ravel()
+    return ledger
+
 class Process(object):
     '''A class that defines values for a process based on a
     state in and a state out. '''
@@ -221,6 +733,7 @@ class Cycle(object):
          dead = object of class State that represents the dead state pressure and temperature
          name = string to represent the cycle
          mdot = mass flow rate in kg/s
+         backend = property backend used by the cycle's states (see State)
 
     note: the user must enter at least one "high" value and one "low" value for either temperature, pressure, or mixed.
     Entering the dead state is optional but will default to T = 15 degC, P = 0.101325 MPa (1 atm) for the given fluid'''
@@ -250,12 +763,189 @@ class Cycle(object):
         for process in process_list:
             process.compute()
 
+    def compute_totals(self):
+        ''' Set wnet, qnet, en_eff, bwr and ex_eff from the cycle's processes.
+        Heat in is the sum of positive heats and exergy in the change in flow
+        exergy across the processes adding heat. '''
+        procs = self.get_procs()
+        work_out = sum(p.work for p in procs if p.work > 0)
+        work_in = -sum(p.work for p in procs if p.work < 0)
+        heat_in = sum(p.heat for p in procs if p.heat > 0)
+        self.wnet = work_out - work_in
+        self.qnet = sum(p.heat for p in procs)
+        self.en_eff = self.wnet / heat_in
+        self.bwr = work_in / work_out
+        self.ex_eff = self.wnet / sum(p.delta_ef for p in procs if p.heat > 0)  # cycle exergetic eff
+
+    def compute_exergy(self):
+        ''' Set the exergy input, output, destruction, efficiency and balance
+        of each process from its role (see exergy_roles), and the cycle's
+        exergy totals, from the exergy_ledger. '''
+        ledger = self.exergy_ledger()
+        procs = self.get_procs()
+        for field in ['ex_in', 'ex_out', 'ex_d', 'ex_eff', 'ex_bal']:
+            for proc, val in zip(procs, ledger[field].tolist()):
+                setattr(proc, field, val)
+        # add results to cycle exergy totals
+        self.ex_in = sum(p.ex_in for p in procs)
+        self.ex_out = sum(p.ex_out for p in procs)
+        self.ex_d = sum(p.ex_d for p in procs)
+        self.delta_ef = sum(p.delta_ef for p in procs)
+
+    def exergy_ledger(self):
+        ''' Return the exergy ledger of the cycle's processes, a structured
+        array with a row per process (see exergy_ledger), computed in one
+        vectorized pass from the states and the process work and heat '''
+        procs = self.get_procs()
+        return exergy_ledger([p.name for p in procs],
+                             [[p.work for p in procs]], [[p.heat for p in procs]],
+                             [[p.outflow.h - p.inflow.h for p in procs]],
+                             [[p.outflow.s - p.inflow.s for p in procs]], self.dead.T)
+
+    def set_dead(self, dead):
+        ''' Replace the dead state with the fixed State dead and recompute
+        the flow exergies, each process's delta_ef and exergy values and the
+        cycle's exergy totals from the h and s already stored in the states.
+        No property calls are made. Returns the cycle. '''
+        self.dead = dead
+        for proc in self.get_procs():
+            proc.delta_ef = (proc.outflow.h - proc.inflow.h) - dead.T * (proc.outflow.s - proc.inflow.s)
+        self.flow_exergy()
+        self.compute_totals()
+        self.compute_exergy()
+        return self
+
+    def dead_state_sweep(self, T_0, p_0=101325.0):
+        ''' Return the exergy results of the cycle for each of an array of
+        dead states at temperatures T_0 (K) and pressures p_0 (Pa), which are
+        broadcast together. The dead states are fixed with one vectorized
+        property call; see exergy_arrays for the results. The cycle itself
+        is left unchanged. '''
+        # StateArray has no 'TABLE' backend; its tables come from HEOS
+        backend = 'HEOS' if self.backend == 'TABLE' else self.backend
+        dead = StateArray(name='Dead State', fluid=self.fluid, backend=backend)
+        dead.fix('T', T_0, 'p', p_0)
+        return self.exergy_arrays(dead.T, dead.h, dead.s)
+
+    def exergy_arrays(self, T_0, h_0, s_0):
+        ''' Return the exergy results of the cycle for arrays of dead state
+        temperatures, enthalpies and entropies, following the rules of
+        compute_exergy, as a dictionary of arrays:
+            ef = flow exergy of each state, shape (n, number of states)
+            proc_delta_ef, proc_ex_in, proc_ex_out, proc_ex_d, proc_ex_eff =
+                exergy values of each process, shape (n, number of processes)
+            ex_in, ex_out, delta_ef, ex_d, ex_eff = cycle totals, shape (n,)
+        '''
+        T_0, h_0, s_0 = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64).ravel() for a in (T_0, h_0, s_0)])
+        T0 = T_0[:,None]
+        states = self.get_states()
+        h = np.array([st.h for st in states])
+        s = np.array([st.s for st in states])
+        procs = self.get_procs()
+        work = np.array([p.work for p in procs], dtype=np.float64)
+        heat = np.array([p.heat for p in procs], dtype=np.float64)
+        dh = np.array([p.outflow.h - p.inflow.h for p in procs])
+        ds = np.array([p.outflow.s - p.inflow.s for p in procs])
+
+        res = {'T_0': T_0, 'ef': h - h_0[:,None] - T0 * (s - s_0[:,None])}
+        delta_ef = dh - T0 * ds
+        role, ex_in, ex_out, ex_d, ex_eff = exergy_roles(work, heat, delta_ef, ds, T0)
+        res.update({'proc_delta_ef': delta_ef, 'proc_ex_in': ex_in, 'proc_ex_out': ex_out,
+                    'proc_ex_d': ex_d, 'proc_ex_eff': ex_eff})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res['ex_eff'] = self.wnet / np.sum(np.where(heat > 0, delta_ef, 0.0), axis=1)
+        for key in ['ex_in', 'ex_out', 'delta_ef', 'ex_d']:
+            res[key] = res['proc_' + key].sum(axis=1)
+        return res
+
+    def _shared(self, component, key, procs):
+        # the (component, parameter) pairs setting the same quantity on the
+        # states component's key drives: for a pressure, on any state joined
+        # to them through isobaric components
+        quantity = component.drives[key][0]
+        states = [st for st in (getattr(component, flow) for flow in component.drives[key][1:])
+                  if st is not None]
+        if quantity is None:
+            return [(component, key)]
+        grew = quantity == 'p'
+        while grew:
+            grew = False
+            for proc in procs:
+                flows = [st for st in (proc.inflow, proc.outflow) if st is not None]
+                if getattr(proc, 'isobaric', False) and any(st is s for st in flows for s in states):
+                    new = [st for st in flows if not any(st is s for s in states)]
+                    states.extend(new)
+                    grew = grew or bool(new)
+        return [(proc, param) for proc in procs
+                for param, drive in getattr(proc, 'drives', {}).items()
+                if drive[0] == quantity and any(getattr(proc, flow) is st
+                                                for flow in drive[1:] for st in states)]
+
+    def update(self, component, **params):
+        ''' Change the parameters of one component (or component name), e.g.
+        cycle.update(pump, eff=0.8), and recompute only the components whose
+        states the change drives and those downstream of the states that
+        change, followed by the flow exergies and cycle totals. Components
+        are visited in process list order, from the first one changed.
+        Returns the list of recomputed components.
+
+        A parameter in the component's drives is set on every component
+        driving the same quantity of the same state, or for a pressure, of
+        any state at that pressure: cycle.update(turbine, p_hi=6e6) raises
+        the pump outlet pressure too, and cycle.update(boiler, T_hi=...)
+        moves the turbine inlet the turbine fixes. Raises ValueError if no
+        component fixes a state the parameter drives. '''
+        procs = self.get_procs()
+        if isinstance(component, str):
+            component = [p for p in procs if p.name == component][0]
+        changes = []
+        for key, val in params.items():
+            if key not in getattr(component, 'drives', {}):
+                changes.append(([(component, key)], [component], val))
+                continue
+            shared = self._shared(component, key, procs)
+            driving = [(proc, param) for proc, param in shared
+                       if any(getattr(proc, flow) is st for flow in proc.drives[param][1:]
+                              for st in proc.writes())]
+            if not driving:
+                raise ValueError('{} of {} drives no state that a component fixes'.format(
+                    key, component.name))
+            changes.append(([(proc, param) for proc, param in shared
+                             if proc is component or (proc, param) in driving or
+                             getattr(proc, param) is not None],
+                            [proc for proc, param in driving], val))
+        todo = []
+        for targets, seeds, val in changes:
+            for proc, param in targets:
+                setattr(proc, param, val)
+            todo.extend(proc for proc in seeds if not any(proc is t for t in todo))
+        first = min(procs.index(proc) for proc in todo)
+        order = procs[first:] + procs[:first]
+        recomputed = []
+        while todo:
+            for proc in order:
+                if not any(proc is t for t in todo):
+                    continue
+                todo = [t for t in todo if t is not proc]
+                before = [(st.p, st.h) for st in proc.writes()]
+                proc.compute()
+                # only states whose values changed invalidate their readers
+                changed = [st for st, (p, h) in zip(proc.writes(), before) if (st.p, st.h) != (p, h)]
+                todo.extend(p for p in procs if any(st is c for st in p.reads() for c in changed)
+                            and not any(p is t for t in todo))
+                recomputed.append(proc)
+        self.flow_exergy()
+        self.compute_totals()
+        self.compute_exergy()
+        return recomputed
+
     def __init__(self,fluid,**kwargs):
         # unpack keyword arguments
         dead = kwargs.pop('dead',None)
         name = kwargs.pop('name',"")
         mdot = kwargs.pop('mdot',1.0)  #default is 1 kg/s
         units = kwargs.pop('units',UNITS)
+        backend = kwargs.pop('backend','CoolProp')
 
         # set fluid property
         self.fluid = fluid
@@ -272,6 +962,11 @@ class Cycle(object):
 
         self.units = units
 
+        self.backend = backend
+
+        # PerfReport of property calls and component timings, if instrumented
+        self.report = PerfReport() if kwargs.pop('instrument',False) else None
+
         # initialize cycle results
         self.wnet = 0.0
         self.qnet = 0.0
@@ -293,6 +988,29 @@ class Geotherm(object):
     # should probably make this a subclass of Cycle later, and make a new
     # class called Rankine a subclass of Cycle also.
 
+    # Brine properties at the default dead state and 120 deg C inlet, and
+    # the constant specific heats that carry enthalpy and entropy between
+    # them, for finding the brine state at other temperatures.
+    T_dead = DEAD_T
+    h_dead = 61.05 * 1000  # J/kg
+    s_dead = 0.2205 * 1000  # J/kg.K
+    T_ref = 120 + 273.15  # K
+    h_ref = 491.6 * 1000  # J/kg
+    s_ref = 1.492 * 1000  # J/kg.K
+    cp = (h_ref - h_dead) / (T_ref - T_dead)  # J/kg.K
+    cp_s = (s_ref - s_dead) / math.log(T_ref / T_dead)  # J/kg.K
+
+    def brine_state(self, T, name='', cycle=None, p=5 * 10**5):
+        ''' Return the brine State at temperature T (K), modeling the brine
+        as an incompressible liquid with constant specific heat. At T_dead
+        this is the default dead state. '''
+        st = State(cycle=cycle, name=name, fluid=self.fluid)
+        st.T = T
+        st.p = p
+        st.h = self.h_ref + self.cp * (T - self.T_ref)
+        st.s = self.s_ref + self.cp_s * math.log(T / self.T_ref)
+        return st
+
     def add_proc(self,process):
         self.proc_list.append(process)
 
@@ -338,12 +1056,7 @@ class Geotherm(object):
         # find brine dead state
         self.dead = kwargs.pop('dead',None)
         if not self.dead:
-            dead = State(None,'Brine Dead State',self.fluid)
-            dead.h = 61.05 * 1000 # J/kg
-            dead.s = 0.2205 * 1000 # J/kg.K
-            dead.T = 15 + 273 # K
-            dead.p = 101325 # Pa
-            self.dead = dead
+            self.dead = self.brine_state(self.T_dead, name='Brine Dead State', p=101325)
 
         # state in
         self.in_ = None
@@ -385,3 +1098,24 @@ class Plant(object):
         self.ex_eff = 0.0   # plant exergetic efficiency
         self.cool_eff = 0.0 # plant cooling efficiency
         return
+
+    def set_dead(self, T_0, p_0=101325.0):
+        ''' Move the dead state of the Rankine and geothermal cycles to T_0
+        (K) and p_0 (Pa) and recompute the exergy results, the brine mass
+        flow rate and the plant efficiencies. The only property call is the
+        fix of the working fluid's new dead state. Returns the plant. '''
+        rank = self.rank
+        geo = self.geo
+        dead = State(name=rank.dead.name, fluid=rank.fluid, backend=rank.backend)
+        dead.fix('T', T_0, 'p', p_0)
+        dead.ef = 0
+        rank.set_dead(dead)
+        # the brine flow still carries the boiler heat at the cooling efficiency
+        dh = geo.inflow.h - geo.dead.h
+        geo.dead = geo.brine_state(T_0, name=geo.dead.name, p=p_0)
+        geo.dead.ef = 0
+        geo.mdot *= dh / (geo.inflow.h - geo.dead.h)
+        geo.inflow.flow_exergy()
+        self.en_eff = (rank.mdot * rank.wnet) / (geo.mdot * (geo.inflow.h - geo.dead.h))
+        self.ex_eff = (rank.mdot * rank.wnet) / (geo.mdot * geo.inflow.ef)
+        return self